@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Asyncio-based engine for the YouTube Political Study Scraper
+
+AsyncYouTubeScraper provides coroutine versions of the YouTubeScraper fetch
+methods. YouTube Data API calls go through one pooled aiohttp session, every
+request is gated by a semaphore-based concurrency cap and a per-host token
+bucket, and results go to the same video store and save_data outputs as the
+synchronous scraper.
+
+The transcript and comment libraries are synchronous, so those calls run on a
+bounded thread pool; the cap still applies to them, and they are paced and
+retried by the scraper's adaptive rate limiter like in synchronous mode.
+"""
+
+import asyncio
+import functools
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import List, Dict, Optional, Union
+from urllib.parse import urlencode
+
+import aiohttp
+
+from comment_filters import CommentFilter
+from config import *
+from http_cache import cache_key
+from metrics import METRICS, STAGE_PLAYLIST, STAGE_VIDEO_DETAILS
+from quota import QUOTA_REASONS, QuotaExhausted, load_api_keys, next_reset, request_cost
+from rate_limiter import AdaptiveRate, AsyncTokenBucket, DATA_API
+from retry import (RetriesExhausted, TransientHTTPError, RETRYABLE_REASONS, RETRYABLE_STATUSES,
+                   api_error_reasons, backoff_delay, classify, parse_retry_after)
+from youtube_scraper import YouTubeScraper, logger, setup_logging
+
+
+class AsyncYouTubeScraper(YouTubeScraper):
+    """YouTube scraper with an asyncio execution mode."""
+
+    def __init__(self, api_key: Union[str, List[str]], max_concurrency: int = ASYNC_MAX_CONCURRENCY):
+        """
+        Initialize the async YouTube scraper.
+
+        Args:
+            api_key: YouTube Data API v3 key or list of keys
+            max_concurrency: Maximum number of requests in flight at once
+        """
+        super().__init__(api_key)
+        self.max_concurrency = max_concurrency
+        self.session: Optional[aiohttp.ClientSession] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        start_rate, min_rate, max_rate = RATE_LIMITS[DATA_API]
+        self.api_bucket = AsyncTokenBucket(start_rate)
+        self.api_rate = AdaptiveRate(self.api_bucket, min_rate, max_rate)
+        self.executor = ThreadPoolExecutor(max_workers=ASYNC_BLOCKING_WORKERS,
+                                           thread_name_prefix="async-blocking")
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self) -> None:
+        """Create the pooled HTTP session and concurrency cap."""
+        if self.session is None:
+            connector = aiohttp.TCPConnector(limit=self.max_concurrency)
+            self.session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=ASYNC_REQUEST_TIMEOUT)
+            )
+            self.semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def close(self) -> None:
+        """Close the HTTP session and the blocking-call thread pool."""
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+        self.executor.shutdown(wait=False)
+
+    async def _api_get(self, resource: str, **params) -> Dict:
+        """
+        Issue a GET request against the YouTube Data API.
+
+        Args:
+            resource: API resource name (e.g. 'videos', 'playlistItems')
+            **params: Query parameters; None values are dropped
+
+        Transient failures are retried with backoff (honouring Retry-After)
+        and adjust the adaptive Data API rate. Each request is charged to the
+        key pool, rotating keys when the API reports one out of quota.
+
+        Returns:
+            Decoded JSON response
+
+        Raises:
+            RetriesExhausted: If a transient failure persisted through every attempt
+            QuotaExhausted: If every API key has spent its daily quota
+        """
+        await self.open()
+        query = {key: value for key, value in params.items() if value is not None}
+        url = f"https://{YOUTUBE_API_HOST}/youtube/v3/{resource}"
+
+        # Same cache as the synchronous client (keys ignore the API key)
+        entry = None
+        headers = {}
+        if self.http_cache is not None:
+            key, _, _ = cache_key("GET", f"{url}?{urlencode(query)}")
+            ttl = self.http_cache.ttl_for(resource, {k: str(v) for k, v in query.items()})
+            entry = self.http_cache.lookup(key)
+            if entry is not None and entry['fresh']:
+                self.http_cache.hits += 1
+                return json.loads(entry['content'])
+            if entry is not None and entry['etag']:
+                headers['If-None-Match'] = entry['etag']
+
+        cost = request_cost(url)
+        attempt = 0
+        while attempt < RETRY_MAX_ATTEMPTS:
+            query['key'] = await self._acquire_key(cost)
+            waited = await self.api_bucket.acquire()
+            if waited:
+                METRICS.inc('rate_wait_seconds_total', waited, backend=DATA_API)
+            METRICS.inc('requests_total', backend=DATA_API)
+            delay = None
+            start = time.perf_counter()
+            try:
+                async with self.semaphore:
+                    async with self.session.get(url, params=query, headers=headers) as response:
+                        if response.status == 304 and entry is not None:
+                            self.http_cache.revalidations += 1
+                            self.http_cache.refresh(key, ttl)
+                            self.api_rate.success()
+                            return json.loads(entry['content'])
+                        content = await response.read()
+                        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+                        if response.status == 403 and api_error_reasons(content) & QUOTA_REASONS:
+                            # Not a failed attempt: try again with another key
+                            self.key_pool.mark_exhausted(query['key'])
+                            continue
+                        if response.status in RETRYABLE_STATUSES:
+                            raise TransientHTTPError(response.status, retry_after)
+                        if response.status == 403 and api_error_reasons(content) & RETRYABLE_REASONS:
+                            raise TransientHTTPError(429, retry_after)
+                        response.raise_for_status()
+            except (TransientHTTPError, aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                METRICS.inc('request_errors_total', backend=DATA_API)
+                _, throttled, retry_after = classify(e)
+                if throttled:
+                    METRICS.inc('throttled_total', backend=DATA_API)
+                    self.api_rate.throttled(retry_after)
+                if attempt + 1 >= RETRY_MAX_ATTEMPTS:
+                    METRICS.inc('request_failures_total', backend=DATA_API)
+                    raise RetriesExhausted(DATA_API, RETRY_MAX_ATTEMPTS, e) from e
+                METRICS.inc('retries_total', backend=DATA_API)
+                delay = retry_after if retry_after is not None else backoff_delay(attempt)
+                logger.warning(f"{DATA_API}: {e!r}; retrying in {delay:.1f}s "
+                               f"({attempt + 1}/{RETRY_MAX_ATTEMPTS})")
+            finally:
+                METRICS.observe('request_seconds', time.perf_counter() - start, backend=DATA_API)
+            if delay is not None:
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self.api_rate.success()
+            break
+
+        if self.http_cache is not None:
+            self.http_cache.misses += 1
+            self.http_cache.store(key, resource, content, ttl, response.headers.get('ETag'))
+        return json.loads(content)
+
+    def _collect_metrics(self, metrics) -> None:
+        """Refresh the metrics gauges, including the async Data API rate."""
+        super()._collect_metrics(metrics)
+        metrics.set_gauge('rate', self.api_bucket.rate, backend=DATA_API)
+
+    async def _acquire_key(self, cost: int) -> str:
+        """Charge a request to the key pool, waiting for the daily reset if configured."""
+        while True:
+            api_key = self.key_pool.try_acquire(cost)
+            if api_key is not None:
+                return api_key
+            reset_at = next_reset()
+            if not self.key_pool.wait_for_reset:
+                raise QuotaExhausted(reset_at)
+            delay = (reset_at - datetime.now(timezone.utc)).total_seconds() + 60
+            logger.warning(f"Data API quota exhausted for every key; waiting {delay / 3600:.1f}h for the reset")
+            await asyncio.sleep(max(delay, 60))
+
+    async def _run_blocking(self, func, *args):
+        """Run a blocking call on the thread pool under the concurrency cap."""
+        await self.open()
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(func, *args))
+
+    async def aget_channel_upload_playlist(self, channel_handle: str, channel_id: str = None,
+                                           by_handle: bool = True) -> Optional[str]:
+        """
+        Get channel upload playlist ID (coroutine version).
+
+        Args:
+            channel_handle: YouTube channel handle
+            channel_id: YouTube channel ID (optional)
+            by_handle: Whether to search by handle or ID
+
+        Returns:
+            Upload playlist ID or None if failed
+        """
+        try:
+            if by_handle:
+                response = await self._api_get("channels", part="contentDetails", forHandle=channel_handle)
+            else:
+                response = await self._api_get("channels", part="contentDetails", id=channel_id)
+
+            if response.get('items'):
+                return response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+            return None
+        except QuotaExhausted:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting upload playlist for {channel_handle}: {e}")
+            return None
+
+    async def aget_playlist_videos(self, playlist_id: str, max_results: int = 50,
+                                   known_video_ids: Optional[set] = None,
+                                   newest_published_at: Optional[str] = None) -> List[Dict]:
+        """
+        Get videos from a playlist (coroutine version).
+
+        Args:
+            playlist_id: YouTube playlist ID
+            max_results: Maximum number of videos to retrieve
+            known_video_ids: IDs of videos seen in a previous run (optional)
+            newest_published_at: publishedAt of the newest video seen in a
+                previous run (optional)
+
+        Returns:
+            List of video dictionaries
+        """
+        videos = []
+        next_page_token = None
+
+        try:
+            while len(videos) < max_results:
+                with METRICS.stage(STAGE_PLAYLIST):
+                    response = await self._api_get(
+                        "playlistItems",
+                        part="snippet,contentDetails",
+                        playlistId=playlist_id,
+                        maxResults=min(50, max_results - len(videos)),
+                        pageToken=next_page_token
+                    )
+                METRICS.record(STAGE_PLAYLIST, items=len(response.get('items', [])))
+
+                items, reached_known = self._take_new_playlist_items(
+                    response.get('items', []), known_video_ids, newest_published_at
+                )
+                videos.extend(items)
+                next_page_token = response.get('nextPageToken')
+
+                if reached_known or not next_page_token:
+                    break
+
+        except (RetriesExhausted, QuotaExhausted):
+            # A truncated list would be cached as complete
+            raise
+        except Exception as e:
+            logger.error(f"Error getting playlist videos for {playlist_id}: {e}")
+
+        return videos
+
+    async def aget_channel_video_list(self, channel_handle: str, channel_id: str = None,
+                                      by_handle: bool = True, max_videos: int = 100,
+                                      incremental: bool = INCREMENTAL_REFRESH) -> Optional[List[Dict]]:
+        """
+        Get a channel's playlist items using the video list cache (coroutine version).
+
+        Args:
+            channel_handle: YouTube channel handle
+            channel_id: YouTube channel ID (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos: Maximum number of videos to list
+            incremental: Refresh a cached list with newly published videos
+
+        Returns:
+            List of playlist items (newest first) or None if failed
+        """
+        cached = self._load_cached_video_list(channel_handle)
+        if cached is not None and not incremental:
+            return cached
+
+        state = self._load_refresh_state(channel_handle)
+        playlist_id = state.get('playlist_id') or \
+            await self.aget_channel_upload_playlist(channel_handle, channel_id, by_handle)
+        if not playlist_id:
+            logger.error(f"Could not get upload playlist for {channel_handle}")
+            return cached
+
+        try:
+            if cached is None:
+                logger.info(f"Fetching video list from API for {channel_handle}")
+                videos = await self.aget_playlist_videos(playlist_id, max_videos)
+            else:
+                logger.info(f"Refreshing video list for {channel_handle}")
+                delta = await self.aget_playlist_videos(
+                    playlist_id, max_videos,
+                    known_video_ids={self._playlist_item_video_id(video) for video in cached},
+                    newest_published_at=state.get('newest_published_at')
+                )
+                videos = self._merge_video_list(channel_handle, cached, delta)
+        except RetriesExhausted as e:
+            logger.error(f"Could not list videos for {channel_handle}: {e}")
+            return cached
+
+        self._cache_video_list(channel_handle, videos)
+        self._save_refresh_state(channel_handle, playlist_id, videos)
+        return videos
+
+    async def aget_video_details(self, video_id: str) -> Optional[Dict]:
+        """
+        Get detailed video information (coroutine version).
+
+        Args:
+            video_id: YouTube video ID
+
+        Returns:
+            Video details dictionary or None if failed
+        """
+        details = await self.aget_videos_details([video_id])
+        return details.get(video_id)
+
+    async def aget_videos_details(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Get detailed video information for many videos (coroutine version).
+
+        Batches of up to 50 IDs are requested concurrently.
+
+        Args:
+            video_ids: List of YouTube video IDs
+
+        Returns:
+            Dictionary mapping video ID to its details
+        """
+        batch_size = min(VIDEO_DETAILS_BATCH_SIZE, 50)
+
+        async def fetch_batch(batch: List[str]) -> List[Dict]:
+            try:
+                with METRICS.stage(STAGE_VIDEO_DETAILS):
+                    response = await self._api_get(
+                        "videos",
+                        part="snippet,statistics,contentDetails",
+                        id=",".join(batch),
+                        maxResults=len(batch)
+                    )
+                METRICS.record(STAGE_VIDEO_DETAILS, items=len(response.get('items', [])))
+                return response.get('items', [])
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                logger.error(f"Error getting video details for batch starting at {batch[0]}: {e}")
+                return []
+
+        ids = [video_id for video_id in video_ids if video_id]
+        batches = [ids[start:start + batch_size] for start in range(0, len(ids), batch_size)]
+        results = await asyncio.gather(*(fetch_batch(batch) for batch in batches))
+        return {item['id']: item for items in results for item in items}
+
+    async def aget_video_transcript(self, video_id: str) -> Optional[str]:
+        """
+        Get video transcript (coroutine version).
+
+        Args:
+            video_id: YouTube video ID
+
+        Returns:
+            Transcript text or None if failed
+        """
+        return await self._run_blocking(self.get_video_transcript, video_id)
+
+    async def aget_video_comments(self, video_id: str, max_comments: int = 1000,
+                                  comment_filter: Optional[CommentFilter] = None) -> List[Dict]:
+        """
+        Get video comments (coroutine version).
+
+        Args:
+            video_id: YouTube video ID
+            max_comments: Maximum number of comments to retrieve
+            comment_filter: Filter applied while downloading (defaults to
+                self.comment_filter)
+
+        Returns:
+            List of comment dictionaries
+        """
+        return await self._run_blocking(self.get_video_comments,
+                                        video_id, max_comments, comment_filter)
+
+    async def afetch_and_process_channel_videos(self, channel_handles: List[str],
+                                                channel_ids: List[str] = None,
+                                                by_handle: bool = True,
+                                                max_videos_per_channel: int = 100,
+                                                max_comments_per_video: int = 1000) -> List[Dict]:
+        """
+        Fetch and process videos from multiple channels concurrently.
+
+        Channels are processed concurrently; the returned list keeps channel
+        and playlist order, matching fetch_and_process_channel_videos.
+
+        Args:
+            channel_handles: List of YouTube channel handles
+            channel_ids: List of YouTube channel IDs (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos_per_channel: Maximum videos to process per channel
+            max_comments_per_video: Maximum comments to collect per video
+
+        Returns:
+            List of processed video data dictionaries; if the Data API quota
+            of every key runs out, the videos mined so far
+        """
+        # Channels add their videos to the plan as they are listed
+        METRICS.set_gauge('videos_planned', 0)
+        self.progress.start()
+        tasks = [
+            asyncio.ensure_future(self._aprocess_channel(
+                channel_handle,
+                channel_ids[i] if channel_ids and i < len(channel_ids) else None,
+                by_handle, max_videos_per_channel, max_comments_per_video
+            ))
+            for i, channel_handle in enumerate(channel_handles)
+        ]
+        try:
+            results = await asyncio.gather(*tasks)
+        except QuotaExhausted as e:
+            for task in tasks:
+                task.cancel()
+            logger.error(f"{e}. Mined videos are stored; run again after the reset to continue.")
+            return self.load_mined_videos(channel_handles)
+        finally:
+            self.progress.stop()
+        return [video_data for channel_videos_data in results for video_data in channel_videos_data]
+
+    async def _aprocess_channel(self, channel_handle: str, channel_id: Optional[str],
+                                by_handle: bool, max_videos_per_channel: int,
+                                max_comments_per_video: int) -> List[Dict]:
+        """
+        Fetch and process the videos of a single channel (coroutine version).
+
+        Args:
+            channel_handle: YouTube channel handle
+            channel_id: YouTube channel ID (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos_per_channel: Maximum videos to process
+            max_comments_per_video: Maximum comments to collect per video
+
+        Returns:
+            List of processed video data dictionaries for the channel
+        """
+        logger.info(f"Processing channel {channel_handle} (async)")
+
+        videos = await self.aget_channel_video_list(channel_handle, channel_id, by_handle,
+                                                    max_videos_per_channel)
+        if videos is None:
+            return []
+
+        video_ids = [self._playlist_item_video_id(video) for video in videos]
+
+        # Only fetch the videos that have not been mined yet
+        self._migrate_pickle_cache(channel_handle)
+        mined = self.video_store.known_ids(video_ids)
+        todo = [video_id for video_id in video_ids if video_id and video_id not in mined]
+        logger.info(f"{len(mined)} videos already mined for {channel_handle}, {len(todo)} to fetch")
+
+        details_by_id = await self.aget_videos_details(todo)
+        todo = [video_id for video_id in todo if video_id in details_by_id]
+        METRICS.set_gauge('videos_planned', (METRICS.gauge('videos_planned') or 0) + len(todo))
+
+        collected = {}
+        # Schedule everything up front; the semaphore and token buckets bound
+        # what is actually in flight
+        tasks = [
+            (asyncio.ensure_future(self.aget_video_transcript(video_id)),
+             asyncio.ensure_future(self.aget_video_comments(video_id, max_comments_per_video)))
+            for video_id in todo
+        ]
+
+        try:
+            for j, (video_id, (transcript_task, comments_task)) in enumerate(zip(todo, tasks)):
+                try:
+                    transcript = await transcript_task
+                    comments = await comments_task
+                except RetriesExhausted as e:
+                    # Not stored, so the next run fetches this video again
+                    logger.error(f"Skipping {video_id} for now: {e}")
+                    continue
+                logger.info(f"Collected {len(comments)} comments for {video_id} ({j+1}/{len(todo)})")
+
+                video_data = self._build_video_data(channel_handle, video_id, details_by_id[video_id],
+                                                    transcript, comments)
+                self._store_video(video_data)
+                collected[video_id] = video_data
+        finally:
+            for transcript_task, comments_task in tasks:
+                transcript_task.cancel()
+                comments_task.cancel()
+
+        # Records mined by earlier runs are only loaded now, to be returned
+        collected.update(self.video_store.get_many(mined))
+        return [collected[video_id] for video_id in video_ids if video_id in collected]
+
+
+async def async_main():
+    """Run the async scraper with the config settings."""
+    setup_logging()
+    API_KEY = load_api_keys()
+    if not API_KEY:
+        logger.error("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
+        return
+
+    async with AsyncYouTubeScraper(API_KEY) as scraper:
+        logger.info(f"Starting to scrape {len(YOUTUBERS)} channels (async): {YOUTUBERS}")
+        videos_data = await scraper.afetch_and_process_channel_videos(
+            channel_handles=YOUTUBERS,
+            max_videos_per_channel=MAX_VIDEOS_PER_CHANNEL,
+            max_comments_per_video=MAX_COMMENTS_PER_VIDEO
+        )
+
+    scraper.save_data(videos_data, output_format=OUTPUT_FORMAT)
+    logger.info(f"Scraping completed! Processed {len(videos_data)} videos")
+
+
+if __name__ == "__main__":
+    asyncio.run(async_main())
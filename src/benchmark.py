@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark for the YouTube Political Study Scraper
+
+Drives fetch_and_process_channel_videos and save_data end to end against the
+fake backend in fake_backend.py (no network access, no quota spent) and
+reports crawl and export throughput, peak memory and API calls per video:
+
+    python benchmark.py --channels 2 --videos 200 --comments 500 --latency 0.005
+
+Results can be written to JSON (--output) and compared against an earlier
+result (--baseline); the run fails if throughput drops or peak memory or API
+calls per video grow by more than --tolerance.
+
+Startup cost (importing youtube_scraper, constructing a YouTubeScraper and
+building the Data API client) is measured in fresh interpreters, since it
+dominates short-lived worker processes and small jobs:
+
+    python benchmark.py --startup-only --startup-runs 10
+"""
+
+import argparse
+import json
+import logging
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+from config import *
+from fake_backend import FakeBackend
+from metrics import METRICS
+from youtube_scraper import YouTubeScraper
+
+# Metrics where a higher value is better; all others are better when lower
+HIGHER_IS_BETTER = {'videos_per_sec', 'comments_per_sec', 'export_videos_per_sec'}
+COMPARED_METRICS = ['videos_per_sec', 'comments_per_sec', 'export_videos_per_sec',
+                    'peak_rss_mb', 'api_calls_per_video', 'import_seconds', 'init_seconds']
+
+# Libraries that should only be imported once they are needed
+HEAVY_MODULES = ['pandas', 'pyarrow', 'googleapiclient.discovery', 'youtube_transcript_api',
+                 'youtube_comment_downloader', 'aiohttp']
+
+# Run in a fresh interpreter by measure_startup; prints one JSON line
+STARTUP_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import youtube_scraper
+imported = time.perf_counter()
+from fake_backend import FakeBackend
+backend = FakeBackend(videos_per_channel=1)
+constructing = time.perf_counter()
+scraper = youtube_scraper.YouTubeScraper("benchmark-key", http=backend.http())
+constructed = time.perf_counter()
+loaded = [name for name in json.loads(sys.argv[1]) if name in sys.modules]
+scraper.youtube.videos()
+built = time.perf_counter()
+print(json.dumps({'import_seconds': imported - start, 'init_seconds': constructed - constructing,
+                  'client_seconds': built - constructed, 'heavy_modules': loaded}))
+"""
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_benchmark(channels: int = 2, videos_per_channel: int = 100, comments_per_video: int = 200,
+                  transcript_segments: int = 300, latency: float = 0.0, error_rate: float = 0.0,
+                  concurrent: bool = False, output_format: str = 'both',
+                  paced: bool = False, seed: int = 0) -> Dict:
+    """
+    Run one benchmark in a temporary working directory.
+
+    Args:
+        channels: Number of channels to crawl
+        videos_per_channel: Videos per channel
+        comments_per_video: Comments collected per video
+        transcript_segments: Segments per transcript
+        latency: Simulated seconds of latency per request (all backends)
+        error_rate: Probability that a request fails with a throttling error
+        concurrent: Use the concurrent crawl mode
+        output_format: Format passed to save_data
+        paced: Keep the RATE_LIMITS pacing (off by default, so the benchmark
+            measures the scraper rather than the configured rates)
+        seed: Seed of the fake backend
+
+    Returns:
+        Dictionary of settings and measured metrics
+    """
+    backend = FakeBackend(
+        videos_per_channel=videos_per_channel,
+        comments_per_video=comments_per_video,
+        transcript_segments=transcript_segments,
+        latency={'data_api': latency, 'transcripts': latency, 'comments': latency},
+        error_rate=error_rate,
+        seed=seed
+    )
+    handles = [f"@bench{n}" for n in range(channels)]
+    METRICS.reset()
+
+    previous_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="ytb_benchmark_") as work_dir:
+        # Cache and output directories are relative to the working directory
+        os.chdir(work_dir)
+        try:
+            scraper = YouTubeScraper(
+                "benchmark-key",
+                http=backend.http(),
+                transcript_api=backend.transcript_api(),
+                comment_downloader_class=backend.comment_downloader_class()
+            )
+            if not paced:
+                for bucket in scraper.rate_limiter.buckets.values():
+                    bucket.set_rate(0)
+
+            start = time.perf_counter()
+            videos_data = scraper.fetch_and_process_channel_videos(
+                handles,
+                max_videos_per_channel=videos_per_channel,
+                max_comments_per_video=comments_per_video,
+                concurrent=concurrent
+            )
+            crawl_seconds = time.perf_counter() - start
+
+            start = time.perf_counter()
+            scraper.save_data(videos_data, output_format=output_format)
+            export_seconds = time.perf_counter() - start
+        finally:
+            os.chdir(previous_dir)
+
+    video_count = len(videos_data)
+    comment_count = sum(len(video['comments']) for video in videos_data)
+    return {
+        'settings': {
+            'channels': channels, 'videos_per_channel': videos_per_channel,
+            'comments_per_video': comments_per_video, 'transcript_segments': transcript_segments,
+            'latency': latency, 'error_rate': error_rate, 'concurrent': concurrent,
+            'output_format': output_format, 'paced': paced, 'seed': seed
+        },
+        'videos': video_count,
+        'comments': comment_count,
+        'crawl_seconds': round(crawl_seconds, 3),
+        'export_seconds': round(export_seconds, 3),
+        'videos_per_sec': round(video_count / crawl_seconds, 2) if crawl_seconds else None,
+        'comments_per_sec': round(comment_count / crawl_seconds, 1) if crawl_seconds else None,
+        'export_videos_per_sec': round(video_count / export_seconds, 2) if export_seconds else None,
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'api_calls': backend.requests['data_api'],
+        'api_calls_per_video': round(backend.requests['data_api'] / video_count, 4) if video_count else None,
+        'transcript_requests': backend.requests['transcripts'],
+        'comment_page_requests': backend.requests['comments'],
+        'injected_errors': dict(backend.errors),
+        'stages': METRICS.stage_summary()
+    }
+
+
+def measure_startup(runs: int = 5) -> Dict:
+    """
+    Measure startup cost in fresh interpreters.
+
+    Args:
+        runs: Interpreters to start (the median of each timing is reported)
+
+    Returns:
+        Median seconds to import youtube_scraper, construct a YouTubeScraper
+        and build the Data API client, and the heavy libraries loaded by the
+        import and construction
+    """
+    source_dir = str(Path(__file__).resolve().parent)
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [source_dir, os.environ.get('PYTHONPATH')])))
+    samples = []
+    with tempfile.TemporaryDirectory(prefix="ytb_startup_") as work_dir:
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, '-c', STARTUP_SCRIPT, json.dumps(HEAVY_MODULES)],
+                cwd=work_dir, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        'startup_runs': runs,
+        'import_seconds': round(statistics.median(sample['import_seconds'] for sample in samples), 4),
+        'init_seconds': round(statistics.median(sample['init_seconds'] for sample in samples), 4),
+        'client_seconds': round(statistics.median(sample['client_seconds'] for sample in samples), 4),
+        'heavy_modules_at_startup': samples[-1]['heavy_modules'],
+    }
+
+
+def compare(result: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compare a result with a baseline result.
+
+    Args:
+        result: Result of run_benchmark
+        baseline: Earlier result of run_benchmark
+        tolerance: Allowed relative change in the wrong direction (0.2 = 20%)
+
+    Returns:
+        Descriptions of the metrics that regressed
+    """
+    regressions = []
+    for metric in COMPARED_METRICS:
+        current, previous = result.get(metric), baseline.get(metric)
+        if not current or not previous:
+            continue
+        change = (current - previous) / previous
+        if metric in HIGHER_IS_BETTER:
+            change = -change
+        if change > tolerance:
+            regressions.append(f"{metric}: {previous} -> {current} ({change:.0%} worse)")
+    return regressions
+
+
+def print_startup_report(result: Dict) -> None:
+    """Print the startup part of a benchmark result."""
+    print(f"Startup (median of {result['startup_runs']} fresh interpreters):")
+    rows = [
+        ('import youtube_scraper (s)', result['import_seconds']),
+        ('YouTubeScraper() (s)', result['init_seconds']),
+        ('Data API client (s)', result['client_seconds']),
+        ('heavy modules loaded', ', '.join(result['heavy_modules_at_startup']) or 'none'),
+    ]
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"  {name.ljust(width)}  {value}")
+
+
+def print_report(result: Dict) -> None:
+    """Print a benchmark result as a small table."""
+    if 'import_seconds' in result:
+        print_startup_report(result)
+    if 'settings' not in result:
+        return
+    settings = result['settings']
+    print(f"Benchmark: {settings['channels']} channels x {settings['videos_per_channel']} videos x "
+          f"{settings['comments_per_video']} comments, latency {settings['latency']}s, "
+          f"error rate {settings['error_rate']}, concurrent={settings['concurrent']}")
+    rows = [
+        ('videos', result['videos']),
+        ('comments', result['comments']),
+        ('crawl seconds', result['crawl_seconds']),
+        ('videos/sec', result['videos_per_sec']),
+        ('comments/sec', result['comments_per_sec']),
+        (f"export seconds ({settings['output_format']})", result['export_seconds']),
+        ('peak RSS (MiB)', result['peak_rss_mb']),
+        ('API calls', result['api_calls']),
+        ('API calls/video', result['api_calls_per_video']),
+        ('transcript requests', result['transcript_requests']),
+        ('comment page requests', result['comment_page_requests']),
+        ('injected errors', result['injected_errors'] or 0),
+    ]
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"  {name.ljust(width)}  {value}")
+    if result.get('stages'):
+        print("  Time per stage:")
+        for name, stage in result['stages'].items():
+            print(f"    {name.ljust(width - 2)}  {stage['seconds']}s over {stage['calls']} calls "
+                  f"(p50 {stage['p50']}s, {stage['errors']} errors, {stage['items']} items)")
+
+
+def main():
+    """Run the benchmark from the command line."""
+    parser = argparse.ArgumentParser(description="Offline benchmark for the YouTube scraper")
+    parser.add_argument('--channels', type=int, default=2, help="channels to crawl")
+    parser.add_argument('--videos', type=int, default=100, help="videos per channel")
+    parser.add_argument('--comments', type=int, default=200, help="comments per video")
+    parser.add_argument('--segments', type=int, default=300, help="transcript segments per video")
+    parser.add_argument('--latency', type=float, default=0.0, help="simulated seconds per request")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of requests that are throttled")
+    parser.add_argument('--concurrent', action='store_true', help="use the concurrent crawl mode")
+    parser.add_argument('--format', default='both', help="output format passed to save_data")
+    parser.add_argument('--paced', action='store_true', help="keep the RATE_LIMITS pacing")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the fake backend")
+    parser.add_argument('--output', help="write the result as JSON to this file")
+    parser.add_argument('--baseline', help="JSON result of an earlier run to compare against")
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help="allowed relative regression against the baseline (default 0.2)")
+    parser.add_argument('--startup-runs', type=int, default=5,
+                        help="fresh interpreters used to measure startup cost (0 skips it)")
+    parser.add_argument('--startup-only', action='store_true', help="only measure startup cost")
+    args = parser.parse_args()
+
+    # Per-video progress logging (and the expected transcript and retry
+    # warnings) would dominate the measurement and the output
+    logging.getLogger().setLevel(logging.ERROR)
+
+    result = {}
+    if not args.startup_only:
+        result = run_benchmark(
+            channels=args.channels, videos_per_channel=args.videos, comments_per_video=args.comments,
+            transcript_segments=args.segments, latency=args.latency, error_rate=args.error_rate,
+            concurrent=args.concurrent, output_format=args.format, paced=args.paced, seed=args.seed
+        )
+    if args.startup_runs > 0 or args.startup_only:
+        result.update(measure_startup(max(1, args.startup_runs)))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, indent=2)
+        print(f"Wrote benchmark result to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            regressions = compare(result, json.load(f), args.tolerance)
+        if regressions:
+            print("Regressions against baseline:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
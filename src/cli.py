@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Command-line interface for the YouTube Political Study Scraper
+
+Runs a crawl described by a job file (see jobs.py) and/or command-line
+options, optionally as one shard of a job split across machines, and records
+its progress in a checkpoint file so an interrupted run resumes where it
+stopped:
+
+    python cli.py --job jobs/politics.json --shard 2/4
+    python cli.py --channels @HasanAbi @joerogan --max-videos 50 --format json
+
+The exit status is 0 once every channel of the shard is finished and 1 if
+some are left (e.g. because the Data API quota ran out); running the same
+command again continues the job.
+
+With --snapshot it records the current channel and video statistics of the
+job's channels instead of crawling (see stats_series.py), once or, with
+--interval, periodically until interrupted:
+
+    python cli.py --snapshot --interval 21600
+
+With --refresh-comments it downloads the comments of the job's already mined
+videos again (optionally only those published within --since DAYS), so their
+vote and reply counts are updated in the comment store:
+
+    python cli.py --refresh-comments --since 14
+"""
+
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from config import *
+from comment_filters import CommentFilter
+from jobs import (Checkpoint, CheckpointMismatch, default_checkpoint_path, load_job, normalize_job,
+                  parse_shard, read_checkpoint, shard_channels)
+from quota import QuotaExhausted, load_api_keys
+from stats_series import StatsSeries, take_snapshot, tracked_video_ids
+from youtube_scraper import YouTubeScraper, setup_logging
+
+logger = logging.getLogger(__name__)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Return the argument parser of the command-line interface."""
+    parser = argparse.ArgumentParser(description="Scrape YouTube channels described by a job file")
+    parser.add_argument('--job', help="JSON job file (channels, limits, filters, output format and directory)")
+    parser.add_argument('--channels', nargs='+', metavar='HANDLE', help="channel handles (override the job's)")
+    parser.add_argument('--max-videos', type=int, help="maximum videos per channel")
+    parser.add_argument('--max-comments', type=int, help="maximum comments per video")
+    parser.add_argument('--format', dest='output_format', help="output format: json, csv, both, parquet, archive or all")
+    parser.add_argument('--output-dir', help="directory for the output and checkpoint files")
+    parser.add_argument('--languages', nargs='+', metavar='LANG', help="preferred transcript languages")
+    parser.add_argument('--concurrent', action='store_true', default=None,
+                        help="fetch transcripts and comments in worker pools")
+    parser.add_argument('--shard', default='1/1',
+                        help="run shard i of N (1-based, e.g. 2/4): every N-th channel of the job from the i-th")
+    parser.add_argument('--checkpoint', help="checkpoint file (default: <output dir>/<job name>[.shardIofN].checkpoint.jsonl)")
+    parser.add_argument('--restart', action='store_true', help="discard the checkpoint and start the job over")
+    parser.add_argument('--dry-run', action='store_true', help="show the shard's channels and progress, then exit")
+    parser.add_argument('--snapshot', action='store_true',
+                        help="record channel and video statistics instead of crawling")
+    parser.add_argument('--interval', type=float, nargs='?', const=SNAPSHOT_INTERVAL, metavar='SECONDS',
+                        help=f"with --snapshot, repeat every SECONDS (default {SNAPSHOT_INTERVAL}) until interrupted")
+    parser.add_argument('--snapshot-dir', default=SNAPSHOT_DIR, help="directory of the statistics series")
+    parser.add_argument('--refresh-comments', action='store_true',
+                        help="download the comments of already mined videos again and update their counts")
+    parser.add_argument('--since', type=float, metavar='DAYS',
+                        help="with --refresh-comments, only videos published within DAYS (default: all mined videos)")
+    return parser
+
+
+def job_from_args(args: argparse.Namespace) -> Dict:
+    """Build the job spec from the job file and the command-line overrides."""
+    job = load_job(args.job) if args.job else normalize_job({'name': 'job'})
+    overrides = {
+        'channels': args.channels,
+        'max_videos_per_channel': args.max_videos,
+        'max_comments_per_video': args.max_comments,
+        'output_format': args.output_format,
+        'output_dir': args.output_dir,
+        'transcript_languages': args.languages,
+        'concurrent': args.concurrent,
+    }
+    job.update({key: value for key, value in overrides.items() if value is not None})
+    return normalize_job(job)
+
+
+def configure_scraper(scraper: YouTubeScraper, job: Dict) -> None:
+    """Apply a job's output directory, transcript languages and comment filters to a scraper."""
+    scraper.output_dir = Path(job['output_dir'])
+    scraper.output_dir.mkdir(parents=True, exist_ok=True)
+    if METRICS_FILE:
+        scraper.progress.path = scraper.output_dir / METRICS_FILE
+    languages = job['transcript_languages']
+    scraper.transcript_languages = [languages] if isinstance(languages, str) else list(languages)
+    comment_filter = CommentFilter(**job['filters'])
+    scraper.comment_filter = comment_filter if comment_filter.is_active() else None
+
+
+def run_job(job: Dict, shard: tuple = (1, 1), checkpoint_path: Optional[str] = None,
+            restart: bool = False, api_keys: Optional[List[str]] = None) -> bool:
+    """
+    Run (or resume) one shard of a job.
+
+    Args:
+        job: Complete job spec
+        shard: (i, N) shard to run
+        checkpoint_path: Checkpoint file (defaults to default_checkpoint_path)
+        restart: Discard the checkpoint and start over
+        api_keys: Data API keys (defaults to load_api_keys())
+
+    Returns:
+        True if every channel of the shard is finished
+    """
+    channels = shard_channels(job['channels'], *shard)
+    path = checkpoint_path or default_checkpoint_path(job, shard)
+    with Checkpoint(path, job, shard, restart=restart) as checkpoint:
+        remaining = checkpoint.remaining(channels)
+        logger.info(f"Job {job['name']} shard {shard[0]}/{shard[1]}: {len(channels)} channels, "
+                    f"{len(channels) - len(remaining)} finished, {len(checkpoint.video_ids)} videos saved "
+                    f"(checkpoint {path})")
+        if not remaining:
+            return True
+
+        api_keys = api_keys if api_keys is not None else load_api_keys()
+        if not api_keys:
+            raise ValueError("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
+        scraper = YouTubeScraper(api_keys)
+        configure_scraper(scraper, job)
+
+        # A channel is checkpointed only once the output reports all its videos written
+        videos = checkpoint.track(scraper.iter_channel_videos(
+            channel_handles=remaining,
+            max_videos_per_channel=job['max_videos_per_channel'],
+            max_comments_per_video=job['max_comments_per_video'],
+            concurrent=job['concurrent'],
+            skip_video_ids=checkpoint.video_ids,
+            on_channel_done=checkpoint.channel_crawled
+        ))
+        count = scraper.save_data_streaming(
+            videos, output_format=job['output_format'],
+            on_saved=lambda video: checkpoint.video_done(video['channel_handle'], video['video_id']),
+            timestamp=checkpoint.output_suffix()
+        )
+        left = checkpoint.remaining(channels)
+        logger.info(f"Saved {count} videos; {len(channels) - len(left)}/{len(channels)} channels finished")
+        if left:
+            logger.info(f"Unfinished channels: {', '.join(left)}; run the same command again to continue")
+        return not left
+
+
+def run_snapshots(job: Dict, shard: tuple = (1, 1), snapshot_dir=SNAPSHOT_DIR, interval: Optional[float] = None,
+                  api_keys: Optional[List[str]] = None) -> bool:
+    """
+    Record statistics snapshots of one shard of a job's channels.
+
+    Args:
+        job: Complete job spec
+        shard: (i, N) shard whose channels are recorded
+        snapshot_dir: Directory of the statistics series
+        interval: Seconds between snapshots (None takes one snapshot)
+        api_keys: Data API keys (defaults to load_api_keys())
+
+    Returns:
+        True if the last snapshot was recorded
+    """
+    api_keys = api_keys if api_keys is not None else load_api_keys()
+    if not api_keys:
+        raise ValueError("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
+    scraper = YouTubeScraper(api_keys)
+    series = StatsSeries(snapshot_dir)
+    channels = shard_channels(job['channels'], *shard)
+
+    recorded = False
+    try:
+        while True:
+            started = time.monotonic()
+            try:
+                take_snapshot(scraper, series, channels)
+                recorded = True
+            except QuotaExhausted as e:
+                logger.error(f"Snapshot stopped: {e}")
+                recorded = False
+            if interval is None:
+                return recorded
+            time.sleep(max(0.0, interval - (time.monotonic() - started)))
+    except KeyboardInterrupt:
+        logger.info("Snapshots stopped")
+        return recorded
+
+
+def run_comment_refresh(job: Dict, shard: tuple = (1, 1), since_days: Optional[float] = None,
+                        api_keys: Optional[List[str]] = None) -> bool:
+    """
+    Download the comments of one shard's already mined videos again.
+
+    New comments are added to the comment store and the vote and reply counts
+    (and edited text) of known ones are updated in place.
+
+    Args:
+        job: Complete job spec
+        shard: (i, N) shard whose channels are refreshed
+        since_days: Only videos published within this many days (None: all)
+        api_keys: Data API keys (defaults to load_api_keys())
+
+    Returns:
+        True if every video was refreshed (False if the quota ran out)
+    """
+    api_keys = api_keys if api_keys is not None else load_api_keys()
+    if not api_keys:
+        raise ValueError("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
+    scraper = YouTubeScraper(api_keys)
+    configure_scraper(scraper, job)
+    channels = shard_channels(job['channels'], *shard)
+    video_ids = tracked_video_ids(scraper, channels, max_age_days=since_days)
+    logger.info(f"Refreshing comments of {len(video_ids)} mined videos from {len(channels)} channels")
+    try:
+        scraper.refresh_video_comments(video_ids, job['max_comments_per_video'])
+    except QuotaExhausted as e:
+        logger.error(f"Comment refresh stopped: {e}")
+        return False
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """Run the command-line interface; returns the exit status."""
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    setup_logging()
+
+    try:
+        job = job_from_args(args)
+        shard = parse_shard(args.shard)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    if args.snapshot:
+        try:
+            recorded = run_snapshots(job, shard, args.snapshot_dir, args.interval)
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+        return 0 if recorded else 1
+
+    if args.refresh_comments:
+        try:
+            refreshed = run_comment_refresh(job, shard, args.since)
+        except ValueError as e:
+            logger.error(str(e))
+            return 1
+        return 0 if refreshed else 1
+
+    if args.dry_run:
+        channels = shard_channels(job['channels'], *shard)
+        path = Path(args.checkpoint or default_checkpoint_path(job, shard))
+        done = set()
+        if path.exists() and not args.restart:
+            done = {entry['channel'] for entry in read_checkpoint(path) if entry.get('type') == 'channel'}
+        print(f"Job {job['name']} shard {shard[0]}/{shard[1]} ({len(channels)} of {len(job['channels'])} channels):")
+        for channel in channels:
+            print(f"  {channel}{'  (finished)' if channel in done else ''}")
+        return 0
+
+    try:
+        finished = run_job(job, shard, args.checkpoint, args.restart)
+    except (CheckpointMismatch, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    return 0 if finished else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Comment filters for the YouTube Political Study Scraper
+
+A CommentFilter is applied to the comment stream while it is being
+downloaded, so rejected comments are never stored, and paging stops as soon
+as the sort order guarantees that no further comment can pass:
+
+- with popular sorting, once enough consecutive top-level comments fall below
+  min_votes
+- with recent sorting, once enough consecutive top-level comments are older
+  than the start of the time window
+
+With top_level_only, set_skip_replies() also stops the downloader from
+requesting reply pages at all, so skipping replies saves their requests and
+bandwidth rather than discarding them after download.
+"""
+
+from datetime import datetime
+from typing import Dict, Optional, Union
+
+from config import *
+from records import parse_count
+
+# Sort orders of YoutubeCommentDownloader (youtube_comment_downloader.SORT_BY_*),
+# repeated here so the filters do not import the downloader and its dependencies
+SORT_BY_POPULAR = 0
+SORT_BY_RECENT = 1
+
+
+def _to_epoch(value: Union[None, int, float, str, datetime]) -> Optional[float]:
+    """Convert a datetime, ISO 8601 string or epoch number to epoch seconds."""
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.timestamp()
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+
+
+def set_skip_replies(downloader, skip: bool) -> None:
+    """
+    Make a YoutubeCommentDownloader follow reply continuations or not.
+
+    The downloader queues a comment thread's reply pages when it finds their
+    continuation with search_dict(item, 'continuationEndpoint') on the
+    thread's commentThreadRenderer item. Hiding continuations inside those
+    items skips the reply requests, while the next page of top-level
+    comments (a continuationItemRenderer item) is still followed.
+
+    Args:
+        downloader: Downloader instance (each thread has its own)
+        skip: Whether reply pages are skipped for the next downloads
+    """
+    search_dict = getattr(downloader, 'search_dict', None)
+    if skip and search_dict is not None and 'search_dict' not in vars(downloader):
+
+        def search_without_replies(partial, search_key):
+            if (search_key == 'continuationEndpoint' and downloader.skip_replies
+                    and isinstance(partial, dict) and 'commentThreadRenderer' in partial):
+                return iter(())
+            return search_dict(partial, search_key)
+
+        downloader.search_dict = search_without_replies
+    downloader.skip_replies = skip
+
+
+class CommentFilter:
+    """Predicates pushed down into comment downloading."""
+
+    def __init__(self, min_votes: Optional[int] = None,
+                 since: Union[None, float, str, datetime] = None,
+                 until: Union[None, float, str, datetime] = None,
+                 top_level_only: bool = False,
+                 early_stop_patience: int = COMMENT_EARLY_STOP_PATIENCE):
+        """
+        Initialize the filter.
+
+        Args:
+            min_votes: Keep only comments with at least this many votes
+            since: Keep only comments posted at or after this time
+            until: Keep only comments posted at or before this time
+            top_level_only: Skip replies (their pages are not requested, see
+                set_skip_replies)
+            early_stop_patience: Consecutive top-level comments past the
+                threshold (in sort order) after which paging stops; YouTube's
+                orderings are only approximately sorted, so a single outlier
+                does not end the stream
+        """
+        self.min_votes = min_votes
+        self.since = _to_epoch(since)
+        self.until = _to_epoch(until)
+        self.top_level_only = top_level_only
+        self.early_stop_patience = max(1, early_stop_patience)
+
+    @classmethod
+    def from_config(cls) -> Optional["CommentFilter"]:
+        """Build the filter described by config.py, or None if it sets no filter."""
+        comment_filter = cls(
+            min_votes=COMMENT_MIN_VOTES,
+            since=COMMENT_SINCE,
+            until=COMMENT_UNTIL,
+            top_level_only=COMMENT_TOP_LEVEL_ONLY
+        )
+        return comment_filter if comment_filter.is_active() else None
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict]) -> Optional["CommentFilter"]:
+        """Rebuild a filter serialized with to_dict (None stays None)."""
+        return cls(**data) if data else None
+
+    def to_dict(self) -> Dict:
+        """Serialize the filter to a JSON-compatible dictionary."""
+        return {
+            'min_votes': self.min_votes,
+            'since': self.since,
+            'until': self.until,
+            'top_level_only': self.top_level_only,
+            'early_stop_patience': self.early_stop_patience
+        }
+
+    def is_active(self) -> bool:
+        """Return True if the filter rejects anything."""
+        return (self.min_votes is not None or self.since is not None
+                or self.until is not None or self.top_level_only)
+
+    @staticmethod
+    def is_reply(comment: Dict) -> bool:
+        """Return True if a raw downloader comment is a reply."""
+        return comment.get('reply', '.' in comment.get('cid', ''))
+
+    def accepts(self, comment: Dict) -> bool:
+        """
+        Check a raw comment from YoutubeCommentDownloader against the filter.
+
+        Comments without a parsed time pass the time window checks.
+        """
+        if self.top_level_only and self.is_reply(comment):
+            return False
+        if self.min_votes is not None and (parse_count(comment.get('votes')) or 0) < self.min_votes:
+            return False
+        posted = comment.get('time_parsed')
+        if posted is not None:
+            if self.since is not None and posted < self.since:
+                return False
+            if self.until is not None and posted > self.until:
+                return False
+        return True
+
+    def stream(self, comments, sort_by: int = SORT_BY_POPULAR):
+        """
+        Filter a raw comment generator, stopping it early when possible.
+
+        Args:
+            comments: Comment generator from YoutubeCommentDownloader
+            sort_by: Sort order the generator was requested with
+
+        Yields:
+            Accepted raw comments
+        """
+        misses = 0
+        try:
+            for comment in comments:
+                if self.accepts(comment):
+                    misses = 0
+                    yield comment
+                    continue
+
+                # Replies are interleaved with their parents and do not follow
+                # the top-level ordering
+                if self.is_reply(comment):
+                    continue
+                if self._past_threshold(comment, sort_by):
+                    misses += 1
+                    if misses >= self.early_stop_patience:
+                        break
+                else:
+                    misses = 0
+        finally:
+            # Stop the downloader from requesting further pages
+            close = getattr(comments, 'close', None)
+            if close is not None:
+                close()
+
+    def _past_threshold(self, comment: Dict, sort_by: int) -> bool:
+        """Return True if a top-level comment lies beyond the sort-order cutoff."""
+        if sort_by == SORT_BY_POPULAR and self.min_votes is not None:
+            return (parse_count(comment.get('votes')) or 0) < self.min_votes
+        if sort_by == SORT_BY_RECENT and self.since is not None:
+            posted = comment.get('time_parsed')
+            return posted is not None and posted < self.since
+        return False
@@ -0,0 +1,214 @@
+"""
+Deduplicated comment store for the YouTube Political Study Scraper
+
+Every comment is kept once across runs, keyed by its comment ID (cid).
+Seeing a comment again updates its vote and reply counts (and text, if it
+was edited) in place and moves its last-seen time, so repeated crawls only
+grow the store by new comments. Secondary indexes by video and by author
+channel answer questions like "every comment by this author, across
+channels" without scanning the exported CSV files.
+"""
+
+import csv
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from metrics import METRICS, STAGE_CACHE_IO
+from records import parse_count
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    cid TEXT PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    channel_handle TEXT NOT NULL,
+    text TEXT NOT NULL,
+    time TEXT,
+    author TEXT,
+    author_channel TEXT,
+    votes INTEGER NOT NULL DEFAULT 0,
+    replies INTEGER NOT NULL DEFAULT 0,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS comments_video ON comments (video_id);
+CREATE INDEX IF NOT EXISTS comments_author ON comments (author_channel);
+"""
+
+COLUMNS = ['cid', 'video_id', 'channel_handle', 'text', 'time', 'author', 'author_channel',
+           'votes', 'replies', 'first_seen', 'last_seen', 'updated_at']
+
+# Stay well below SQLite's limit on bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+
+# New rows are inserted; known rows only change when a count or the text
+# changed, and always record that they were seen again
+UPSERT = """
+INSERT INTO comments (cid, video_id, channel_handle, text, time, author, author_channel,
+                      votes, replies, first_seen, last_seen, updated_at)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (cid) DO UPDATE SET
+    updated_at = CASE WHEN comments.votes != excluded.votes OR comments.replies != excluded.replies
+                        OR comments.text != excluded.text
+                      THEN excluded.updated_at ELSE comments.updated_at END,
+    votes = excluded.votes,
+    replies = excluded.replies,
+    text = excluded.text,
+    time = excluded.time,
+    last_seen = excluded.last_seen
+"""
+
+
+class CommentStore:
+    """SQLite-backed store of comments across runs, keyed by comment ID."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def __contains__(self, cid: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM comments WHERE cid = ?", (cid,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+
+    def _changed(self, rows: List[tuple]) -> Tuple[set, set]:
+        """Return the cids among rows that are already stored and those whose data changed."""
+        known, changed = set(), set()
+        by_cid = {row[0]: row for row in rows}
+        cids = list(by_cid)
+        for start in range(0, len(cids), QUERY_CHUNK_SIZE):
+            chunk = cids[start:start + QUERY_CHUNK_SIZE]
+            for cid, text, votes, replies in self.conn.execute(
+                f"SELECT cid, text, votes, replies FROM comments WHERE cid IN ({','.join('?' * len(chunk))})",
+                chunk
+            ):
+                known.add(cid)
+                row = by_cid[cid]
+                if (row[3], row[7], row[8]) != (text, votes, replies):
+                    changed.add(cid)
+        return known, changed
+
+    def upsert_video(self, video_data: Dict) -> Tuple[int, int]:
+        """
+        Store the comments of one video.
+
+        Args:
+            video_data: Processed video data dictionary
+
+        Returns:
+            (new comments, known comments whose counts or text changed)
+        """
+        now = datetime.now().isoformat()
+        rows = [
+            (comment.get('cid'), video_data['video_id'], video_data.get('channel_handle', ''),
+             comment.get('text') or '', comment.get('time'), comment.get('author'), comment.get('channel'),
+             parse_count(comment.get('votes')) or 0, parse_count(comment.get('replies')) or 0, now, now, now)
+            for comment in video_data.get('comments') or []
+            if comment.get('cid')
+        ]
+        if not rows:
+            return 0, 0
+
+        with METRICS.stage(STAGE_CACHE_IO), self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                known, changed = self._changed(rows)
+                self.conn.executemany(UPSERT, rows)
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        METRICS.record(STAGE_CACHE_IO, items=len(rows))
+        return len({row[0] for row in rows} - known), len(changed)
+
+    def upsert_many(self, videos_data: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Store the comments of several videos (e.g. to backfill from the video store).
+
+        Returns:
+            (new comments, known comments whose counts or text changed)
+        """
+        new = changed = 0
+        for video_data in videos_data:
+            video_new, video_changed = self.upsert_video(video_data)
+            new += video_new
+            changed += video_changed
+        return new, changed
+
+    def _select(self, where: str, params: tuple) -> List[Dict]:
+        with self.lock:
+            cursor = self.conn.execute(f"SELECT {', '.join(COLUMNS)} FROM comments {where}", params)
+            return [dict(zip(COLUMNS, row)) for row in cursor.fetchall()]
+
+    def get(self, cid: str) -> Optional[Dict]:
+        """Return one comment (None if not stored)."""
+        rows = self._select("WHERE cid = ?", (cid,))
+        return rows[0] if rows else None
+
+    def by_video(self, video_id: str) -> List[Dict]:
+        """Return the comments of a video, most voted first."""
+        return self._select("WHERE video_id = ? ORDER BY votes DESC", (video_id,))
+
+    def by_author(self, author_channel: str) -> List[Dict]:
+        """Return every comment by an author channel (across videos and channels), oldest first."""
+        return self._select("WHERE author_channel = ? ORDER BY first_seen", (author_channel,))
+
+    def author_counts(self, limit: int = 100) -> List[Tuple[str, str, int]]:
+        """Return the most active authors as (author channel, author name, comment count)."""
+        with self.lock:
+            return self.conn.execute(
+                "SELECT author_channel, MAX(author), COUNT(*) AS n FROM comments "
+                "GROUP BY author_channel ORDER BY n DESC LIMIT ?", (limit,)
+            ).fetchall()
+
+    def iter_all(self, batch_size: int = 10000) -> Iterator[Dict]:
+        """Yield every stored comment in comment ID order, a batch at a time."""
+        last = ''
+        while True:
+            rows = self._select("WHERE cid > ? ORDER BY cid LIMIT ?", (last, batch_size))
+            if not rows:
+                return
+            yield from rows
+            last = rows[-1]['cid']
+
+    def export_csv(self, path) -> int:
+        """
+        Write every stored comment (once, with its latest counts) to a CSV file.
+
+        Args:
+            path: Output file path
+
+        Returns:
+            Number of comments written
+        """
+        count = 0
+        with open(Path(path), 'w', encoding='utf-8', newline='') as f:
+            writer = csv.DictWriter(f, COLUMNS, lineterminator='\n')
+            writer.writeheader()
+            for row in self.iter_all():
+                writer.writerow(row)
+                count += 1
+        return count
@@ -14,19 +14,133 @@ YOUTUBERS = [
 # Scraping settings
 MAX_VIDEOS_PER_CHANNEL = 4000  # Maximum videos to process per channel
 MAX_COMMENTS_PER_VIDEO = 200  # Maximum comments to collect per video
+VIDEO_DETAILS_BATCH_SIZE = 50  # Video IDs per videos.list request (API maximum is 50)
+INCREMENTAL_REFRESH = True  # Refresh cached video lists with videos published since the last run
 
 # Output settings
-OUTPUT_FORMAT = 'both'  # 'json', 'csv', or 'both'
+OUTPUT_FORMAT = 'both'  # 'json', 'csv', 'both', 'parquet', 'archive' (compressed .ytr) or 'all' (json + csv + parquet)
+PARQUET_ROW_GROUP_SIZE = 10000  # Rows per Parquet row group (per channel/month partition)
+PARQUET_STREAM_ROW_GROUP_SIZE = 2000  # Rows per row group when streaming (save_data_streaming)
+PARQUET_MAX_BUFFERED_ROWS = 50000  # Rows buffered across all partitions before the largest buffer is written
+PARQUET_MAX_OPEN_WRITERS = 64  # Parquet part files kept open at once
 
-# Rate limiting (in seconds)
-DELAY_BETWEEN_VIDEOS = 0.5  # Delay between processing videos
-DELAY_BETWEEN_COMMENTS = 0  # Delay between collecting comments
+# Rate limiting and retries
+# Requests per second per backend as (starting rate, minimum, maximum). The rate
+# rises while responses are healthy and is cut when a backend throttles.
+RATE_LIMITS = {
+    'data_api': (10.0, 1.0, 50.0),  # YouTube Data API
+    'transcripts': (2.0, 0.1, 10.0),  # Transcript downloads
+    'comments': (4.0, 0.2, 20.0),  # Comment page requests
+}
+RATE_INCREASE_FACTOR = 1.1  # Rate multiplier after RATE_HEALTHY_STREAK successes in a row
+RATE_HEALTHY_STREAK = 20  # Consecutive successful requests before the rate is raised
+RATE_DECREASE_FACTOR = 0.5  # Rate multiplier when a backend throttles (429/503)
+RETRY_MAX_ATTEMPTS = 6  # Attempts per request before giving up on transient errors
+RETRY_BASE_DELAY = 1.0  # Base of the exponential backoff (seconds)
+RETRY_MAX_DELAY = 300.0  # Upper bound of a single backoff (seconds)
+
+# Concurrent mode (fetch transcripts and comments for many videos in parallel)
+CONCURRENT_MODE = False  # Use worker pools instead of one video at a time
+TRANSCRIPT_WORKERS = 4  # Worker threads for transcript downloads
+COMMENT_WORKERS = 4  # Worker threads for comment downloads
+YOUTUBE_API_HOST = "www.googleapis.com"  # Host of the YouTube Data API
+
+# Async engine (async_scraper.py)
+ASYNC_MAX_CONCURRENCY = 100  # Maximum requests in flight at once
+ASYNC_BLOCKING_WORKERS = 16  # Threads for the synchronous transcript/comment libraries
+ASYNC_REQUEST_TIMEOUT = 60  # Total timeout per Data API request (seconds)
+
+# Multi-process scheduler (scheduler.py)
+SCHEDULER_WORKERS = 4  # Worker processes
+VIDEOS_PER_TASK = 50  # Videos per queued work item within a channel
+TASK_LEASE_SECONDS = 1800  # A running task is reclaimed after this long without progress (renewed per stored video)
+TASK_MAX_ATTEMPTS = 3  # Attempts before a task is marked failed
+SCHEDULER_POLL_INTERVAL = 1.0  # Seconds between queue/worker checks
+
+# YouTube Data API quota (quota.py)
+# Set H_YOUTUBE_API_KEYS="key1,key2,..." to rotate through several keys
+QUOTA_DAILY_LIMIT = 10000  # Units per key per day (reset at midnight Pacific time)
+QUOTA_RESERVE = 0  # Units per key left unused
+QUOTA_WAIT_FOR_RESET = False  # Wait for the daily reset instead of stopping when every key is spent
+QUOTA_COSTS = {  # Units per request by resource (list calls)
+    'channels': 1,
+    'playlistItems': 1,
+    'videos': 1,
+    'commentThreads': 1,
+    'search': 100,
+}
+
+# HTTP response cache for YouTube Data API calls (http_cache.py)
+HTTP_CACHE_ENABLED = True  # Serve repeated Data API requests from disk
+HTTP_CACHE_MAX_BYTES = 512 * 1024 * 1024  # Least recently used entries are evicted above this size
+HTTP_CACHE_DEFAULT_TTL = 24 * 3600  # Seconds a response stays fresh when no TTL below applies
+HTTP_CACHE_TTLS = {  # Seconds a response stays fresh, by part (the shortest requested part wins) or resource
+    'contentDetails': 7 * 24 * 3600,  # Durations, upload playlists: effectively immutable
+    'snippet': 24 * 3600,  # Titles and descriptions change rarely
+    'statistics': 3600,  # View/like/subscriber counts move quickly
+    'playlistItems': 3600,  # New uploads appear at the top of the playlist
+}
+
+# Metrics and progress reporting (metrics.py)
+METRICS_FILE = "metrics.prom"  # Written to OUTPUT_DIR on every progress report; ".json" writes JSON, None disables
+PROGRESS_INTERVAL = 30  # Seconds between progress summaries (0 disables them)
 
 # File paths
 OUTPUT_DIR = "data"  # Directory for output files
 CACHE_DIR = "cache"  # Directory for cache files
+VIDEO_STORE_FILE = "videos.sqlite"  # Per-video store of mined data (inside CACHE_DIR)
+HTTP_CACHE_FILE = "http_cache.sqlite"  # Data API response cache (inside CACHE_DIR)
+QUOTA_FILE = "quota.sqlite"  # Quota units spent per key and day (inside CACHE_DIR)
+COMMENT_STORE_FILE = "comments.sqlite"  # Deduplicated comments across runs (inside CACHE_DIR)
+TRANSCRIPT_STORE_FILE = "transcripts.sqlite"  # Timed transcript segments by video and language (inside CACHE_DIR)
+NEAR_DUP_FILE = "near_duplicates.sqlite"  # MinHash LSH index of comment clusters (inside CACHE_DIR)
+SEARCH_INDEX_FILE = "search.sqlite"  # Full-text index of titles, descriptions, transcripts and comments (inside CACHE_DIR)
+CHANNEL_IDS_FILE = "channel_ids.json"  # Channel handle -> channel ID map (inside CACHE_DIR)
+SNAPSHOT_DIR = "data/stats"  # Columnar channel/video statistics series written by snapshots
 LOG_FILE = "youtube_scraper.log"  # Log file name
 
+# Transcripts (transcripts.py)
+TRANSCRIPT_LANGUAGES = ['en']  # Preferred languages in order; manual transcripts beat generated ones per language
+TRANSCRIPT_CACHE_ENABLED = True  # Keep fetched transcripts (and videos without one) in TRANSCRIPT_STORE_FILE
+
+# Near-duplicate comments (near_duplicates.py)
+NEAR_DUP_ENABLED = True  # Tag every mined comment with its near-duplicate cluster ID
+NEAR_DUP_THRESHOLD = 0.7  # Estimated Jaccard similarity (of 5-byte shingles) at/above which comments are copies
+NEAR_DUP_MIN_CHARS = 20  # Shorter comments (after normalization) are not clustered
+NEAR_DUP_CANONICAL_ONLY = False  # Keep only the first copy of each cluster (later copies are not stored)
+
+# Full-text search index (search_index.py)
+SEARCH_INDEX_ENABLED = True  # Index every stored video's texts and comments in SEARCH_INDEX_FILE
+
+# Text analytics (text_analytics.py)
+ANALYTICS_LEXICON_FILE = None  # JSON file of lexicons (name -> terms or {term: weight}); None uses the built-in examples
+ANALYTICS_SCORES = {  # Score name -> (lexicon, opposing lexicon); score = (a - b) / (a + b) of their hits
+    'sentiment': ('positive', 'negative'),
+    'stance': ('progressive', 'conservative'),
+}
+ANALYTICS_CHUNK_SIZE = 20000  # Comments/transcripts scored per worker task
+ANALYTICS_WORKERS = None  # Worker processes (None: one per core)
+
+# Compressed record archives (record_archive.py)
+ARCHIVE_CODEC = 'zstd'  # 'zstd' (falls back to zlib if zstandard is not installed) or 'zlib'
+ARCHIVE_ZSTD_LEVEL = 9  # zstd compression level (1-22)
+ARCHIVE_CHUNK_BYTES = 1 << 20  # Uncompressed bytes per archive chunk (also the most a crash can lose of streaming output)
+CACHE_ARCHIVE = True  # Cache channel video lists as compressed archives instead of JSON
+
+# Statistics snapshots (stats_series.py, python cli.py --snapshot)
+SNAPSHOT_INTERVAL = 6 * 3600  # Seconds between snapshots with --interval and no value (snapshots bypass the HTTP cache)
+SNAPSHOT_VIDEO_MAX_AGE_DAYS = 90  # Track view/like counts of mined videos published within this many days (None: all)
+
 # Comment sorting (for YoutubeCommentDownloader)
 # 0 = Sort by relevance, 1 = Sort by recent
-COMMENT_SORT_BY = 0 
\ No newline at end of file
+COMMENT_SORT_BY = 0
+
+# Comment filters, applied while downloading (None/False disables a filter)
+COMMENT_MIN_VOTES = None  # Keep only comments with at least this many votes
+COMMENT_SINCE = None  # Keep only comments posted at/after this time, e.g. "2024-01-01T00:00:00+00:00"
+COMMENT_UNTIL = None  # Keep only comments posted at/before this time
+COMMENT_TOP_LEVEL_ONLY = False  # Skip replies (reply pages are not requested)
+COMMENT_EARLY_STOP_PATIENCE = 20  # Consecutive top-level comments past the cutoff before paging stops
+
+# Comment store (comment_store.py)
+COMMENT_STORE_ENABLED = True  # Upsert every mined comment into COMMENT_STORE_FILE, keyed by comment ID
@@ -0,0 +1,472 @@
+"""
+Lazy, indexed reader for scraped datasets
+
+VideoDataset opens previously scraped data without loading it: an output
+directory (youtube_data_*.ndjson, youtube_data_*.json and youtube_data_*.ytr
+record archives), a single output file, or the cache directory (the video
+store, videos.sqlite).
+
+Output files are indexed once into a sidecar SQLite database
+(.youtube_data_index.sqlite next to them, or .<file>.index.sqlite for a
+single file) holding, per video, the file and
+byte range of its record plus the small metadata fields, indexed by channel
+and by publication date. Opening a dataset whose files did not change only
+opens that index; metadata queries never touch the data files, and reading
+one video's comments or transcript reads that one record (for an archive,
+decompresses its one chunk). Files added since the
+last open, and lines appended to the newest NDJSON file by a running crawl,
+are indexed incrementally; changed or removed files trigger a rebuild.
+
+The video store is already keyed by video ID, so it is read in place, with
+metadata extracted inside SQLite (legacy pickle caches found next to it are
+migrated into it first).
+"""
+
+import json
+import logging
+import re
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from config import *
+from record_archive import ARCHIVE_SUFFIX, ArchiveReader
+from records import CommentRecord, comment_records
+from video_store import VideoStore, migrate_pickle
+
+logger = logging.getLogger(__name__)
+
+INDEX_FILE = ".youtube_data_index.sqlite"
+DATA_FILE_PATTERNS = ("youtube_data_*.ndjson", "youtube_data_*.json", "youtube_data_*" + ARCHIVE_SUFFIX)
+
+# Video fields kept in the index (everything but the description, transcript and comments)
+METADATA_FIELDS = ['video_id', 'channel_handle', 'channel_id', 'title', 'published_at', 'duration',
+                   'view_count', 'like_count', 'comment_count', 'processed_at']
+# Derived fields, so a query can tell what a record holds without reading it
+DERIVED_FIELDS = ['comments_scraped', 'has_transcript']
+
+INDEX_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS files (
+    file_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    indexed_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    file_id INTEGER NOT NULL,
+    offset INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    {', '.join(f'{field} TEXT' for field in METADATA_FIELDS[1:])},
+    comments_scraped INTEGER NOT NULL DEFAULT 0,
+    has_transcript INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel_handle, published_at);
+CREATE INDEX IF NOT EXISTS videos_published ON videos (published_at);
+"""
+
+# Characters that matter for finding element boundaries in a JSON array
+_JSON_STRUCTURE = re.compile(rb'[\\"{}\[\]]')
+SCAN_CHUNK_SIZE = 1 << 20
+
+
+def scan_ndjson(f, offset: int = 0) -> Iterator[Tuple[int, bytes]]:
+    """
+    Yield (offset, line) for every complete, non-empty line of a binary NDJSON file.
+
+    A last line without its newline (still being written) is left out.
+    """
+    f.seek(offset)
+    for line in f:
+        if line.endswith(b'\n') and line.strip():
+            yield offset, line.rstrip(b'\r\n')
+        offset += len(line)
+
+
+def scan_json_array(f) -> Iterator[Tuple[int, int]]:
+    """
+    Yield (offset, length) of every element of a top-level JSON array.
+
+    Reads the binary file in chunks and tracks nesting and strings, so files
+    of any size (pretty-printed or not) are scanned in constant memory.
+    """
+    depth = 0
+    in_string = False
+    escaped = -1  # position of the character escaped by a backslash
+    start = None
+    position = 0
+    while True:
+        chunk = f.read(SCAN_CHUNK_SIZE)
+        if not chunk:
+            return
+        for match in _JSON_STRUCTURE.finditer(chunk):
+            index = position + match.start()
+            if index == escaped:
+                continue
+            char = match.group()
+            if in_string:
+                if char == b'\\':
+                    escaped = index + 1
+                elif char == b'"':
+                    in_string = False
+                continue
+            if char == b'"':
+                in_string = True
+            elif char in (b'{', b'['):
+                depth += 1
+                if depth == 2:
+                    start = index
+            else:
+                if depth == 2:
+                    yield start, index + 1 - start
+                depth -= 1
+        position += len(chunk)
+
+
+def metadata_row(video: Dict) -> List:
+    """Return the indexed metadata values of a video record."""
+    row = [video.get(field) for field in METADATA_FIELDS[1:]]
+    row = [value if value is None or isinstance(value, str) else str(value) for value in row]
+    return row + [len(video.get('comments') or []), int(bool(video.get('transcript')))]
+
+
+class _FileSource:
+    """
+    NDJSON/JSON output files and record archives with a sidecar offset index.
+
+    A record's (offset, length) is its byte range in NDJSON/JSON files, and
+    its chunk's offset and its position in that chunk in archives.
+    """
+
+    def __init__(self, index_path: Path, files: List[Path]):
+        self.directory = index_path.parent
+        self.handles = {}
+        self.conn = sqlite3.connect(str(index_path), timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(INDEX_SCHEMA)
+        self._sync(files)
+        self.names = dict(self.conn.execute("SELECT file_id, name FROM files"))
+
+    def _sync(self, files: List[Path]) -> None:
+        """Bring the index up to date with the data files (sorted oldest first)."""
+        indexed = {name: (file_id, size, mtime) for file_id, name, size, mtime in
+                   self.conn.execute("SELECT file_id, name, size, mtime FROM files ORDER BY file_id")}
+        current = {path.name: path for path in files}
+        last = max(indexed) if indexed else None
+        rebuild = False
+        appended = []
+        for name, (file_id, size, mtime) in indexed.items():
+            path = current.get(name)
+            if path is None:
+                rebuild = True
+                continue
+            stat = path.stat()
+            if name == last and path.suffix == '.ndjson' and stat.st_size >= size and self._unchanged_tail(path, file_id):
+                # NDJSON outputs only grow (a crawl may still be appending)
+                if stat.st_size > size:
+                    appended.append((path, file_id, size))
+            elif (stat.st_size, stat.st_mtime) != (size, mtime):
+                rebuild = True
+        new = [path for path in files if path.name not in indexed]
+        # Later files win for videos present in several files, so a new file
+        # that sorts before an indexed one needs a rebuild too
+        if rebuild or (new and last is not None and new[0].name < last):
+            logger.info(f"Rebuilding dataset index in {self.directory}")
+            self.conn.execute("DELETE FROM videos")
+            self.conn.execute("DELETE FROM files")
+            appended, new = [], files
+        for path, file_id, size in appended:
+            self._index_file(path, file_id, size)
+        for path in new:
+            self._index_file(path)
+
+    def _index_file(self, path: Path, file_id: Optional[int] = None, start: int = 0) -> None:
+        """
+        Scan a data file and add its records to the index.
+
+        Args:
+            path: Data file
+            file_id: Index ID of an already indexed NDJSON file to resume
+            start: Byte offset to resume scanning that file from
+        """
+        stat = path.stat()
+        count = 0
+        end = start
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if file_id is None:
+                file_id = self.conn.execute(
+                    "INSERT INTO files (name, size, mtime, indexed_at) VALUES (?, ?, ?, ?)",
+                    (path.name, 0, 0, datetime.now().isoformat())
+                ).lastrowid
+            rows = []
+            for offset, length, video in self._scan(path, start):
+                rows.append([video['video_id'], file_id, offset, length] + metadata_row(video))
+                end = offset + length
+                if len(rows) >= 1000:
+                    count += self._insert(rows)
+                    rows = []
+            count += self._insert(rows)
+            # NDJSON files are recorded as indexed up to the end of their
+            # last complete line, so the rest is picked up on the next open
+            size = stat.st_size if path.suffix != '.ndjson' else self._line_end(path, end) if count else start
+            self.conn.execute(
+                "UPDATE files SET size = ?, mtime = ?, indexed_at = ? WHERE file_id = ?",
+                (size, stat.st_mtime, datetime.now().isoformat(), file_id)
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logger.info(f"Indexed {count} videos in {path.name}")
+
+    def _unchanged_tail(self, path: Path, file_id: int) -> bool:
+        """Tell whether the last indexed record of a file is still where the index says."""
+        row = self.conn.execute(
+            "SELECT video_id, offset, length FROM videos WHERE file_id = ? ORDER BY offset DESC LIMIT 1", (file_id,)
+        ).fetchone()
+        if row is None:
+            return True
+        video_id, offset, length = row
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            line = f.read(length + 1)
+        try:
+            return line.endswith(b'\n') and json.loads(line).get('video_id') == video_id
+        except ValueError:
+            return False
+
+    @staticmethod
+    def _line_end(path: Path, end: int) -> int:
+        """Return the offset just past the newline ending at or after `end`."""
+        with open(path, 'rb') as f:
+            f.seek(end)
+            return end + len(f.readline())
+
+    def _insert(self, rows: List[List]) -> int:
+        columns = ['video_id', 'file_id', 'offset', 'length'] + METADATA_FIELDS[1:] + DERIVED_FIELDS
+        self.conn.executemany(
+            f"INSERT OR REPLACE INTO videos ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})", rows
+        )
+        return len(rows)
+
+    @staticmethod
+    def _scan(path: Path, start: int = 0) -> Iterator[Tuple[int, int, Dict]]:
+        """Yield (offset, length, record) for every video record in a data file."""
+        if path.suffix == ARCHIVE_SUFFIX:
+            with ArchiveReader(path) as reader:
+                yield from reader.iter_located()
+            return
+        with open(path, 'rb') as f:
+            if path.suffix == '.ndjson':
+                for offset, line in scan_ndjson(f, start):
+                    yield offset, len(line), json.loads(line)
+                return
+            with open(path, 'rb') as records:
+                for offset, length in scan_json_array(f):
+                    records.seek(offset)
+                    yield offset, length, json.loads(records.read(length))
+
+    def query(self, where: str, params: tuple) -> List[Dict]:
+        columns = METADATA_FIELDS + DERIVED_FIELDS
+        rows = self.conn.execute(f"SELECT {', '.join(columns)} FROM videos WHERE 1 = 1 {where}", params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def channel_counts(self) -> Dict[str, int]:
+        return dict(self.conn.execute("SELECT channel_handle, COUNT(*) FROM videos GROUP BY channel_handle"))
+
+    def read(self, video_id: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT file_id, offset, length FROM videos WHERE video_id = ?",
+                                (video_id,)).fetchone()
+        if row is None:
+            return None
+        file_id, offset, length = row
+        f = self.handles.get(file_id)
+        if f is None:
+            path = self.directory / self.names[file_id]
+            f = self.handles[file_id] = ArchiveReader(path) if path.suffix == ARCHIVE_SUFFIX else open(path, 'rb')
+        if isinstance(f, ArchiveReader):
+            return f.record_at(offset, length)
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+    def close(self) -> None:
+        for f in self.handles.values():
+            f.close()
+        self.conn.close()
+
+
+class _StoreSource:
+    """The video store (cache/videos.sqlite), read in place."""
+
+    def __init__(self, db_path: Path):
+        self.store = VideoStore(db_path)
+        # Bring in legacy pickle caches left next to the store
+        for cache_file in sorted(db_path.parent.glob("*_videos.pkl")):
+            migrate_pickle(self.store, cache_file)
+
+    def query(self, where: str, params: tuple) -> List[Dict]:
+        columns = METADATA_FIELDS + DERIVED_FIELDS
+        extracts = ['video_id', 'channel_handle'] + [f"json_extract(data, '$.{field}')" for field in METADATA_FIELDS[2:]]
+        extracts += ["COALESCE(json_array_length(data, '$.comments'), 0)",
+                     "COALESCE(json_extract(data, '$.transcript'), '') != ''"]
+        # published_at is a real column of the store, so date filters use its index
+        where = where.replace('published_at', 'videos.published_at')
+        with self.store.lock:
+            rows = self.store.conn.execute(
+                f"SELECT {', '.join(extracts)} FROM videos WHERE 1 = 1 {where}", params
+            ).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count(self) -> int:
+        return len(self.store)
+
+    def channel_counts(self) -> Dict[str, int]:
+        with self.store.lock:
+            return dict(self.store.conn.execute(
+                "SELECT channel_handle, COUNT(*) FROM videos GROUP BY channel_handle"
+            ))
+
+    def read(self, video_id: str) -> Optional[Dict]:
+        with self.store.lock:
+            row = self.store.conn.execute("SELECT data FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def close(self) -> None:
+        self.store.close()
+
+
+class VideoDataset:
+    """Read-only, lazily loaded view of scraped video data."""
+
+    def __init__(self, path: str = OUTPUT_DIR):
+        """
+        Open a dataset, indexing its data files if needed.
+
+        Args:
+            path: Output directory, a youtube_data_*.ndjson/.json/.ytr file, the
+                cache directory or the video store database file
+        """
+        path = Path(path)
+        if path.is_dir() and (path / VIDEO_STORE_FILE).exists():
+            self.source = _StoreSource(path / VIDEO_STORE_FILE)
+        elif path.suffix == '.sqlite':
+            self.source = _StoreSource(path)
+        elif path.is_dir():
+            files = sorted({file for pattern in DATA_FILE_PATTERNS for file in path.glob(pattern)})
+            self.source = _FileSource(path / INDEX_FILE, files)
+        elif path.exists():
+            self.source = _FileSource(path.with_name(f".{path.name}.index.sqlite"), [path])
+        else:
+            raise FileNotFoundError(f"No dataset at {path}")
+        self.path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the index and any open data files."""
+        self.source.close()
+
+    @staticmethod
+    def _filters(channel_handle: Optional[str], since: Optional[str], until: Optional[str]) -> Tuple[str, tuple]:
+        where, params = [], []
+        if channel_handle is not None:
+            where.append("AND channel_handle = ?")
+            params.append(channel_handle)
+        if since is not None:
+            where.append("AND published_at >= ?")
+            params.append(since)
+        if until is not None:
+            where.append("AND published_at < ?")
+            params.append(until)
+        return ' '.join(where), tuple(params)
+
+    def __len__(self) -> int:
+        return self.source.count()
+
+    def __contains__(self, video_id: str) -> bool:
+        return self.metadata(video_id) is not None
+
+    def metadata(self, video_id: str) -> Optional[Dict]:
+        """Return one video's metadata (no description, transcript or comments), or None."""
+        rows = self.source.query("AND video_id = ?", (video_id,))
+        return rows[0] if rows else None
+
+    def iter_metadata(self, channel_handle: Optional[str] = None, since: Optional[str] = None,
+                      until: Optional[str] = None) -> Iterator[Dict]:
+        """
+        Yield video metadata, newest first, without reading any record.
+
+        Args:
+            channel_handle: Only videos of this channel
+            since: Only videos published at/after this ISO time, e.g. "2024-01-01"
+            until: Only videos published before this ISO time
+        """
+        where, params = self._filters(channel_handle, since, until)
+        yield from self.source.query(f"{where} ORDER BY published_at DESC", params)
+
+    def video_ids(self, channel_handle: Optional[str] = None, since: Optional[str] = None,
+                  until: Optional[str] = None) -> List[str]:
+        """Return the matching video IDs, newest first (same filters as iter_metadata)."""
+        return [video['video_id'] for video in self.iter_metadata(channel_handle, since, until)]
+
+    def channels(self) -> Dict[str, int]:
+        """Return the number of videos per channel handle."""
+        return self.source.channel_counts()
+
+    def get(self, video_id: str, transcript: bool = False, comments: bool = False) -> Optional[Dict]:
+        """
+        Read one full video record.
+
+        Args:
+            video_id: YouTube video ID
+            transcript: Include the transcript
+            comments: Include the comments (as CommentRecords)
+
+        Returns:
+            Video data dictionary, or None if the video is not in the dataset
+        """
+        video = self.source.read(video_id)
+        if video is None:
+            return None
+        if not transcript:
+            video.pop('transcript', None)
+        if comments:
+            video['comments'] = comment_records(video.get('comments') or [])
+        else:
+            video.pop('comments', None)
+        return video
+
+    def comments(self, video_id: str) -> List[CommentRecord]:
+        """Return one video's comments, reading only that video's record."""
+        video = self.source.read(video_id)
+        return comment_records(video.get('comments') or []) if video else []
+
+    def transcript(self, video_id: str) -> Optional[str]:
+        """Return one video's transcript text, reading only that video's record."""
+        video = self.source.read(video_id)
+        return video.get('transcript') if video else None
+
+    def iter_videos(self, channel_handle: Optional[str] = None, since: Optional[str] = None,
+                    until: Optional[str] = None, transcript: bool = False,
+                    comments: bool = False) -> Iterator[Dict]:
+        """Yield full video records one at a time (same filters as iter_metadata)."""
+        for video_id in self.video_ids(channel_handle, since, until):
+            video = self.get(video_id, transcript=transcript, comments=comments)
+            if video is not None:
+                yield video
+
+
+def open_dataset(path: str = OUTPUT_DIR) -> VideoDataset:
+    """Open a scraped dataset (see VideoDataset)."""
+    return VideoDataset(path)
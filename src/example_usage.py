@@ -7,7 +7,7 @@ This script demonstrates how to use the scraper with custom settings.
 
 import os
 from dotenv import load_dotenv
-from youtube_scraper import YouTubeScraper
+from youtube_scraper import YouTubeScraper, setup_logging
 
 # Load environment variables
 load_dotenv()
@@ -73,6 +73,8 @@ def example_single_channel():
     print(f"Single channel scraping completed! Processed {len(videos_data)} videos")
 
 if __name__ == "__main__":
+    setup_logging()
+    
     print("YouTube Political Study Scraper - Example Usage")
     print("=" * 50)
     
@@ -0,0 +1,485 @@
+"""
+Output writers for the YouTube Political Study Scraper
+
+Holds the flattened CSV row layouts shared by all exports, a streaming
+exporter that writes each video as soon as it is finished (NDJSON or a
+compressed record archive, plus appended CSV rows), so memory use stays
+constant regardless of crawl size, and a Parquet exporter that writes typed,
+partitioned columnar files.
+"""
+
+import csv
+import json
+import logging
+from collections import OrderedDict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config import *
+from record_archive import ARCHIVE_SUFFIX, ArchiveWriter
+from records import json_default, parse_count
+
+logger = logging.getLogger(__name__)
+
+# pyarrow is optional (Parquet output only) and slow to import, so it is
+# loaded by the first ParquetExporter rather than with this module
+pa = None
+pq = None
+
+
+def load_pyarrow() -> bool:
+    """Import pyarrow into this module on first use; return whether it is available."""
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            return False
+        pa, pq = pyarrow, pyarrow.parquet
+    return True
+
+
+# Output formats written by each OUTPUT_FORMAT setting
+OUTPUT_FORMATS = {
+    'json': {'json'},
+    'csv': {'csv'},
+    'both': {'json', 'csv'},
+    'parquet': {'parquet'},
+    'archive': {'archive'},
+    'all': {'json', 'csv', 'parquet'},
+}
+
+VIDEO_CSV_COLUMNS = [
+    'channel_handle', 'channel_id', 'video_id', 'title', 'description',
+    'published_at', 'duration', 'view_count', 'like_count', 'comment_count',
+    'transcript', 'comments_count', 'processed_at'
+]
+
+COMMENT_CSV_COLUMNS = [
+    'video_id', 'channel_handle', 'comment_id', 'comment_text', 'comment_time',
+    'comment_author', 'comment_channel', 'comment_votes', 'comment_replies', 'comment_cluster_id'
+]
+
+
+def video_csv_row(video: Dict) -> Dict:
+    """Flatten a video data dictionary into a videos CSV row."""
+    return {
+        'channel_handle': video['channel_handle'],
+        'channel_id': video['channel_id'],
+        'video_id': video['video_id'],
+        'title': video['title'],
+        'description': video['description'],
+        'published_at': video['published_at'],
+        'duration': video['duration'],
+        'view_count': video['view_count'],
+        'like_count': video['like_count'],
+        'comment_count': video['comment_count'],
+        'transcript': video['transcript'],
+        'comments_count': len(video['comments']),
+        'processed_at': video['processed_at']
+    }
+
+
+def comment_csv_rows(video: Dict) -> List[Dict]:
+    """Flatten the comments of a video data dictionary into comments CSV rows."""
+    return [
+        {
+            'video_id': video['video_id'],
+            'channel_handle': video['channel_handle'],
+            'comment_id': comment['cid'],
+            'comment_text': comment['text'],
+            'comment_time': comment['time'],
+            'comment_author': comment['author'],
+            'comment_channel': comment['channel'],
+            'comment_votes': comment['votes'],
+            'comment_replies': comment['replies'],
+            'comment_cluster_id': comment.get('cluster_id')
+        }
+        for comment in video['comments']
+    ]
+
+
+def output_formats(output_format: str) -> set:
+    """Expand an OUTPUT_FORMAT setting into the set of formats to write."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format!r}; expected one of {sorted(OUTPUT_FORMATS)}")
+    return OUTPUT_FORMATS[output_format]
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse an ISO 8601 timestamp (e.g. "2024-01-01T00:00:00Z") to an aware datetime."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+class StreamingExporter:
+    """Writes videos one at a time to NDJSON and/or CSV files."""
+
+    def __init__(self, output_dir: Path, output_format: str = 'json',
+                 timestamp: Optional[str] = None):
+        """
+        Open the output files.
+
+        Args:
+            output_dir: Directory for output files
+            output_format: Output format ('json', 'csv', 'both', 'parquet',
+                'archive' or 'all'); JSON is written as NDJSON (one video per
+                line), 'archive' as a compressed record archive (.ytr) whose
+                chunks are written every ARCHIVE_CHUNK_BYTES
+            timestamp: Suffix for the file names (defaults to the current time)
+        """
+        formats = output_formats(output_format)
+        self.output_dir = Path(output_dir)
+        self.output_format = output_format
+        self.timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.videos_written = 0
+        self.comments_written = 0
+        self.files = []
+        # Videos (channel handle and video ID) still in an archive chunk or
+        # Parquet row group being buffered
+        self.unsaved: List[Dict] = []
+        self.channel = None
+
+        self.json_file = None
+        self.archive = None
+        self.video_writer = None
+        self.comment_writer = None
+        self.parquet = None
+
+        if 'json' in formats:
+            self.json_path = self.output_dir / f"youtube_data_{self.timestamp}.ndjson"
+            self.json_file = self._open(self.json_path)
+
+        if 'archive' in formats:
+            self.archive_path = self.output_dir / f"youtube_data_{self.timestamp}{ARCHIVE_SUFFIX}"
+            self.archive = ArchiveWriter(self.archive_path, key=lambda video: video.get('video_id'))
+
+        if 'csv' in formats:
+            self.csv_path = self.output_dir / f"youtube_data_{self.timestamp}.csv"
+            self.video_writer = csv.DictWriter(self._open(self.csv_path, newline=''), VIDEO_CSV_COLUMNS,
+                                           lineterminator='\n')
+            self.video_writer.writeheader()
+
+            self.comments_csv_path = self.output_dir / f"youtube_comments_{self.timestamp}.csv"
+            self.comment_writer = csv.DictWriter(self._open(self.comments_csv_path, newline=''), COMMENT_CSV_COLUMNS,
+                                             lineterminator='\n')
+            self.comment_writer.writeheader()
+
+        if 'parquet' in formats:
+            self.parquet = ParquetExporter(self.output_dir / "parquet", self.timestamp,
+                                           row_group_size=PARQUET_STREAM_ROW_GROUP_SIZE)
+
+    def _open(self, path: Path, **kwargs):
+        f = open(path, 'w', encoding='utf-8', **kwargs)
+        self.files.append(f)
+        return f
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, video: Dict) -> List[Dict]:
+        """
+        Append one video (and its comments) to the output files.
+
+        Args:
+            video: Processed video data dictionary
+
+        Returns:
+            The videos now on disk, as {'channel_handle', 'video_id'}: this
+            one, or with archive output, none until its chunk fills or the
+            next channel starts and then every video of that chunk; with
+            Parquet output, none until the next channel starts and its part
+            files are closed
+        """
+        saved = []
+        if self.unsaved and video.get('channel_handle') != self.channel:
+            # Finish the previous channel's chunk and part files so the
+            # channel can be checkpointed
+            saved = self.flush()
+        self.channel = video.get('channel_handle')
+
+        if self.json_file is not None:
+            self.json_file.write(json.dumps(video, ensure_ascii=False, default=json_default))
+            self.json_file.write('\n')
+
+        if self.archive is not None:
+            self.archive.write(video)
+
+        if self.video_writer is not None:
+            self.video_writer.writerow(video_csv_row(video))
+            rows = comment_csv_rows(video)
+            self.comment_writer.writerows(rows)
+            self.comments_written += len(rows)
+
+        if self.parquet is not None:
+            self.parquet.write(video)
+
+        self.videos_written += 1
+        # Flush per video so finished videos are on disk if the crawl stops;
+        # an archive writes a chunk whenever ARCHIVE_CHUNK_BYTES are buffered
+        for f in self.files:
+            f.flush()
+        self.unsaved.append({'channel_handle': video.get('channel_handle'), 'video_id': video.get('video_id')})
+        if self.parquet is not None or (self.archive is not None and self.archive.buffer):
+            return saved
+        saved.extend(self.unsaved)
+        self.unsaved = []
+        return saved
+
+    def flush(self) -> List[Dict]:
+        """
+        Write any partly filled archive chunk and close the Parquet part files
+        (later rows go to new part files).
+
+        Returns:
+            The videos this put on disk, as {'channel_handle', 'video_id'}
+        """
+        if self.archive is not None:
+            self.archive.flush()
+        if self.parquet is not None:
+            self.parquet.close()
+        saved, self.unsaved = self.unsaved, []
+        return saved
+
+    def write_all(self, videos: Iterable[Dict]) -> int:
+        """
+        Write every video from an iterable (e.g. iter_channel_videos).
+
+        Returns:
+            Number of videos written
+        """
+        for video in videos:
+            self.write(video)
+        return self.videos_written
+
+    def close(self) -> None:
+        """Close the output files."""
+        for f in self.files:
+            f.close()
+        self.files = []
+        if self.archive is not None:
+            self.archive.close()
+        if self.parquet is not None:
+            self.parquet.close()
+        for path in self.paths():
+            logger.info(f"Saved data to {path}")
+
+    def paths(self) -> List[Path]:
+        """Return the paths of the files being written."""
+        paths = []
+        if self.json_file is not None:
+            paths.append(self.json_path)
+        if self.archive is not None:
+            paths.append(self.archive_path)
+        if self.video_writer is not None:
+            paths.extend([self.csv_path, self.comments_csv_path])
+        if self.parquet is not None:
+            paths.append(self.parquet.root)
+        return paths
+
+
+class ParquetExporter:
+    """
+    Writes videos and comments as Parquet datasets partitioned by channel
+    handle and publish month.
+
+    Files follow the hive layout read by pandas/pyarrow/DuckDB:
+    {root}/videos/channel_handle=@x/publish_month=2024-01/part-*.parquet
+    (and likewise under comments/). Partition values live in the directory
+    names only. Rows are buffered per partition and written as a row group
+    every PARQUET_ROW_GROUP_SIZE rows. At most PARQUET_MAX_BUFFERED_ROWS rows
+    are buffered across all partitions (the largest buffer is written when
+    the cap is hit), and a channel's partition is written and its part file
+    closed as soon as that channel's videos move on to another month (videos
+    arrive newest first), so memory stays bounded and finished months are
+    readable while a crawl is still running.
+    """
+
+    VIDEO_SCHEMA = None
+    COMMENT_SCHEMA = None
+
+    def __init__(self, root: Path, timestamp: Optional[str] = None,
+                 row_group_size: int = PARQUET_ROW_GROUP_SIZE,
+                 max_open_writers: int = PARQUET_MAX_OPEN_WRITERS,
+                 max_buffered_rows: int = PARQUET_MAX_BUFFERED_ROWS):
+        """
+        Prepare the Parquet datasets.
+
+        Args:
+            root: Directory that will hold the videos/ and comments/ datasets
+            timestamp: Suffix for the part file names (defaults to the current time)
+            row_group_size: Rows buffered per partition before a row group is written
+            max_open_writers: Maximum part files kept open at once
+            max_buffered_rows: Rows buffered across all partitions before the
+                largest buffer is written
+        """
+        if not load_pyarrow():
+            raise ImportError("Parquet output requires pyarrow (pip install pyarrow)")
+
+        if ParquetExporter.VIDEO_SCHEMA is None:
+            ParquetExporter.VIDEO_SCHEMA = pa.schema([
+                ('channel_id', pa.dictionary(pa.int32(), pa.string())),
+                ('video_id', pa.string()),
+                ('title', pa.string()),
+                ('description', pa.string()),
+                ('published_at', pa.timestamp('s', tz='UTC')),
+                ('duration', pa.string()),
+                ('view_count', pa.int64()),
+                ('like_count', pa.int64()),
+                ('comment_count', pa.int64()),
+                ('transcript', pa.string()),
+                ('comments_count', pa.int32()),
+                ('processed_at', pa.timestamp('us')),
+            ])
+            ParquetExporter.COMMENT_SCHEMA = pa.schema([
+                ('video_id', pa.dictionary(pa.int32(), pa.string())),
+                ('comment_id', pa.string()),
+                ('comment_text', pa.string()),
+                ('comment_time', pa.string()),
+                ('comment_author', pa.string()),
+                ('comment_channel', pa.string()),
+                ('comment_votes', pa.int64()),
+                ('comment_replies', pa.int64()),
+                ('comment_cluster_id', pa.int64()),
+            ])
+
+        self.root = Path(root)
+        self.timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.row_group_size = row_group_size
+        self.max_open_writers = max_open_writers
+        self.max_buffered_rows = max_buffered_rows
+        self.buffered_rows = 0
+        self.buffers: Dict[tuple, List[Dict]] = {}
+        self.current_months: Dict[str, str] = {}
+        self.writers: "OrderedDict[tuple, pq.ParquetWriter]" = OrderedDict()
+        self.part_counts: Dict[tuple, int] = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    @staticmethod
+    def _video_row(video: Dict) -> Dict:
+        processed_at = video.get('processed_at')
+        return {
+            'channel_id': video['channel_id'],
+            'video_id': video['video_id'],
+            'title': video['title'],
+            'description': video['description'],
+            'published_at': parse_timestamp(video['published_at']),
+            'duration': video['duration'],
+            'view_count': parse_count(video['view_count']),
+            'like_count': parse_count(video['like_count']),
+            'comment_count': parse_count(video['comment_count']),
+            'transcript': video['transcript'],
+            'comments_count': len(video['comments']),
+            'processed_at': datetime.fromisoformat(processed_at) if processed_at else None,
+        }
+
+    @staticmethod
+    def _comment_row(video: Dict, comment: Dict) -> Dict:
+        return {
+            'video_id': video['video_id'],
+            'comment_id': comment['cid'],
+            'comment_text': comment['text'],
+            'comment_time': comment['time'],
+            'comment_author': comment['author'],
+            'comment_channel': comment['channel'],
+            'comment_votes': parse_count(comment['votes']),
+            'comment_replies': parse_count(comment['replies']),
+            'comment_cluster_id': comment.get('cluster_id'),
+        }
+
+    def write(self, video: Dict) -> None:
+        """
+        Buffer one video and its comments, writing row groups as buffers fill.
+
+        Args:
+            video: Processed video data dictionary
+        """
+        published = parse_timestamp(video.get('published_at'))
+        month = published.strftime('%Y-%m') if published else 'unknown'
+        partition = (video['channel_handle'], month)
+
+        previous = self.current_months.get(video['channel_handle'])
+        if previous is not None and previous != month:
+            # The channel has moved on to another month: finish its partition
+            for dataset in ('videos', 'comments'):
+                self._finish((dataset, video['channel_handle'], previous))
+        self.current_months[video['channel_handle']] = month
+
+        self._append(('videos',) + partition, [self._video_row(video)])
+        self._append(('comments',) + partition,
+                     [self._comment_row(video, comment) for comment in video['comments']])
+
+    def write_all(self, videos: Iterable[Dict]) -> None:
+        """Write every video from an iterable."""
+        for video in videos:
+            self.write(video)
+
+    def _append(self, key: tuple, rows: List[Dict]) -> None:
+        if not rows:
+            return
+        buffer = self.buffers.setdefault(key, [])
+        buffer.extend(rows)
+        self.buffered_rows += len(rows)
+        if len(buffer) >= self.row_group_size:
+            self._flush(key)
+        while self.buffered_rows > self.max_buffered_rows:
+            self._flush(max(self.buffers, key=lambda k: len(self.buffers[k])))
+
+    def _finish(self, key: tuple) -> None:
+        """Write a partition's buffered rows and close its part file."""
+        self._flush(key)
+        writer = self.writers.pop(key, None)
+        if writer is not None:
+            writer.close()
+
+    def _flush(self, key: tuple) -> None:
+        rows = self.buffers.pop(key, None)
+        if not rows:
+            return
+        self.buffered_rows -= len(rows)
+
+        schema = self.VIDEO_SCHEMA if key[0] == 'videos' else self.COMMENT_SCHEMA
+        table = pa.Table.from_pylist(rows, schema=schema)
+
+        writer = self.writers.get(key)
+        if writer is None:
+            if len(self.writers) >= self.max_open_writers:
+                # Close the least recently used part file; later rows for
+                # that partition go to a new part file
+                _, oldest = self.writers.popitem(last=False)
+                oldest.close()
+            dataset, channel_handle, month = key
+            directory = self.root / dataset / f"channel_handle={channel_handle}" / f"publish_month={month}"
+            directory.mkdir(parents=True, exist_ok=True)
+            part = self.part_counts.get(key, 0)
+            self.part_counts[key] = part + 1
+            writer = pq.ParquetWriter(directory / f"part-{self.timestamp}-{part}.parquet", schema,
+                                      compression='zstd')
+            self.writers[key] = writer
+        else:
+            self.writers.move_to_end(key)
+
+        writer.write_table(table, row_group_size=self.row_group_size)
+
+    def close(self) -> None:
+        """Write remaining buffered rows and close all part files."""
+        for key in list(self.buffers):
+            self._flush(key)
+        for writer in self.writers.values():
+            writer.close()
+        self.writers.clear()
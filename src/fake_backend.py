@@ -0,0 +1,268 @@
+"""
+Offline stand-in for the YouTube backends, used by benchmark.py
+
+FakeBackend generates deterministic channels, videos, transcripts and
+comments and serves them through the same interfaces the scraper uses:
+
+- http(): an httplib2-compatible object answering Data API requests
+  (channels, playlistItems, videos) for googleapiclient
+- transcript_api(): an object with get_transcript(video_id, languages=...)
+- comment_downloader_class(): a YoutubeCommentDownloader replacement whose
+  page requests go through its requests session, so pacing and retries are
+  exercised as in a real crawl
+
+Each backend has a configurable latency and error rate. Injected errors are
+429 responses (or blocked transcript requests) with Retry-After: 0, so they
+exercise the retry path without slowing the benchmark down. Request counts
+are kept per backend.
+"""
+
+import json
+import math
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlsplit
+
+import httplib2
+import requests
+from requests.adapters import BaseAdapter
+
+FAKE_WEB_URL = "https://fake-youtube.invalid"
+COMMENTS_PER_PAGE = 20
+
+
+class RequestBlocked(Exception):
+    """Mirrors youtube-transcript-api's error for throttled transcript requests."""
+
+
+class TranscriptsDisabled(Exception):
+    """Mirrors youtube-transcript-api's error for videos without transcripts."""
+
+
+class FakeBackend:
+    """Deterministic fake Data API, transcript API and comment downloader."""
+
+    def __init__(self, videos_per_channel: int = 100, comments_per_video: int = 200,
+                 transcript_segments: int = 300, latency: Optional[Dict[str, float]] = None,
+                 error_rate: float = 0.0, no_transcript_rate: float = 0.1, seed: int = 0):
+        """
+        Configure the fake backend.
+
+        Args:
+            videos_per_channel: Uploads of every channel
+            comments_per_video: Comments available for every video
+            transcript_segments: Segments of every transcript
+            latency: Seconds of simulated latency per request, keyed by
+                'data_api', 'transcripts' and 'comments'
+            error_rate: Probability that a request fails with a throttling error
+            no_transcript_rate: Share of videos without a transcript
+            seed: Seed for generated data and injected errors
+        """
+        self.videos_per_channel = videos_per_channel
+        self.comments_per_video = comments_per_video
+        self.transcript_segments = transcript_segments
+        self.latency = {'data_api': 0.0, 'transcripts': 0.0, 'comments': 0.0}
+        self.latency.update(latency or {})
+        self.error_rate = error_rate
+        self.no_transcript_rate = no_transcript_rate
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.errors = Counter()
+        self.words = [f"word{n}" for n in range(2000)]
+
+    def _request(self, backend: str) -> bool:
+        """Count a request, wait out its latency and decide whether it fails."""
+        with self.lock:
+            self.requests[backend] += 1
+            failed = self.rng.random() < self.error_rate
+            if failed:
+                self.errors[backend] += 1
+        if self.latency[backend] > 0:
+            time.sleep(self.latency[backend])
+        return failed
+
+    def _text(self, key: str, words: int) -> str:
+        rng = random.Random(f"{self.seed}:{key}")
+        return " ".join(rng.choice(self.words) for _ in range(words))
+
+    # Data API
+
+    @staticmethod
+    def video_id(playlist_id: str, index: int) -> str:
+        """Return the ID of the index-th (oldest first) video of a playlist."""
+        return f"{playlist_id[2:]}-{index:06d}"
+
+    def _published_at(self, index: int) -> str:
+        published = datetime(2020, 1, 1, tzinfo=timezone.utc) + timedelta(hours=6 * index)
+        return published.strftime('%Y-%m-%dT%H:%M:%SZ')
+
+    def _channels(self, params: Dict) -> Dict:
+        channel_ids = params['id'].split(',') if params.get('id') else \
+            ['UC' + params.get('forHandle', 'unknown').lstrip('@')]
+        return {'items': [{
+            'id': channel_id,
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + channel_id[2:]}},
+            'snippet': {'title': channel_id[2:], 'description': ''},
+            'statistics': {'subscriberCount': '1000', 'viewCount': '100000',
+                           'videoCount': str(self.videos_per_channel)}
+        } for channel_id in channel_ids]}
+
+    def _playlist_items(self, params: Dict) -> Dict:
+        playlist_id = params['playlistId']
+        start = int(params.get('pageToken') or 0)
+        end = min(start + int(params.get('maxResults', 5)), self.videos_per_channel)
+        items = []
+        for position in range(start, end):
+            # Upload playlists are newest first
+            index = self.videos_per_channel - 1 - position
+            published_at = self._published_at(index)
+            items.append({
+                'snippet': {'publishedAt': published_at, 'title': f"Video {index}"},
+                'contentDetails': {'videoId': self.video_id(playlist_id, index),
+                                   'videoPublishedAt': published_at}
+            })
+        response = {'items': items}
+        if end < self.videos_per_channel:
+            response['nextPageToken'] = str(end)
+        return response
+
+    def _videos(self, params: Dict) -> Dict:
+        items = []
+        for video_id in params['id'].split(','):
+            channel, _, index = video_id.rpartition('-')
+            index = int(index)
+            items.append({
+                'id': video_id,
+                'snippet': {'channelId': 'UC' + channel, 'title': f"Video {index}",
+                            'description': self._text(f"description:{video_id}", 40),
+                            'publishedAt': self._published_at(index)},
+                'contentDetails': {'duration': f"PT{5 + index % 55}M"},
+                'statistics': {'viewCount': str(1000 + index * 7), 'likeCount': str(50 + index),
+                               'commentCount': str(self.comments_per_video)}
+            })
+        return {'items': items}
+
+    def http(self) -> "FakeDataApiHttp":
+        """Return an httplib2-compatible object serving the fake Data API."""
+        return FakeDataApiHttp(self)
+
+    # Transcripts
+
+    def get_transcript(self, video_id: str, languages=None):
+        """Return the transcript segments of a video (youtube-transcript-api format)."""
+        if self._request('transcripts'):
+            raise RequestBlocked(f"Request for {video_id} blocked")
+        if random.Random(f"{self.seed}:transcript:{video_id}").random() < self.no_transcript_rate:
+            raise TranscriptsDisabled(f"Transcripts are disabled for {video_id}")
+        text = self._text(f"transcript:{video_id}", self.transcript_segments * 8).split(' ')
+        return [{'text': " ".join(text[n * 8:(n + 1) * 8]), 'start': n * 4.0, 'duration': 4.0}
+                for n in range(self.transcript_segments)]
+
+    def transcript_api(self) -> "FakeBackend":
+        """Return an object providing get_transcript(video_id, languages=...)."""
+        return self
+
+    # Comments
+
+    def comment_page(self, video_id: str, page: int) -> Dict:
+        """Return one page of raw downloader comments for a video."""
+        start = page * COMMENTS_PER_PAGE
+        end = min(start + COMMENTS_PER_PAGE, self.comments_per_video)
+        comments = []
+        for n in range(start, end):
+            author = n % 97
+            votes = max(0, 5000 - n * 37)
+            comments.append({
+                'cid': f"Ug{video_id}-{n:05d}",
+                'text': self._text(f"comment:{video_id}:{n}", 12),
+                'time': f"{1 + n % 30} days ago",
+                'author': f"@viewer{author}",
+                'channel': f"UCviewer{author:020d}",
+                'votes': f"{votes / 1000:.1f}K" if votes >= 1000 else str(votes),
+                'replies': str(n % 4),
+                'photo': f"https://yt3.ggpht.invalid/{author:040d}=s176-c-k-c0x00ffffff-no-rj",
+                'heart': n % 50 == 0,
+                'reply': False,
+                'time_parsed': 1700000000.0 - n * 3600
+            })
+        return {'comments': comments, 'pages': math.ceil(self.comments_per_video / COMMENTS_PER_PAGE)}
+
+    def comment_downloader_class(self):
+        """Return a YoutubeCommentDownloader replacement bound to this backend."""
+        backend = self
+
+        class FakeCommentDownloader:
+            def __init__(self):
+                self.session = requests.Session()
+                self.session.mount(FAKE_WEB_URL, FakeWebAdapter(backend))
+
+            def get_comments_from_url(self, youtube_url, sort_by=0, language=None, sleep=.1):
+                video_id = parse_qs(urlsplit(youtube_url).query)['v'][0]
+                page = pages = 0
+                while page == 0 or page < pages:
+                    response = self.session.get(f"{FAKE_WEB_URL}/comments",
+                                                params={'v': video_id, 'page': page})
+                    data = response.json()
+                    pages = data['pages']
+                    yield from data['comments']
+                    page += 1
+
+        return FakeCommentDownloader
+
+
+class FakeDataApiHttp:
+    """httplib2-compatible Data API server backed by a FakeBackend."""
+
+    def __init__(self, backend: FakeBackend):
+        self.backend = backend
+        self.timeout = None
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        parts = urlsplit(uri)
+        params = {key: values[0] for key, values in parse_qs(parts.query).items()}
+        resource = parts.path.rstrip('/').rsplit('/', 1)[-1]
+
+        if self.backend._request('data_api'):
+            return (httplib2.Response({'status': 429, 'retry-after': '0'}),
+                    json.dumps({'error': {'code': 429, 'errors': [{'reason': 'rateLimitExceeded'}]}}).encode())
+        handlers = {
+            'channels': self.backend._channels,
+            'playlistItems': self.backend._playlist_items,
+            'videos': self.backend._videos,
+        }
+        if resource not in handlers:
+            return httplib2.Response({'status': 404}), b'{"error": {"code": 404, "errors": []}}'
+        content = json.dumps(handlers[resource](params)).encode()
+        return httplib2.Response({'status': 200, 'content-type': 'application/json'}), content
+
+
+class FakeWebAdapter(BaseAdapter):
+    """requests transport adapter serving fake comment pages."""
+
+    def __init__(self, backend: FakeBackend):
+        super().__init__()
+        self.backend = backend
+
+    def send(self, request, **kwargs):
+        response = requests.Response()
+        response.request = request
+        response.url = request.url
+        if self.backend._request('comments'):
+            response.status_code = 429
+            response.headers['Retry-After'] = '0'
+            response._content = b''
+            return response
+        params = {key: values[0] for key, values in parse_qs(urlsplit(request.url).query).items()}
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response._content = json.dumps(self.backend.comment_page(params['v'], int(params['page']))).encode()
+        return response
+
+    def close(self):
+        pass
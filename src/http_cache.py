@@ -0,0 +1,241 @@
+"""
+Persistent HTTP response cache for YouTube Data API calls
+
+ResponseCache stores GET responses in a SQLite database keyed by method and
+URL (with the API key removed). Each entry's freshness comes from per-part
+TTLs: an entry lives as long as the shortest TTL among the `part`s it
+requested, so contentDetails-only lookups are kept for days while statistics
+expire within the hour. Stale entries with an ETag are revalidated with
+If-None-Match instead of being downloaded again, and the total size of the
+cache is capped with least-recently-used eviction.
+
+CachingHttp plugs the cache into googleapiclient by wrapping the httplib2
+object passed to build(http=...). Requests marked with bypass_cache() (sent
+with Cache-Control: no-cache) always go to the API; their responses still
+refresh the cache.
+"""
+
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    cache_key TEXT PRIMARY KEY,
+    resource TEXT NOT NULL,
+    etag TEXT,
+    stored_at REAL NOT NULL,
+    expires_at REAL NOT NULL,
+    last_access REAL NOT NULL,
+    size INTEGER NOT NULL,
+    content BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_lru ON responses (last_access);
+"""
+
+# Query parameters that do not change the response
+IGNORED_PARAMS = {'key', 'alt', 'prettyPrint', 'quotaUser'}
+
+
+def bypass_cache(request):
+    """Mark a googleapiclient request so CachingHttp fetches it from the API, and return it."""
+    request.headers['cache-control'] = 'no-cache'
+    return request
+
+
+def wants_fresh(headers: Optional[Dict[str, str]]) -> bool:
+    """Tell whether request headers ask for a response that is not served from a cache."""
+    return any(name.lower() == 'cache-control' and 'no-cache' in value.lower()
+               for name, value in (headers or {}).items())
+
+
+def cache_key(method: str, uri: str) -> Tuple[str, str, Dict[str, str]]:
+    """
+    Normalize a request into a cache key.
+
+    Args:
+        method: HTTP method
+        uri: Request URI
+
+    Returns:
+        (cache key, API resource name, query parameters)
+    """
+    parts = urlsplit(uri)
+    params = {k: v for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in IGNORED_PARAMS}
+    normalized = urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(params.items())), ''))
+    resource = parts.path.rstrip('/').rsplit('/', 1)[-1]
+    return f"{method.upper()} {normalized}", resource, params
+
+
+class ResponseCache:
+    """SQLite-backed, size-bounded cache of API responses."""
+
+    def __init__(self, db_path: str, ttls: Optional[Dict[str, float]] = None,
+                 default_ttl: float = HTTP_CACHE_DEFAULT_TTL,
+                 max_bytes: int = HTTP_CACHE_MAX_BYTES):
+        """
+        Open (and create if needed) the cache.
+
+        Args:
+            db_path: Path of the SQLite database file
+            ttls: Seconds an entry stays fresh, keyed by API `part` name or by
+                resource name (e.g. 'playlistItems')
+            default_ttl: TTL for requests matching no entry in ttls
+            max_bytes: Total content size above which least recently used
+                entries are evicted
+        """
+        self.db_path = str(db_path)
+        self.ttls = dict(HTTP_CACHE_TTLS if ttls is None else ttls)
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def ttl_for(self, resource: str, params: Dict[str, str]) -> float:
+        """Return the TTL of a request: the shortest TTL of its resource and parts."""
+        candidates = [self.ttls[resource]] if resource in self.ttls else []
+        for part in params.get('part', '').split(','):
+            part = part.strip()
+            if part in self.ttls:
+                candidates.append(self.ttls[part])
+        return min(candidates) if candidates else self.default_ttl
+
+    def lookup(self, key: str) -> Optional[Dict]:
+        """
+        Look up an entry.
+
+        Returns:
+            Dictionary with 'content', 'etag' and 'fresh', or None if absent
+        """
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content, etag, expires_at FROM responses WHERE cache_key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.conn.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (now, key))
+        return {'content': row[0], 'etag': row[1], 'fresh': row[2] > now}
+
+    def store(self, key: str, resource: str, content: bytes, ttl: float,
+              etag: Optional[str] = None) -> None:
+        """
+        Store a response and evict old entries if the cache is over its size limit.
+
+        Args:
+            key: Cache key from cache_key()
+            resource: API resource name
+            content: Response body
+            ttl: Seconds the entry stays fresh
+            etag: ETag of the response (for revalidation)
+        """
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(cache_key, resource, etag, stored_at, expires_at, last_access, size, content) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, resource, etag, now, now + ttl, now, len(content), content)
+            )
+            self._evict()
+
+    def refresh(self, key: str, ttl: float) -> None:
+        """Mark an entry fresh again after a successful revalidation."""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "UPDATE responses SET stored_at = ?, expires_at = ?, last_access = ? WHERE cache_key = ?",
+                (now, now + ttl, now, key)
+            )
+
+    def _evict(self) -> None:
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # Drop least recently used entries until we are back under 90% of the limit
+        target = self.max_bytes * 0.9
+        rows = self.conn.execute("SELECT cache_key, size FROM responses ORDER BY last_access").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= target:
+                break
+            evicted.append((key,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE cache_key = ?", evicted)
+        logger.info(f"Evicted {len(evicted)} entries from the HTTP response cache")
+
+    def clear(self) -> None:
+        """Remove every entry."""
+        with self.lock:
+            self.conn.execute("DELETE FROM responses")
+
+
+class CachingHttp:
+    """httplib2-compatible wrapper that serves GET requests from a ResponseCache."""
+
+    def __init__(self, http, cache: ResponseCache):
+        """
+        Wrap an HTTP object.
+
+        Args:
+            http: httplib2.Http (or compatible) object that performs requests
+            cache: Response cache
+        """
+        self.http = http
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # Anything we do not override (timeouts, credentials, ...) comes
+        # from the wrapped object
+        return getattr(self.http, name)
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        """Perform a request, answering GETs from the cache when possible."""
+        if method.upper() != "GET":
+            return self.http.request(uri, method, body, headers, *args, **kwargs)
+
+        import httplib2
+
+        key, resource, params = cache_key(method, uri)
+        ttl = self.cache.ttl_for(resource, params)
+        entry = None if wants_fresh(headers) else self.cache.lookup(key)
+
+        if entry is not None and entry['fresh']:
+            self.cache.hits += 1
+            return httplib2.Response({'status': 200, 'content-type': 'application/json',
+                                      'x-from-cache': '1'}), entry['content']
+
+        headers = dict(headers or {})
+        if entry is not None and entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+
+        resp, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+
+        if resp.status == 304 and entry is not None:
+            self.cache.revalidations += 1
+            self.cache.refresh(key, ttl)
+            return httplib2.Response({'status': 200, 'content-type': 'application/json',
+                                      'etag': entry['etag'] or '', 'x-from-cache': '1'}), entry['content']
+
+        self.cache.misses += 1
+        if resp.status == 200:
+            self.cache.store(key, resource, content, ttl, resp.get('etag'))
+        return resp, content
@@ -0,0 +1,290 @@
+"""
+Job specs, sharding and checkpoints for the YouTube Political Study Scraper
+
+A job file (JSON) describes a crawl: the channels, the per-channel and
+per-video limits, comment filters, transcript languages and the output
+format and directory. Anything it leaves out falls back to config.py.
+
+A job can be split across machines with shards: shard i of N takes every
+N-th channel of the job's channel list starting at the i-th, so all machines
+must run the same job file.
+
+A checkpoint file records, per job and shard, every video written to the
+output and every channel finished. Each run writes its own output files
+(youtube_data_<time>_<job>[-shardIofN]-run<n>.*), so together the runs'
+files hold every video of the shard exactly once. It is an append-only NDJSON log flushed
+after each entry, so an interrupted run loses at most the entry being
+written, and a rerun skips finished channels and already written videos and
+continues exactly where the last run stopped.
+"""
+
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+# Job fields and their defaults (from config.py)
+JOB_DEFAULTS = {
+    'name': None,
+    'channels': YOUTUBERS,
+    'max_videos_per_channel': MAX_VIDEOS_PER_CHANNEL,
+    'max_comments_per_video': MAX_COMMENTS_PER_VIDEO,
+    'output_format': OUTPUT_FORMAT,
+    'output_dir': OUTPUT_DIR,
+    'concurrent': CONCURRENT_MODE,
+    'transcript_languages': TRANSCRIPT_LANGUAGES,
+    'filters': {
+        'min_votes': COMMENT_MIN_VOTES,
+        'since': COMMENT_SINCE,
+        'until': COMMENT_UNTIL,
+        'top_level_only': COMMENT_TOP_LEVEL_ONLY,
+    },
+}
+OUTPUT_FORMAT_NAMES = {'json', 'csv', 'both', 'parquet', 'archive', 'all'}
+
+
+def normalize_job(job: Dict) -> Dict:
+    """
+    Fill in defaults and validate a job spec.
+
+    Args:
+        job: Job fields (any subset of JOB_DEFAULTS)
+
+    Returns:
+        Complete job spec
+
+    Raises:
+        ValueError: If the spec has unknown fields or invalid values
+    """
+    unknown = set(job) - set(JOB_DEFAULTS)
+    if unknown:
+        raise ValueError(f"Unknown job fields: {', '.join(sorted(unknown))}")
+    filters = dict(JOB_DEFAULTS['filters'])
+    unknown = set(job.get('filters') or {}) - set(filters)
+    if unknown:
+        raise ValueError(f"Unknown comment filters: {', '.join(sorted(unknown))}")
+    filters.update(job.get('filters') or {})
+
+    spec = {**JOB_DEFAULTS, **job, 'filters': filters}
+    if isinstance(spec['channels'], str):
+        spec['channels'] = [spec['channels']]
+    spec['channels'] = [channel.strip() for channel in spec['channels'] if channel and channel.strip()]
+    if not spec['channels']:
+        raise ValueError("The job lists no channels")
+    if len(set(spec['channels'])) != len(spec['channels']):
+        raise ValueError("The job lists a channel more than once")
+    for field in ('max_videos_per_channel', 'max_comments_per_video'):
+        if not isinstance(spec[field], int) or spec[field] < 0:
+            raise ValueError(f"{field} must be a non-negative integer")
+    if spec['output_format'] not in OUTPUT_FORMAT_NAMES:
+        raise ValueError(f"output_format must be one of {', '.join(sorted(OUTPUT_FORMAT_NAMES))}")
+    return spec
+
+
+def load_job(path) -> Dict:
+    """
+    Read a job file.
+
+    Args:
+        path: JSON file with the job fields; the job name defaults to the
+            file name
+
+    Returns:
+        Complete job spec (see normalize_job)
+    """
+    path = Path(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        job = json.load(f)
+    if not isinstance(job, dict):
+        raise ValueError(f"{path} must hold a JSON object")
+    job.setdefault('name', path.stem)
+    return normalize_job(job)
+
+
+def parse_shard(text: str) -> Tuple[int, int]:
+    """
+    Parse a shard given as "i/N" (1-based, e.g. "2/4" for the second of four).
+
+    Returns:
+        (i, N)
+    """
+    try:
+        index, count = (int(part) for part in text.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N (e.g. 2/4), not {text!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard {text} is out of range (i must be between 1 and N)")
+    return index, count
+
+
+def shard_channels(channels: List[str], index: int, count: int) -> List[str]:
+    """Return the channels of shard index/count: every count-th channel from the index-th."""
+    return channels[index - 1::count]
+
+
+def job_fingerprint(job: Dict, shard: Tuple[int, int]) -> str:
+    """Return an identifier of a job spec and shard (what a checkpoint belongs to)."""
+    # Whether the crawl runs concurrently does not change its result
+    fields = {key: value for key, value in job.items() if key != 'concurrent'}
+    canonical = json.dumps({'job': fields, 'shard': list(shard)}, sort_keys=True, default=str)
+    return hashlib.sha1(canonical.encode('utf-8')).hexdigest()[:16]
+
+
+def read_checkpoint(path) -> Iterator[Dict]:
+    """Yield the entries of a checkpoint file, skipping a line cut short by an interruption."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for number, line in enumerate(f):
+            try:
+                yield json.loads(line)
+            except ValueError:
+                logger.warning(f"Ignoring an incomplete entry in {path} (line {number + 1})")
+
+
+class CheckpointMismatch(Exception):
+    """A checkpoint file belongs to a different job or shard."""
+
+
+class Checkpoint:
+    """Append-only record of the channels and videos a job has finished."""
+
+    def __init__(self, path, job: Dict, shard: Tuple[int, int] = (1, 1), restart: bool = False):
+        """
+        Open (and create if needed) a checkpoint.
+
+        Args:
+            path: Checkpoint file
+            job: Complete job spec
+            shard: (i, N) shard of the job this run covers
+            restart: Discard an existing checkpoint instead of resuming it
+
+        Raises:
+            CheckpointMismatch: If the file was written for another job spec
+                or shard (and restart is False)
+        """
+        self.path = Path(path)
+        self.fingerprint = job_fingerprint(job, shard)
+        self.name = (job.get('name') or 'job') + (f"-shard{shard[0]}of{shard[1]}" if shard[1] > 1 else '')
+        self.started = datetime.now()
+        self.done_channels: set = set()
+        self.done_videos: Dict[str, set] = {}
+        self.runs = 0
+        # Videos handed to the output and videos it reported written; a
+        # crawled channel waits in pending until all its videos are written
+        self.yielded = 0
+        self.saved = 0
+        self.pending = deque()
+
+        if self.path.exists() and not restart:
+            self._load()
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'w', encoding='utf-8') as f:
+                f.write(json.dumps({'type': 'job', 'fingerprint': self.fingerprint, 'job': job,
+                                    'shard': f"{shard[0]}/{shard[1]}",
+                                    'created_at': datetime.now().isoformat()}) + '\n')
+        self.file = open(self.path, 'a', encoding='utf-8')
+        if self._ends_mid_line():
+            self.file.write('\n')
+        self.runs += 1
+        self._append({'type': 'run', 'run': self.runs, 'started_at': self.started.isoformat(), 'pid': os.getpid()})
+
+    def _load(self) -> None:
+        for entry in read_checkpoint(self.path):
+            kind = entry.get('type')
+            if kind == 'job' and entry.get('fingerprint') != self.fingerprint:
+                raise CheckpointMismatch(
+                    f"{self.path} belongs to a different job or shard; "
+                    f"use another checkpoint file or restart the job"
+                )
+            if kind == 'video':
+                self.done_videos.setdefault(entry['channel'], set()).add(entry['video_id'])
+            elif kind == 'channel':
+                self.done_channels.add(entry['channel'])
+            elif kind == 'run':
+                self.runs += 1
+
+    def _ends_mid_line(self) -> bool:
+        """Tell whether the file ends with an entry cut short by an interruption."""
+        with open(self.path, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() == 0:
+                return False
+            f.seek(-1, os.SEEK_END)
+            return f.read(1) != b'\n'
+
+    def _append(self, entry: Dict) -> None:
+        self.file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.file.flush()
+
+    def close(self) -> None:
+        """Close the checkpoint file."""
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def output_suffix(self) -> str:
+        """Return a file name suffix unique to this run of the job shard (for the output files)."""
+        return f"{self.started:%Y%m%d_%H%M%S}_{self.name}-run{self.runs}"
+
+    @property
+    def video_ids(self) -> set:
+        """Every video written by earlier runs of this job."""
+        return set().union(*self.done_videos.values()) if self.done_videos else set()
+
+    def track(self, videos: Iterable[Dict]) -> Iterator[Dict]:
+        """Pass videos on to the output, counting them for channel_crawled()."""
+        for video in videos:
+            self.yielded += 1
+            yield video
+
+    def video_done(self, channel_handle: str, video_id: str) -> None:
+        """Record that a video was written to the output."""
+        self.done_videos.setdefault(channel_handle, set()).add(video_id)
+        self._append({'type': 'video', 'channel': channel_handle, 'video_id': video_id})
+        self.saved += 1
+        self._release()
+
+    def channel_crawled(self, channel_handle: str) -> None:
+        """
+        Record a channel as finished once every video tracked so far is written.
+
+        The crawl reports a channel right after its last video, which the
+        output may still be buffering (archive chunks, Parquet row groups),
+        so the channel entry waits until video_done() has caught up.
+        """
+        self.pending.append((channel_handle, self.yielded))
+        self._release()
+
+    def _release(self) -> None:
+        while self.pending and self.pending[0][1] <= self.saved:
+            self.channel_done(self.pending.popleft()[0])
+
+    def channel_done(self, channel_handle: str) -> None:
+        """Record that every video of a channel was written."""
+        self.done_channels.add(channel_handle)
+        self._append({'type': 'channel', 'channel': channel_handle,
+                      'videos': len(self.done_videos.get(channel_handle, ())),
+                      'finished_at': datetime.now().isoformat()})
+
+    def remaining(self, channels: List[str]) -> List[str]:
+        """Return the channels not finished yet, in order."""
+        return [channel for channel in channels if channel not in self.done_channels]
+
+
+def default_checkpoint_path(job: Dict, shard: Tuple[int, int]) -> Path:
+    """Return the default checkpoint file of a job shard (inside the job's output directory)."""
+    name = job.get('name') or 'job'
+    suffix = f".shard{shard[0]}of{shard[1]}" if shard[1] > 1 else ''
+    return Path(job['output_dir']) / f"{name}{suffix}.checkpoint.jsonl"
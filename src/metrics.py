@@ -0,0 +1,409 @@
+"""
+Crawl metrics for the YouTube Political Study Scraper
+
+A process-wide registry (METRICS) collects per-stage timings and counters:
+
+- stage latency histograms, call and error counts, and items and bytes
+  processed for playlist paging, video details, transcripts, comments,
+  cache IO and export
+- per-backend request attempts, request latency, retries, throttling
+  responses, requests given up on, and time spent waiting on the rate limiter
+
+ProgressReporter logs a periodic progress summary with an ETA and the share of
+time spent in each stage, and writes the metrics to METRICS_FILE as Prometheus
+text (or JSON for a .json file), so a slow crawl shows at a glance which
+backend is the bottleneck.
+"""
+
+import bisect
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+# Stage names
+STAGE_PLAYLIST = 'playlist'
+STAGE_VIDEO_DETAILS = 'video_details'
+STAGE_TRANSCRIPT = 'transcript'
+STAGE_COMMENTS = 'comments'
+STAGE_CACHE_IO = 'cache_io'
+STAGE_EXPORT = 'export'
+STAGES = (STAGE_PLAYLIST, STAGE_VIDEO_DETAILS, STAGE_TRANSCRIPT, STAGE_COMMENTS, STAGE_CACHE_IO, STAGE_EXPORT)
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+METRIC_PREFIX = 'ytb_'
+METRIC_HELP = {
+    'stage_seconds': ('histogram', "Time spent per call of a crawl stage"),
+    'stage_errors_total': ('counter', "Stage calls that raised an error"),
+    'items_total': ('counter', "Items processed per stage (videos, comments, transcript segments, ...)"),
+    'bytes_total': ('counter', "Bytes (characters of text or JSON) processed per stage"),
+    'requests_total': ('counter', "Request attempts per backend"),
+    'request_seconds': ('histogram', "Latency of a single request attempt per backend"),
+    'request_errors_total': ('counter', "Request attempts that failed per backend"),
+    'retries_total': ('counter', "Requests retried after a transient failure per backend"),
+    'throttled_total': ('counter', "Throttling responses (429/503, rate-limit errors) per backend"),
+    'request_failures_total': ('counter', "Requests given up on after every retry per backend"),
+    'rate_wait_seconds_total': ('counter', "Time spent waiting on the rate limiter per backend"),
+    'transcript_cache_total': ('counter', "Transcript cache lookups by result (hit, missing, miss)"),
+    'videos_total': ('counter', "Videos finished in this run"),
+    'videos_planned': ('gauge', "Videos left to mine when the crawl was planned"),
+    'rate': ('gauge', "Current request rate per backend (requests per second)"),
+    'http_cache_events': ('gauge', "HTTP response cache hits, misses and revalidations"),
+    'quota_used': ('gauge', "Data API units spent today per key"),
+    'uptime_seconds': ('gauge', "Seconds since the metrics were reset"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Latency histogram with fixed bucket upper bounds."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = tuple(buckets)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        """Record one observation."""
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Return the upper bound of the bucket holding the q-quantile (None if empty)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return math.inf
+
+    def to_dict(self) -> Dict:
+        return {
+            'count': self.count,
+            'sum': round(self.sum, 6),
+            'p50': self.quantile(0.5),
+            'p90': self.quantile(0.9),
+            'p99': self.quantile(0.99),
+            'buckets': {str(bound): count for bound, count in zip(self.bounds + ('+Inf',), self.counts)},
+        }
+
+
+class Metrics:
+    """Thread-safe registry of counters, gauges and histograms with labels."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        """Clear every recorded value."""
+        with self.lock:
+            self.started = time.monotonic()
+            self.counters: Dict[Tuple[str, Labels], float] = {}
+            self.gauges: Dict[Tuple[str, Labels], float] = {}
+            self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: Dict[str, str]) -> Tuple[str, Labels]:
+        return name, tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+    def inc(self, name: str, amount: float = 1, **labels) -> None:
+        """Add to a counter."""
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge."""
+        key = self._key(name, labels)
+        with self.lock:
+            self.gauges[key] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Record an observation in a histogram."""
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        """Return the value of a counter (0 if never incremented)."""
+        with self.lock:
+            return self.counters.get(self._key(name, labels), 0)
+
+    def gauge(self, name: str, **labels) -> Optional[float]:
+        """Return the value of a gauge (None if never set)."""
+        with self.lock:
+            return self.gauges.get(self._key(name, labels))
+
+    def histogram(self, name: str, **labels) -> Optional[Histogram]:
+        """Return a histogram (None if nothing was observed)."""
+        with self.lock:
+            return self.histograms.get(self._key(name, labels))
+
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        Time a block as one call of a crawl stage.
+
+        An exception leaving the block is counted as a stage error and
+        re-raised.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.inc('stage_errors_total', stage=stage)
+            raise
+        finally:
+            self.observe('stage_seconds', time.perf_counter() - start, stage=stage)
+
+    def record(self, stage: str, items: int = 0, size: int = 0) -> None:
+        """Count items and bytes processed by a stage."""
+        if items:
+            self.inc('items_total', items, stage=stage)
+        if size:
+            self.inc('bytes_total', size, stage=stage)
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Return calls, errors, total and median seconds, items and bytes per stage."""
+        summary = {}
+        for stage in STAGES:
+            histogram = self.histogram('stage_seconds', stage=stage)
+            if histogram is None:
+                continue
+            summary[stage] = {
+                'calls': histogram.count,
+                'errors': int(self.counter('stage_errors_total', stage=stage)),
+                'seconds': round(histogram.sum, 3),
+                'p50': histogram.quantile(0.5),
+                'items': int(self.counter('items_total', stage=stage)),
+                'bytes': int(self.counter('bytes_total', stage=stage)),
+            }
+        return summary
+
+    def to_dict(self) -> Dict:
+        """Return every metric as a JSON-serializable dictionary."""
+        self.set_gauge('uptime_seconds', round(time.monotonic() - self.started, 3))
+
+        def labelled(entries, convert=lambda value: value):
+            out = {}
+            for (name, labels), value in sorted(entries.items()):
+                out.setdefault(name, []).append({'labels': dict(labels), 'value': convert(value)})
+            return out
+
+        with self.lock:
+            return {
+                'counters': labelled(self.counters),
+                'gauges': labelled(self.gauges),
+                'histograms': labelled(self.histograms, Histogram.to_dict),
+            }
+
+    def to_prometheus(self) -> str:
+        """Return every metric in the Prometheus text exposition format."""
+        self.set_gauge('uptime_seconds', round(time.monotonic() - self.started, 3))
+
+        def label_text(labels: Labels, extra: Tuple = ()) -> str:
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ''
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                       for _, value in pairs)
+            return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+        series: Dict[str, List[str]] = {}
+        with self.lock:
+            for (name, labels), value in sorted({**self.counters, **self.gauges}.items()):
+                series.setdefault(name, []).append(f"{METRIC_PREFIX}{name}{label_text(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                lines = series.setdefault(name, [])
+                cumulative = 0
+                for bound, count in zip(histogram.bounds + (math.inf,), histogram.counts):
+                    cumulative += count
+                    le = '+Inf' if bound == math.inf else f"{bound:g}"
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{label_text(labels, (('le', le),))} {cumulative}")
+                lines.append(f"{METRIC_PREFIX}{name}_sum{label_text(labels)} {histogram.sum:g}")
+                lines.append(f"{METRIC_PREFIX}{name}_count{label_text(labels)} {histogram.count}")
+
+        out = []
+        for name, lines in series.items():
+            kind, help_text = METRIC_HELP.get(name, ('untyped', name))
+            out.append(f"# HELP {METRIC_PREFIX}{name} {help_text}")
+            out.append(f"# TYPE {METRIC_PREFIX}{name} {kind}")
+            out.extend(lines)
+        return '\n'.join(out) + '\n'
+
+    def write(self, path) -> None:
+        """
+        Write the metrics to a file, replacing it atomically.
+
+        Args:
+            path: Output path; a .json suffix writes JSON, anything else
+                Prometheus text (e.g. for the node_exporter textfile collector)
+        """
+        path = Path(path)
+        if path.suffix == '.json':
+            content = json.dumps(self.to_dict(), indent=2)
+        else:
+            content = self.to_prometheus()
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+
+# Registry shared by everything in this process
+METRICS = Metrics()
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as H:MM:SS."""
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class ProgressReporter:
+    """
+    Periodic progress summary with ETA, backed by a metrics registry.
+
+    Between start() and stop() a daemon thread reports every `interval`
+    seconds, so the summary keeps coming while a backend stalls on one video.
+    """
+
+    def __init__(self, metrics: Metrics = METRICS, path: Optional[str] = None,
+                 interval: float = PROGRESS_INTERVAL,
+                 collector: Optional[Callable[[Metrics], None]] = None):
+        """
+        Initialize the reporter.
+
+        Args:
+            metrics: Registry to summarize
+            path: File the metrics are written to on every report (None
+                disables the file)
+            interval: Seconds between summaries (0 or less disables them)
+            collector: Called with the registry before every report, to
+                refresh gauges such as the current request rates
+        """
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.collector = collector
+        self.report_lock = threading.Lock()
+        self.stopped = None
+        self._reset_pace()
+
+    def _reset_pace(self) -> None:
+        self.started = time.monotonic()
+        self.last_report = self.started
+        self.done_at_start = self.metrics.counter('videos_total')
+
+    def start(self) -> None:
+        """Start timing a crawl (the ETA is based on the pace since then) and the periodic reports."""
+        self._reset_pace()
+        if self.stopped is not None:
+            self.stopped.set()
+        self.stopped = threading.Event()
+        if self.interval > 0:
+            threading.Thread(target=self._run, args=(self.stopped,), name="progress", daemon=True).start()
+
+    def stop(self) -> None:
+        """Stop the periodic reports and log a final one."""
+        if self.stopped is not None:
+            self.stopped.set()
+        self.report()
+
+    def _run(self, stopped: threading.Event) -> None:
+        while not stopped.wait(max(1.0, self.interval - (time.monotonic() - self.last_report))):
+            self.maybe_report()
+
+    def video_done(self) -> None:
+        """Count a finished video and report if the interval has passed."""
+        self.metrics.inc('videos_total')
+        self.maybe_report()
+
+    def maybe_report(self) -> None:
+        """Report if at least `interval` seconds passed since the last report."""
+        if self.interval > 0 and time.monotonic() - self.last_report >= self.interval:
+            self.report()
+
+    def summary(self) -> str:
+        """Return a one-line progress summary."""
+        elapsed = time.monotonic() - self.started
+        done = self.metrics.counter('videos_total') - self.done_at_start
+        planned = self.metrics.gauge('videos_planned')
+        pace = done / elapsed if elapsed > 0 else 0.0
+
+        parts = [f"{int(done)} videos"]
+        if planned:
+            parts[0] = f"{int(done)}/{int(planned)} videos ({done / planned:.1%})"
+        parts.append(f"{pace * 60:.1f} videos/min")
+        if planned and pace > 0:
+            parts.append(f"ETA {format_duration(max(0.0, planned - done) / pace)}")
+        elif planned:
+            parts.append("ETA unknown")
+
+        stages = self.metrics.stage_summary()
+        total = sum(stage['seconds'] for stage in stages.values()) or 1.0
+        by_time = sorted(stages.items(), key=lambda item: item[1]['seconds'], reverse=True)
+        stage_text = ", ".join(
+            f"{name} {stage['seconds'] / total:.0%} (p50 {stage['p50']:g}s"
+            f"{', %d errors' % stage['errors'] if stage['errors'] else ''})"
+            for name, stage in by_time if stage['calls']
+        )
+        if stage_text:
+            parts.append(f"time in {stage_text}")
+
+        backends = []
+        for backend in sorted(RATE_LIMITS):
+            requests = self.metrics.counter('requests_total', backend=backend)
+            if not requests:
+                continue
+            text = f"{backend} {int(requests)} req"
+            retries = self.metrics.counter('retries_total', backend=backend)
+            if retries:
+                text += f", {int(retries)} retries"
+            waited = self.metrics.counter('rate_wait_seconds_total', backend=backend)
+            if waited >= 1:
+                text += f", {format_duration(waited)} rate-limited"
+            backends.append(text)
+        if backends:
+            parts.append("; ".join(backends))
+        return "Progress: " + " | ".join(parts)
+
+    def report(self) -> None:
+        """Log the progress summary and write the metrics file."""
+        with self.report_lock:
+            self._report()
+
+    def _report(self) -> None:
+        self.last_report = time.monotonic()
+        if self.collector is not None:
+            try:
+                self.collector(self.metrics)
+            except Exception as e:
+                logger.warning(f"Failed to collect metrics: {e}")
+        logger.info(self.summary())
+        if self.path:
+            try:
+                self.metrics.write(self.path)
+            except Exception as e:
+                logger.warning(f"Failed to write metrics to {self.path}: {e}")
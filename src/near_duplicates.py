@@ -0,0 +1,338 @@
+"""
+Near-duplicate comment detection for the YouTube Political Study Scraper
+
+Copy-pasted and bot comments are grouped into clusters as they are mined,
+across videos and channels, without comparing comments pairwise:
+
+- A comment's text is normalized (case, accents, punctuation and whitespace)
+  and cut into overlapping 5-byte shingles.
+- A 64-value MinHash signature of the shingle set estimates the Jaccard
+  similarity between two comments: the share of equal values.
+- The signature is split into 16 bands of 4 values (locality-sensitive
+  hashing). Each band is hashed to a bucket, so comments with a similarity
+  above about 0.5 share at least one bucket with high probability.
+- The clusters found in the comment's buckets (a bucket lists up to
+  MAX_BUCKET_CLUSTERS of them) are verified against their
+  first comment's stored signature. The comment joins the most similar one at
+  NEAR_DUP_THRESHOLD or above, and otherwise starts a new cluster.
+
+Each comment costs a fixed number of index lookups, whatever the number of
+comments seen before. Only a cluster's first comment (its canonical copy)
+adds buckets and a signature to the index; later copies only record their
+cluster. Signatures keep the low 8 bits of each MinHash value (b-bit
+MinHash), 64 bytes per cluster, and the similarity estimate corrects for
+the chance collisions this adds.
+
+Comments shorter than NEAR_DUP_MIN_CHARS after normalization ("first",
+"lol") are too short to tell copies from coincidences and are not
+clustered.
+"""
+
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import unicodedata
+import zlib
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from config import *
+from metrics import METRICS, STAGE_CACHE_IO
+
+logger = logging.getLogger(__name__)
+
+np = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clusters (
+    cluster_id INTEGER PRIMARY KEY,
+    canonical_cid TEXT NOT NULL,
+    video_id TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    signature BLOB NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS buckets (
+    bucket INTEGER NOT NULL,
+    cluster_id INTEGER NOT NULL,
+    PRIMARY KEY (bucket, cluster_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS members (
+    cid_hash INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    canonical INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS clusters_size ON clusters (size);
+"""
+
+SHINGLE_SIZE = 5  # Bytes per shingle
+PERMUTATIONS = 64  # MinHash values per signature
+BANDS = 16  # LSH bands (PERMUTATIONS / BANDS values each)
+ROWS = PERMUTATIONS // BANDS
+SIGNATURE_BITS = 8  # Low bits of each MinHash value kept in stored signatures
+# Clusters listed per bucket; beyond this a bucket (e.g. of a very common
+# template) adds no more candidates, so a lookup verifies at most
+# BANDS * MAX_BUCKET_CLUSTERS signatures
+MAX_BUCKET_CLUSTERS = 32
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+
+def load_numpy():
+    """Import numpy into this module on first use and return it."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase a comment, strip accents and reduce punctuation and whitespace to single spaces."""
+    text = text or ''
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def cid_hash(cid: str) -> int:
+    """Return the 64-bit (signed) key of a comment ID in the members table."""
+    return int.from_bytes(hashlib.blake2b(cid.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+class MinHasher:
+    """Computes MinHash signatures and LSH band keys of texts."""
+
+    def __init__(self, seed: int = 1):
+        """
+        Draw the hash functions.
+
+        Args:
+            seed: Seed of the hash functions (signatures from different seeds
+                cannot be compared)
+        """
+        load_numpy()
+        state = np.random.RandomState(seed)
+        # Multiply-shift hashing of 32-bit values: (a * h + b) mod 2**64, top
+        # 32 bits, with a odd; numpy's uint64 arithmetic wraps around
+        high = np.iinfo(np.uint64).max
+        self.a = (state.randint(0, high, size=PERMUTATIONS, dtype=np.uint64) | np.uint64(1))[:, None]
+        self.b = state.randint(0, high, size=PERMUTATIONS, dtype=np.uint64)[:, None]
+
+    @staticmethod
+    def shingle_hashes(text: str):
+        """Return the distinct 32-bit hashes of a normalized text's byte shingles."""
+        data = np.frombuffer(text.encode('utf-8'), dtype=np.uint8).astype(np.uint64)
+        count = len(data) - SHINGLE_SIZE + 1
+        if count < 1:
+            data = np.pad(data, (0, SHINGLE_SIZE - len(data)))
+            count = 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(SHINGLE_SIZE):
+            hashes = hashes * np.uint64(0x100000001B3) + data[offset:offset + count]
+        # Fold the 64-bit polynomial hash to 32 well-mixed bits
+        hashes ^= hashes >> np.uint64(29)
+        hashes *= np.uint64(0xBF58476D1CE4E5B9)
+        hashes ^= hashes >> np.uint64(32)
+        return np.unique(hashes & np.uint64(0xFFFFFFFF))
+
+    def signature(self, text: str):
+        """Return the MinHash signature (PERMUTATIONS uint64 values) of a normalized text."""
+        hashes = self.shingle_hashes(text)
+        return ((self.a * hashes + self.b) >> np.uint64(32)).min(axis=1)
+
+    @staticmethod
+    def band_keys(signature) -> List[int]:
+        """Return the LSH bucket of each band of a signature (band number in the high bits)."""
+        return [(band << 32) | zlib.crc32(signature[band * ROWS:(band + 1) * ROWS].tobytes())
+                for band in range(BANDS)]
+
+    @staticmethod
+    def compact(signature) -> bytes:
+        """Return the stored form of a signature (low SIGNATURE_BITS of each value)."""
+        return (signature & np.uint64((1 << SIGNATURE_BITS) - 1)).astype(np.uint8).tobytes()
+
+    @staticmethod
+    def similarity(first: bytes, second: bytes) -> float:
+        """Estimate the Jaccard similarity of two texts from their stored signatures."""
+        matches = np.count_nonzero(np.frombuffer(first, np.uint8) == np.frombuffer(second, np.uint8))
+        chance = 1.0 / (1 << SIGNATURE_BITS)
+        return max(0.0, (matches / PERMUTATIONS - chance) / (1.0 - chance))
+
+
+class NearDuplicateIndex:
+    """SQLite-backed MinHash LSH index assigning comments to near-duplicate clusters."""
+
+    def __init__(self, db_path: str, threshold: float = NEAR_DUP_THRESHOLD,
+                 min_chars: int = NEAR_DUP_MIN_CHARS):
+        """
+        Open (and create if needed) the index.
+
+        Args:
+            db_path: Path of the SQLite database file
+            threshold: Estimated Jaccard similarity at/above which a comment
+                joins a cluster
+            min_chars: Comments shorter than this (normalized) are not
+                clustered
+        """
+        self.db_path = str(db_path)
+        self.threshold = threshold
+        self.min_chars = min_chars
+        # Built on first use, so opening the index does not import numpy
+        self._hasher = None
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._migrate_buckets()
+
+    def _migrate_buckets(self) -> None:
+        """Rekey a buckets table from before buckets held several clusters."""
+        columns = self.conn.execute("PRAGMA table_info(buckets)").fetchall()
+        if sum(1 for column in columns if column[5]) != 1:
+            return
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("ALTER TABLE buckets RENAME TO buckets_old")
+            self.conn.execute("CREATE TABLE buckets (bucket INTEGER NOT NULL, cluster_id INTEGER NOT NULL, "
+                              "PRIMARY KEY (bucket, cluster_id)) WITHOUT ROWID")
+            self.conn.execute("INSERT INTO buckets SELECT bucket, cluster_id FROM buckets_old")
+            self.conn.execute("DROP TABLE buckets_old")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logger.info("Rekeyed the near-duplicate buckets table to (bucket, cluster_id)")
+
+    @property
+    def hasher(self) -> MinHasher:
+        """MinHash signature and band key functions."""
+        if self._hasher is None:
+            self._hasher = MinHasher()
+        return self._hasher
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def __len__(self) -> int:
+        """Number of clusters (distinct comments, up to near-duplicates)."""
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM clusters").fetchone()[0]
+
+    def _assign_one(self, video_id: str, cid: str, text: str) -> Tuple[Optional[int], bool]:
+        key = cid_hash(cid)
+        row = self.conn.execute("SELECT cluster_id, canonical FROM members WHERE cid_hash = ?", (key,)).fetchone()
+        if row:
+            return row[0], bool(row[1])
+
+        normalized = normalize_text(text)
+        if len(normalized) < self.min_chars:
+            return None, True
+
+        signature = self.hasher.signature(normalized)
+        compact = self.hasher.compact(signature)
+        buckets = self.hasher.band_keys(signature)
+        candidates = {cluster_id for (cluster_id,) in self.conn.execute(
+            f"SELECT DISTINCT cluster_id FROM buckets WHERE bucket IN ({','.join('?' * len(buckets))})", buckets
+        )}
+
+        best, best_similarity = None, self.threshold
+        stored_signatures = self.conn.execute(
+            f"SELECT cluster_id, signature FROM clusters WHERE cluster_id IN ({','.join('?' * len(candidates))})",
+            list(candidates)
+        ).fetchall() if candidates else []
+        for cluster_id, stored in stored_signatures:
+            similarity = self.hasher.similarity(compact, stored)
+            if similarity >= best_similarity:
+                best, best_similarity = cluster_id, similarity
+
+        if best is not None:
+            self.conn.execute("UPDATE clusters SET size = size + 1 WHERE cluster_id = ?", (best,))
+            self.conn.execute("INSERT INTO members (cid_hash, cluster_id, canonical) VALUES (?, ?, 0)", (key, best))
+            return best, False
+
+        cluster_id = self.conn.execute(
+            "INSERT INTO clusters (canonical_cid, video_id, size, signature, created_at) VALUES (?, ?, 1, ?, ?)",
+            (cid, video_id, compact, datetime.now().isoformat())
+        ).lastrowid
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO buckets (bucket, cluster_id) SELECT ?, ? "
+            "WHERE (SELECT COUNT(*) FROM buckets WHERE bucket = ?) < ?",
+            [(bucket, cluster_id, bucket, MAX_BUCKET_CLUSTERS) for bucket in buckets]
+        )
+        self.conn.execute("INSERT INTO members (cid_hash, cluster_id, canonical) VALUES (?, ?, 1)", (key, cluster_id))
+        return cluster_id, True
+
+    def assign(self, video_id: str, comments: Sequence[Dict]) -> List[Tuple[Optional[int], bool]]:
+        """
+        Assign the comments of one video to clusters.
+
+        A comment seen before keeps its cluster. Copies within the same batch
+        are matched against each other too.
+
+        Args:
+            video_id: YouTube video ID of the comments
+            comments: Comment dictionaries or CommentRecords (cid and text)
+
+        Returns:
+            (cluster ID, whether the comment is its cluster's canonical copy)
+            per comment; the cluster ID is None for comments too short to
+            cluster (these count as canonical)
+        """
+        results = []
+        with METRICS.stage(STAGE_CACHE_IO), self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                for comment in comments:
+                    cid = comment.get('cid')
+                    results.append(self._assign_one(video_id, cid, comment.get('text') or '')
+                                   if cid else (None, True))
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        METRICS.record(STAGE_CACHE_IO, items=len(results))
+        return results
+
+    def tag(self, video_id: str, comments: List, canonical_only: bool = False) -> List:
+        """
+        Set the cluster_id of CommentRecords, optionally keeping canonical copies only.
+
+        Args:
+            video_id: YouTube video ID of the comments
+            comments: CommentRecords of the video
+            canonical_only: Drop comments that copy an earlier comment
+
+        Returns:
+            The (kept) comments
+        """
+        kept = []
+        for comment, (cluster_id, canonical) in zip(comments, self.assign(video_id, comments)):
+            comment.cluster_id = cluster_id
+            if canonical or not canonical_only:
+                kept.append(comment)
+        return kept
+
+    def cluster(self, cluster_id: int) -> Optional[Dict]:
+        """Return a cluster's canonical comment ID, its video, size and creation time (None if unknown)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT cluster_id, canonical_cid, video_id, size, created_at FROM clusters WHERE cluster_id = ?",
+                (cluster_id,)
+            ).fetchone()
+        return dict(zip(('cluster_id', 'canonical_cid', 'video_id', 'size', 'created_at'), row)) if row else None
+
+    def largest_clusters(self, limit: int = 100, min_size: int = 2) -> List[Dict]:
+        """Return the clusters with the most copies (likely spam or copy-paste campaigns), largest first."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT cluster_id, canonical_cid, video_id, size, created_at FROM clusters "
+                "WHERE size >= ? ORDER BY size DESC LIMIT ?", (min_size, limit)
+            ).fetchall()
+        return [dict(zip(('cluster_id', 'canonical_cid', 'video_id', 'size', 'created_at'), row)) for row in rows]
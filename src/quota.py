@@ -0,0 +1,306 @@
+"""
+YouTube Data API quota accounting and key rotation
+
+Every Data API request costs quota units (QUOTA_COSTS), and each API key gets
+QUOTA_DAILY_LIMIT units per day, reset at midnight Pacific time. QuotaLedger
+records the units spent per key and day in SQLite, so the count survives
+restarts and is shared by scheduler worker processes. KeyPool spreads requests
+over several keys, always using the key with the most budget left, and
+QuotaHttp applies it to googleapiclient by rewriting the `key` parameter of
+every outgoing request.
+
+When every key is spent, QuotaExhausted is raised (or, with
+QUOTA_WAIT_FOR_RESET, the request waits for the daily reset). Mined videos are
+already in the video store at that point, so the next run resumes the crawl.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Union
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+from config import *
+from retry import api_error_reasons
+
+logger = logging.getLogger(__name__)
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TIMEZONE = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database available; Pacific standard time is close enough
+    QUOTA_TIMEZONE = timezone(timedelta(hours=-8))
+
+# Data API error reasons meaning the key has no quota left today
+QUOTA_REASONS = {'quotaExceeded', 'dailyLimitExceeded'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS usage (
+    key_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    units INTEGER NOT NULL,
+    PRIMARY KEY (key_id, day)
+);
+"""
+
+
+class QuotaExhausted(Exception):
+    """Every API key has used up its daily quota."""
+
+    def __init__(self, reset_at: datetime):
+        super().__init__(f"Data API quota exhausted for every key; resets at {reset_at.isoformat()}")
+        self.reset_at = reset_at
+
+
+def load_api_keys() -> List[str]:
+    """
+    Read API keys from the environment.
+
+    H_YOUTUBE_API_KEYS holds a comma-separated list of keys; H_YOUTUBE_API_KEY
+    (a single key) is used when it is not set. A .env file is loaded first
+    (without overriding variables that are already set).
+
+    Returns:
+        List of API keys (empty if none are configured)
+    """
+    import dotenv
+    dotenv.load_dotenv()
+    keys = os.getenv("H_YOUTUBE_API_KEYS") or os.getenv("H_YOUTUBE_API_KEY") or ""
+    return [key.strip() for key in keys.split(",") if key.strip()]
+
+
+def key_id(api_key: str) -> str:
+    """Return a stable identifier for a key that does not reveal the key."""
+    return hashlib.sha1(api_key.encode('utf-8')).hexdigest()[:12]
+
+
+def quota_day(now: Optional[datetime] = None) -> str:
+    """Return the quota day (Pacific date) of a moment, defaulting to now."""
+    return (now or datetime.now(timezone.utc)).astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+
+def next_reset(now: Optional[datetime] = None) -> datetime:
+    """Return the next daily quota reset (midnight Pacific time)."""
+    local = (now or datetime.now(timezone.utc)).astimezone(QUOTA_TIMEZONE)
+    return (local + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def request_cost(uri: str) -> Optional[int]:
+    """
+    Return the quota cost of a Data API request.
+
+    Args:
+        uri: Request URI
+
+    Returns:
+        Cost in units, or None if the URI is not a Data API call
+    """
+    path = urlsplit(uri).path
+    if '/youtube/v3/' not in path:
+        return None
+    resource = path.rstrip('/').rsplit('/', 1)[-1]
+    return QUOTA_COSTS.get(resource, 1)
+
+
+def with_key(uri: str, api_key: str) -> str:
+    """Return uri with its `key` query parameter replaced by api_key."""
+    parts = urlsplit(uri)
+    params = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k != 'key']
+    params.append(('key', api_key))
+    return urlunsplit(parts._replace(query=urlencode(params)))
+
+
+class QuotaLedger:
+    """Units spent per API key and quota day, stored in SQLite."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the ledger.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def used(self, key: str, day: str) -> int:
+        """Return the units a key (by key_id) has spent on a day."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT units FROM usage WHERE key_id = ? AND day = ?", (key, day)
+            ).fetchone()
+        return row[0] if row else 0
+
+    def charge(self, key: str, day: str, units: int, limit: int) -> bool:
+        """
+        Spend units of a key's budget if it has enough left.
+
+        The check and the update happen in one transaction, so processes
+        sharing the ledger never overspend a key.
+
+        Args:
+            key: Key identifier (key_id)
+            day: Quota day
+            units: Units to spend
+            limit: Units the key may spend that day
+
+        Returns:
+            True if the units were charged
+        """
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self.conn.execute(
+                    "SELECT units FROM usage WHERE key_id = ? AND day = ?", (key, day)
+                ).fetchone()
+                used = row[0] if row else 0
+                if used + units > limit:
+                    self.conn.execute("COMMIT")
+                    return False
+                self.conn.execute(
+                    "INSERT INTO usage (key_id, day, units) VALUES (?, ?, ?) "
+                    "ON CONFLICT (key_id, day) DO UPDATE SET units = units + excluded.units",
+                    (key, day, units)
+                )
+                self.conn.execute("COMMIT")
+                return True
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def set_used(self, key: str, day: str, units: int) -> None:
+        """Record that a key has spent at least `units` on a day."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO usage (key_id, day, units) VALUES (?, ?, ?) "
+                "ON CONFLICT (key_id, day) DO UPDATE SET units = MAX(units, excluded.units)",
+                (key, day, units)
+            )
+
+
+class KeyPool:
+    """Rotates Data API requests across keys within their daily budgets."""
+
+    def __init__(self, api_keys: Union[str, List[str]], ledger: QuotaLedger,
+                 daily_limit: int = QUOTA_DAILY_LIMIT, reserve: int = QUOTA_RESERVE,
+                 wait_for_reset: bool = QUOTA_WAIT_FOR_RESET):
+        """
+        Initialize the pool.
+
+        Args:
+            api_keys: API key or list of keys
+            ledger: Ledger recording the units spent
+            daily_limit: Units each key may spend per day
+            reserve: Units per key left unused
+            wait_for_reset: Wait for the daily reset instead of raising
+                QuotaExhausted when every key is spent
+        """
+        self.api_keys = [api_keys] if isinstance(api_keys, str) else list(api_keys)
+        if not self.api_keys:
+            raise ValueError("At least one API key is required")
+        self.ledger = ledger
+        self.budget = daily_limit - reserve
+        self.wait_for_reset = wait_for_reset
+
+    def remaining(self, api_key: Optional[str] = None) -> int:
+        """Return the units left today for one key, or for all keys together."""
+        day = quota_day()
+        keys = self.api_keys if api_key is None else [api_key]
+        return sum(max(0, self.budget - self.ledger.used(key_id(key), day)) for key in keys)
+
+    def usage(self) -> Dict[str, int]:
+        """Return the units spent today per key identifier."""
+        day = quota_day()
+        return {key_id(key): self.ledger.used(key_id(key), day) for key in self.api_keys}
+
+    def try_acquire(self, cost: int) -> Optional[str]:
+        """
+        Charge cost units to the key with the most budget left.
+
+        Returns:
+            The charged key, or None if no key can afford the request
+        """
+        day = quota_day()
+        for key in sorted(self.api_keys, key=self.remaining, reverse=True):
+            if self.ledger.charge(key_id(key), day, cost, self.budget):
+                return key
+        return None
+
+    def acquire(self, cost: int) -> str:
+        """
+        Charge cost units to a key, waiting for the daily reset if configured.
+
+        Returns:
+            The charged key
+
+        Raises:
+            QuotaExhausted: If no key can afford the request
+        """
+        while True:
+            key = self.try_acquire(cost)
+            if key is not None:
+                return key
+            reset_at = next_reset()
+            if not self.wait_for_reset:
+                raise QuotaExhausted(reset_at)
+            delay = (reset_at - datetime.now(timezone.utc)).total_seconds() + 60
+            logger.warning(f"Data API quota exhausted for every key; waiting {delay / 3600:.1f}h for the reset")
+            time.sleep(max(delay, 60))
+
+    def mark_exhausted(self, api_key: str) -> None:
+        """Record that the API reported a key as out of quota for today."""
+        logger.warning(f"API key {key_id(api_key)} is out of quota for today; rotating")
+        self.ledger.set_used(key_id(api_key), quota_day(), self.budget)
+
+    def plan(self, units: int) -> str:
+        """Describe whether a crawl needing `units` fits in today's remaining budget."""
+        remaining = self.remaining()
+        verdict = "fits" if units <= remaining else "exceeds"
+        return (f"~{units} Data API units needed, {remaining} left today across "
+                f"{len(self.api_keys)} key(s): {verdict} the budget")
+
+
+class QuotaHttp:
+    """httplib2-compatible wrapper that charges and rotates API keys per request."""
+
+    def __init__(self, http, pool: KeyPool):
+        """
+        Wrap an HTTP object.
+
+        Args:
+            http: httplib2.Http (or compatible) object that performs requests
+            pool: Key pool used to pick and charge a key for each request
+        """
+        self.http = http
+        self.pool = pool
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+    def request(self, uri, method="GET", body=None, headers=None, *args, **kwargs):
+        """Send a request with a key that has budget left, rotating on quota errors."""
+        cost = request_cost(uri)
+        if cost is None:
+            return self.http.request(uri, method, body, headers, *args, **kwargs)
+
+        while True:
+            api_key = self.pool.acquire(cost)
+            resp, content = self.http.request(with_key(uri, api_key), method, body, headers, *args, **kwargs)
+            if resp.status == 403 and api_error_reasons(content) & QUOTA_REASONS:
+                self.pool.mark_exhausted(api_key)
+                continue
+            return resp, content
@@ -0,0 +1,280 @@
+"""
+Request pacing for the YouTube Political Study Scraper
+
+Provides a thread-safe token-bucket limiter keyed by backend, so that
+concurrent workers hitting the same backend share one polite request budget,
+an adaptive variant that speeds up while responses are healthy and backs off
+when the backend throttles, and an asyncio bucket for the async scraper.
+"""
+
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import *
+
+# Backend names (keys of RATE_LIMITS)
+DATA_API = 'data_api'
+TRANSCRIPTS = 'transcripts'
+COMMENTS = 'comments'
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at a fixed rate."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second (0 or less disables limiting)
+            burst: Maximum number of tokens that can accumulate
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate, keeping the tokens accumulated so far."""
+        with self.lock:
+            self._refill()
+            self.rate = rate
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for the given number of seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * max(self.rate, 0))
+        self.updated = now
+
+    def acquire(self, tokens: float = 1) -> float:
+        """
+        Block until the requested tokens are available and consume them.
+
+        Args:
+            tokens: Number of tokens to consume
+
+        Returns:
+            Seconds spent waiting
+        """
+        waited = 0.0
+        while True:
+            with self.lock:
+                self._refill()
+                delay = self.blocked_until - time.monotonic()
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return waited
+                    delay = (tokens - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class RateLimiter:
+    """Per-backend collection of token buckets."""
+
+    def __init__(self, host_rates: Optional[Dict[str, float]] = None,
+                 default_rate: float = 0, burst: int = 1):
+        """
+        Initialize the limiter.
+
+        Args:
+            host_rates: Mapping of backend (or host) name to allowed requests
+                per second
+            default_rate: Rate used for backends not listed in host_rates
+            burst: Bucket size for each backend
+        """
+        self.host_rates = dict(host_rates or {})
+        self.default_rate = default_rate
+        self.burst = burst
+        self.buckets: Dict[str, TokenBucket] = {}
+        self.lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Return the bucket for a backend, creating it on first use."""
+        with self.lock:
+            if host not in self.buckets:
+                rate = self.host_rates.get(host, self.default_rate)
+                self.buckets[host] = TokenBucket(rate, self.burst)
+            return self.buckets[host]
+
+    def acquire(self, host: str, tokens: float = 1) -> float:
+        """
+        Wait for permission to send a request to a backend.
+
+        Args:
+            host: Backend (or host) name the request is addressed to
+            tokens: Number of tokens to consume
+
+        Returns:
+            Seconds spent waiting
+        """
+        return self.bucket(host).acquire(tokens)
+
+
+class AdaptiveRate:
+    """
+    Multiplicative-increase/multiplicative-decrease control of a bucket's rate.
+
+    After every `healthy_streak` successful requests in a row the rate is
+    multiplied by `increase`, up to max_rate. A throttling response multiplies
+    it by `decrease`, down to min_rate, and pauses the bucket for Retry-After
+    seconds when the server sent one. Both steps are proportional to the
+    current rate, and the increase is small and only taken after a healthy
+    streak, so the rate climbs slowly and falls fast.
+    """
+
+    def __init__(self, bucket, min_rate: float, max_rate: float,
+                 increase: float = RATE_INCREASE_FACTOR,
+                 decrease: float = RATE_DECREASE_FACTOR,
+                 healthy_streak: int = RATE_HEALTHY_STREAK):
+        """
+        Initialize the controller.
+
+        Args:
+            bucket: TokenBucket or AsyncTokenBucket whose rate is controlled
+            min_rate: Lowest rate (requests per second)
+            max_rate: Highest rate (requests per second)
+            increase: Rate multiplier after a healthy streak
+            decrease: Rate multiplier on a throttling response
+            healthy_streak: Consecutive successes before the rate is raised
+        """
+        self.bucket = bucket
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.healthy_streak = max(1, healthy_streak)
+        self.streak = 0
+        self.lock = threading.Lock()
+
+    def success(self) -> None:
+        """Record a successful request."""
+        with self.lock:
+            self.streak += 1
+            if self.streak < self.healthy_streak or self.bucket.rate <= 0:
+                return
+            self.streak = 0
+            rate = min(self.max_rate, self.bucket.rate * self.increase)
+        if rate != self.bucket.rate:
+            self.bucket.set_rate(rate)
+
+    def throttled(self, retry_after: Optional[float] = None) -> None:
+        """Record a throttling response (429/503 or a rate-limit error)."""
+        with self.lock:
+            self.streak = 0
+            rate = max(self.min_rate, self.bucket.rate * self.decrease) if self.bucket.rate > 0 else 0
+        self.bucket.set_rate(rate)
+        if retry_after:
+            self.bucket.pause(retry_after)
+
+
+class AdaptiveRateLimiter(RateLimiter):
+    """Per-backend token buckets whose rates adapt to backend health."""
+
+    def __init__(self, limits: Optional[Dict[str, Tuple[float, float, float]]] = None):
+        """
+        Initialize the limiter.
+
+        Args:
+            limits: Mapping of backend name to (starting rate, minimum rate,
+                maximum rate) in requests per second; defaults to RATE_LIMITS
+        """
+        limits = dict(RATE_LIMITS if limits is None else limits)
+        super().__init__({backend: start for backend, (start, _, _) in limits.items()})
+        self.controllers = {
+            backend: AdaptiveRate(self.bucket(backend), min_rate, max_rate)
+            for backend, (_, min_rate, max_rate) in limits.items()
+        }
+
+    def success(self, backend: str) -> None:
+        """Record a successful request to a backend."""
+        controller = self.controllers.get(backend)
+        if controller is not None:
+            controller.success()
+
+    def throttled(self, backend: str, retry_after: Optional[float] = None) -> None:
+        """Record a throttling response from a backend."""
+        controller = self.controllers.get(backend)
+        if controller is not None:
+            controller.throttled(retry_after)
+        elif retry_after:
+            self.bucket(backend).pause(retry_after)
+
+    def rates(self) -> Dict[str, float]:
+        """Return the current rate of every backend."""
+        return {backend: bucket.rate for backend, bucket in self.buckets.items()}
+
+
+class AsyncTokenBucket:
+    """Token bucket for coroutines running on a single event loop."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        """
+        Initialize the bucket.
+
+        Args:
+            rate: Tokens added per second (0 or less disables limiting)
+            burst: Maximum number of tokens that can accumulate
+        """
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.tokens = float(self.burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = None
+
+    def set_rate(self, rate: float) -> None:
+        """Change the refill rate, keeping the tokens accumulated so far."""
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.rate = rate
+
+    def pause(self, seconds: float) -> None:
+        """Hold back every request for the given number of seconds."""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    async def acquire(self, tokens: float = 1) -> float:
+        """
+        Wait until the requested tokens are available and consume them.
+
+        Args:
+            tokens: Number of tokens to consume
+
+        Returns:
+            Seconds spent waiting
+        """
+        if self.rate <= 0 and self.blocked_until <= time.monotonic():
+            return 0.0
+        if self.lock is None:
+            # Created lazily so the lock binds to the running event loop
+            self.lock = asyncio.Lock()
+
+        waited = 0.0
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * max(self.rate, 0))
+                self.updated = now
+                delay = self.blocked_until - now
+                if delay <= 0:
+                    if self.rate <= 0:
+                        return waited
+                    if self.tokens >= tokens:
+                        self.tokens -= tokens
+                        return waited
+                    delay = (tokens - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
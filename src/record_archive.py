@@ -0,0 +1,499 @@
+"""
+Compressed record archives for the YouTube Political Study Scraper
+
+A record archive (*.ytr) holds JSON records (videos, playlist items) in
+independently compressed chunks, with an index of the chunks at the end:
+
+    header   b'YTRARCH1'
+    chunk    CHUNK_HEADER (b'CHNK', codec, records, raw size, compressed size)
+             + the chunk's records as compressed NDJSON
+    ...
+    index    CHUNK_HEADER (b'INDX', ...) + compressed JSON list of
+             [offset, records, raw size, compressed size, keys] per chunk
+    trailer  index offset (8 bytes) + b'YTRAEND\\n'
+
+Chunks are compressed with zstd (the zstandard package) when it is installed
+and with zlib otherwise; the codec is recorded per chunk. Comment text and
+transcripts compress several times over. Chunks are written as soon as they
+fill (or on flush), so writing streams with bounded memory, and migrate()
+reads JSON files record by record. The index lets a
+reader list records and find one record's chunk without decompressing
+anything else. An archive whose writer was interrupted has no index; it is
+read by walking the chunk headers, up to the last complete chunk, and one
+cut short before its first chunk reads as empty.
+
+    python record_archive.py migrate           # convert existing caches and outputs
+    python record_archive.py info data/youtube_data_20240101_000000.ytr
+    python record_archive.py cat data/youtube_data_20240101_000000.ytr --key VIDEO_ID
+"""
+
+import argparse
+import json
+import logging
+import os
+import struct
+import zlib
+from itertools import zip_longest
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from config import *
+from records import json_default
+
+logger = logging.getLogger(__name__)
+
+zstd = None
+
+ARCHIVE_SUFFIX = '.ytr'
+FILE_MAGIC = b'YTRARCH1'
+CHUNK_MAGIC = b'CHNK'
+INDEX_MAGIC = b'INDX'
+TRAILER_MAGIC = b'YTRAEND\n'
+# magic, codec, record count, uncompressed size, compressed size
+CHUNK_HEADER = struct.Struct('<4sBIII')
+TRAILER = struct.Struct('<Q8s')
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {CODEC_ZLIB: 'zlib', CODEC_ZSTD: 'zstd'}
+
+
+def load_zstd() -> bool:
+    """Import zstandard into this module on first use; return whether it is available."""
+    global zstd
+    if zstd is None:
+        try:
+            import zstandard
+        except ImportError:
+            return False
+        zstd = zstandard
+    return True
+
+
+def compress(data: bytes, codec: int, level: int) -> bytes:
+    """Compress a chunk payload."""
+    if codec == CODEC_ZSTD:
+        return zstd.ZstdCompressor(level=level).compress(data)
+    return zlib.compress(data, level)
+
+
+def decompress(data: bytes, codec: int, raw_size: int) -> bytes:
+    """Decompress a chunk payload."""
+    if codec == CODEC_ZSTD:
+        if not load_zstd():
+            raise RuntimeError("This archive is zstd-compressed; install the zstandard package to read it")
+        return zstd.ZstdDecompressor().decompress(data, max_output_size=raw_size)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown archive codec {codec}")
+
+
+def is_archive(path) -> bool:
+    """Tell whether a file is a record archive (by its header)."""
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(FILE_MAGIC)) == FILE_MAGIC
+    except OSError:
+        return False
+
+
+class ArchiveWriter:
+    """Streams JSON records into a record archive."""
+
+    def __init__(self, path, key: Optional[Callable[[Dict], Optional[str]]] = None,
+                 chunk_bytes: int = ARCHIVE_CHUNK_BYTES, codec: str = ARCHIVE_CODEC,
+                 level: Optional[int] = None):
+        """
+        Create (or overwrite) an archive.
+
+        Args:
+            path: Archive file
+            key: Returns the lookup key of a record (e.g. its video ID);
+                None stores no keys
+            chunk_bytes: Uncompressed bytes buffered before a chunk is written
+            codec: 'zstd' (falls back to zlib if zstandard is not installed)
+                or 'zlib'
+            level: Compression level (default: ARCHIVE_ZSTD_LEVEL or 6 for zlib)
+        """
+        self.path = Path(path)
+        self.key = key
+        self.chunk_bytes = chunk_bytes
+        if codec == 'zstd' and not load_zstd():
+            logger.warning("zstandard is not installed; compressing archives with zlib")
+            codec = 'zlib'
+        self.codec = CODEC_ZSTD if codec == 'zstd' else CODEC_ZLIB
+        self.level = level if level is not None else (ARCHIVE_ZSTD_LEVEL if self.codec == CODEC_ZSTD else 6)
+        self.chunks: List[list] = []
+        self.records_written = 0
+        self.buffer: List[bytes] = []
+        self.buffer_keys: List[Optional[str]] = []
+        self.buffer_size = 0
+        self.file = open(self.path, 'wb')
+        self.file.write(FILE_MAGIC)
+        # Readers recognize the archive (as empty) before its first chunk
+        self.file.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, record: Dict) -> None:
+        """Add one record, writing a chunk once chunk_bytes are buffered."""
+        line = json.dumps(record, ensure_ascii=False, default=json_default).encode('utf-8') + b'\n'
+        self.buffer.append(line)
+        self.buffer_keys.append(self.key(record) if self.key is not None else None)
+        self.buffer_size += len(line)
+        self.records_written += 1
+        if self.buffer_size >= self.chunk_bytes:
+            self.flush()
+
+    def write_all(self, records) -> int:
+        """Add every record of an iterable; returns the number of records written so far."""
+        for record in records:
+            self.write(record)
+        return self.records_written
+
+    def _write_block(self, magic: bytes, count: int, raw: bytes) -> int:
+        offset = self.file.tell()
+        payload = compress(raw, self.codec, self.level)
+        self.file.write(CHUNK_HEADER.pack(magic, self.codec, count, len(raw), len(payload)))
+        self.file.write(payload)
+        return offset
+
+    def flush(self) -> None:
+        """Write the buffered records as a chunk and flush it to the file."""
+        if self.buffer:
+            raw = b''.join(self.buffer)
+            offset = self._write_block(CHUNK_MAGIC, len(self.buffer), raw)
+            self.chunks.append([offset, len(self.buffer), len(raw), self.file.tell() - offset - CHUNK_HEADER.size,
+                                self.buffer_keys if self.key is not None else None])
+            self.buffer, self.buffer_keys, self.buffer_size = [], [], 0
+        self.file.flush()
+
+    def close(self) -> None:
+        """Write the remaining records, the chunk index and the trailer, and close the file."""
+        if self.file.closed:
+            return
+        self.flush()
+        index = json.dumps(self.chunks, ensure_ascii=False).encode('utf-8')
+        offset = self._write_block(INDEX_MAGIC, len(self.chunks), index)
+        self.file.write(TRAILER.pack(offset, TRAILER_MAGIC))
+        self.file.close()
+
+
+class ArchiveReader:
+    """Reads a record archive, one chunk at a time."""
+
+    def __init__(self, path):
+        """
+        Open an archive and load its chunk index.
+
+        Args:
+            path: Archive file
+
+        Raises:
+            ValueError: If the file is not a record archive
+        """
+        self.path = Path(path)
+        self.file = open(self.path, 'rb')
+        header = self.file.read(len(FILE_MAGIC))
+        if header != FILE_MAGIC and not FILE_MAGIC.startswith(header):
+            self.file.close()
+            raise ValueError(f"{self.path} is not a record archive")
+        # [offset, records, raw size, compressed size, keys] per chunk
+        self.chunks = self._read_index() if header == FILE_MAGIC else None
+        self.complete = self.chunks is not None
+        if self.chunks is None:
+            self.chunks = self._scan_chunks()
+        self._key_index = None
+        self._cached = (None, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        """Close the archive file."""
+        self.file.close()
+
+    def _read_index(self) -> Optional[List[list]]:
+        size = os.fstat(self.file.fileno()).st_size
+        if size < len(FILE_MAGIC) + TRAILER.size:
+            return None
+        self.file.seek(size - TRAILER.size)
+        offset, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+        if magic != TRAILER_MAGIC:
+            return None
+        magic, codec, _, raw_size, compressed_size = self._read_header(offset)
+        if magic != INDEX_MAGIC:
+            return None
+        return json.loads(decompress(self.file.read(compressed_size), codec, raw_size))
+
+    def _read_header(self, offset: int) -> tuple:
+        self.file.seek(offset)
+        header = self.file.read(CHUNK_HEADER.size)
+        if len(header) < CHUNK_HEADER.size:
+            return None, None, 0, 0, 0
+        return CHUNK_HEADER.unpack(header)
+
+    def _scan_chunks(self) -> List[list]:
+        """
+        Rebuild the chunk index of an archive left without one, up to its last
+        complete chunk (an archive cut short in its header or first chunk is
+        read as empty).
+        """
+        chunks = []
+        size = os.fstat(self.file.fileno()).st_size
+        offset = len(FILE_MAGIC)
+        while offset < size:
+            magic, codec, count, raw_size, compressed_size = self._read_header(offset)
+            end = offset + CHUNK_HEADER.size + compressed_size
+            if magic != CHUNK_MAGIC or end > size:
+                break
+            chunks.append([offset, count, raw_size, compressed_size, None])
+            offset = end
+        logger.warning(f"{self.path.name} has no index (its writer was interrupted); "
+                       f"read {len(chunks)} complete chunks")
+        return chunks
+
+    def __len__(self) -> int:
+        return sum(chunk[1] for chunk in self.chunks)
+
+    def _records_at(self, offset: int) -> List[bytes]:
+        """Return the serialized records of the chunk at a file offset (the last chunk read is cached)."""
+        if self._cached[0] != offset:
+            magic, codec, count, raw_size, compressed_size = self._read_header(offset)
+            if magic != CHUNK_MAGIC:
+                raise ValueError(f"No chunk at offset {offset} in {self.path.name}")
+            self._cached = (offset, decompress(self.file.read(compressed_size), codec, raw_size).splitlines())
+        return self._cached[1]
+
+    def read_chunk(self, index: int) -> List[Dict]:
+        """Return the records of a chunk."""
+        return [json.loads(line) for line in self._records_at(self.chunks[index][0])]
+
+    def iter_located(self) -> Iterator[Tuple[int, int, Dict]]:
+        """Yield (chunk offset, position in chunk, record) for every record."""
+        for chunk in self.chunks:
+            for position, line in enumerate(self._records_at(chunk[0])):
+                yield chunk[0], position, json.loads(line)
+
+    def record_at(self, offset: int, position: int) -> Dict:
+        """Return the record at a position of the chunk at a file offset (see iter_located)."""
+        return json.loads(self._records_at(offset)[position])
+
+    def __iter__(self) -> Iterator[Dict]:
+        for index in range(len(self.chunks)):
+            yield from self.read_chunk(index)
+
+    def keys(self) -> List[Optional[str]]:
+        """Return the keys of every record in order (from the index; decompresses nothing if it is complete)."""
+        keys = []
+        for chunk in self.chunks:
+            if chunk[4] is not None:
+                keys.extend(chunk[4])
+            else:
+                keys.extend([None] * chunk[1])
+        return keys
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return the record with a key (the last one if several share it), or None."""
+        if self._key_index is None:
+            self._key_index = {}
+            for index, chunk in enumerate(self.chunks):
+                for position, record_key in enumerate(chunk[4] or ()):
+                    self._key_index[record_key] = (index, position)
+        location = self._key_index.get(key)
+        if location is None:
+            return None
+        return self.record_at(self.chunks[location[0]][0], location[1])
+
+    def stats(self) -> Dict:
+        """Return the archive's record, chunk and size counts and compression ratio."""
+        raw = sum(chunk[2] for chunk in self.chunks)
+        compressed = sum(chunk[3] for chunk in self.chunks)
+        return {'records': len(self), 'chunks': len(self.chunks), 'raw_bytes': raw,
+                'compressed_bytes': compressed, 'file_bytes': self.path.stat().st_size,
+                'ratio': raw / compressed if compressed else 0.0, 'indexed': self.complete}
+
+
+def read_records(path) -> List[Dict]:
+    """Read every record of an archive."""
+    with ArchiveReader(path) as reader:
+        return list(reader)
+
+
+def write_records(path, records, key: Optional[Callable[[Dict], Optional[str]]] = None,
+                  chunk_bytes: int = ARCHIVE_CHUNK_BYTES) -> int:
+    """
+    Write records to an archive, replacing it only once it is complete.
+
+    Returns:
+        Number of records written
+    """
+    path = Path(path)
+    partial = path.with_name(path.name + '.partial')
+    with ArchiveWriter(partial, key=key, chunk_bytes=chunk_bytes) as writer:
+        count = writer.write_all(records)
+    os.replace(partial, path)
+    return count
+
+
+def _iter_output_file(path: Path) -> Iterator[Dict]:
+    """Yield the records of an NDJSON file or a JSON array file, one at a time."""
+    from dataset import scan_json_array, scan_ndjson
+    with open(path, 'rb') as f:
+        # A JSON array starts with '['; anything else is read as NDJSON
+        first = b' '
+        while first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first != b'[':
+            for _, line in scan_ndjson(f):
+                yield json.loads(line)
+            return
+        for offset, length in scan_json_array(f):
+            # The scan reads ahead sequentially: read the record, then return to where it stopped
+            position = f.tell()
+            f.seek(offset)
+            record = f.read(length)
+            f.seek(position)
+            yield json.loads(record)
+
+
+def verify_archive(source: Path, target: Path) -> None:
+    """
+    Read an archive back alongside the JSON file it was converted from.
+
+    Raises:
+        ValueError: If the archive is incomplete or any record differs
+    """
+    missing = object()
+    with ArchiveReader(target) as reader:
+        if not reader.complete:
+            raise ValueError(f"{target.name} has no index")
+        records = zip_longest(_iter_output_file(source), reader, fillvalue=missing)
+        for number, (original, archived) in enumerate(records, 1):
+            if original != archived:
+                raise ValueError(f"record {number} of {target.name} does not match {source.name}")
+
+
+def migrate(cache_dir=CACHE_DIR, output_dir=OUTPUT_DIR, delete_source: bool = False) -> Dict[str, int]:
+    """
+    Convert existing caches and outputs to compressed formats.
+
+    - Video list caches (*_videos_list.json) become *_videos_list.ytr archives.
+    - Legacy mined data pickles (*_videos.pkl) are imported into the video
+      store (see video_store.migrate_pickle).
+    - Output files (youtube_data_*.ndjson and .json) become
+      youtube_data_*.ytr archives keyed by video ID.
+
+    Args:
+        cache_dir: Cache directory
+        output_dir: Output directory
+        delete_source: Delete each converted JSON file once its archive has
+            been read back and every record matches (by default the
+            originals are kept; pickles are always renamed to *.pkl.migrated)
+
+    Returns:
+        Dictionary with the number of files converted and the bytes before
+        and after
+    """
+    totals = {'files': 0, 'bytes_before': 0, 'bytes_after': 0}
+    cache_dir, output_dir = Path(cache_dir), Path(output_dir)
+
+    conversions = []
+    if cache_dir.is_dir():
+        conversions.extend((path, path.with_suffix(ARCHIVE_SUFFIX), video_list_key)
+                           for path in sorted(cache_dir.glob('*_videos_list.json')))
+        pickles = sorted(cache_dir.glob('*_videos.pkl'))
+        if pickles:
+            from video_store import VideoStore, migrate_pickle
+            store = VideoStore(cache_dir / VIDEO_STORE_FILE)
+            try:
+                for path in pickles:
+                    if migrate_pickle(store, path) is not None:
+                        totals['files'] += 1
+            finally:
+                store.close()
+    if output_dir.is_dir():
+        conversions.extend((path, path.with_suffix(ARCHIVE_SUFFIX), lambda video: video.get('video_id'))
+                           for pattern in ('youtube_data_*.ndjson', 'youtube_data_*.json')
+                           for path in sorted(output_dir.glob(pattern)))
+
+    for source, target, key in conversions:
+        if target.exists():
+            logger.info(f"Skipping {source.name}: {target.name} already exists")
+            continue
+        try:
+            count = write_records(target, _iter_output_file(source), key=key)
+            if delete_source:
+                verify_archive(source, target)
+        except Exception as e:
+            logger.error(f"Failed to convert {source.name}: {e}")
+            # Leave no archive behind, so the next run converts the file again
+            if target.exists():
+                target.unlink()
+            continue
+        before, after = source.stat().st_size, target.stat().st_size
+        totals['files'] += 1
+        totals['bytes_before'] += before
+        totals['bytes_after'] += after
+        logger.info(f"Converted {source.name} ({count} records): {before:,} -> {after:,} bytes")
+        if delete_source:
+            source.unlink()
+    return totals
+
+
+def video_list_key(item: Dict) -> Optional[str]:
+    """Return the video ID of a cached playlist item."""
+    return (item.get('contentDetails') or {}).get('videoId')
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Migrate to, inspect or print record archives from the command line."""
+    parser = argparse.ArgumentParser(description="Compressed record archives (*.ytr)")
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate', help="convert JSON/pickle caches and JSON outputs")
+    migrate_parser.add_argument('--cache-dir', default=CACHE_DIR)
+    migrate_parser.add_argument('--output-dir', default=OUTPUT_DIR)
+    migrate_parser.add_argument('--delete', action='store_true',
+                                help="delete each converted JSON file once its archive is verified")
+    info_parser = commands.add_parser('info', help="show an archive's record count and compression")
+    info_parser.add_argument('path')
+    cat_parser = commands.add_parser('cat', help="print an archive's records as NDJSON")
+    cat_parser.add_argument('path')
+    cat_parser.add_argument('--key', help="print only the record with this key")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.command == 'migrate':
+        totals = migrate(args.cache_dir, args.output_dir, delete_source=args.delete)
+        saved = totals['bytes_before'] - totals['bytes_after']
+        logger.info(f"Migrated {totals['files']} files; {totals['bytes_before']:,} -> "
+                    f"{totals['bytes_after']:,} bytes ({saved:,} saved)")
+        return
+
+    with ArchiveReader(args.path) as reader:
+        if args.command == 'info':
+            stats = reader.stats()
+            codecs = {CODEC_NAMES.get(reader._read_header(chunk[0])[1], '?') for chunk in reader.chunks}
+            print(f"{reader.path.name}: {stats['records']} records in {stats['chunks']} chunks "
+                  f"({', '.join(sorted(codecs)) or 'empty'}), {stats['raw_bytes']:,} -> "
+                  f"{stats['compressed_bytes']:,} bytes ({stats['ratio']:.1f}x)"
+                  + ('' if stats['indexed'] else ', no index (incomplete)'))
+        elif args.key is not None:
+            record = reader.get(args.key)
+            if record is not None:
+                print(json.dumps(record, ensure_ascii=False))
+        else:
+            for record in reader:
+                print(json.dumps(record, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Compact record types for the YouTube Political Study Scraper
+
+Comments are the bulk of a crawl, so they are held as CommentRecord objects:
+fixed slots instead of a per-comment dict, counts parsed to ints once at
+ingest, and strings that repeat across comments (author names and channels,
+relative times) interned so each distinct value is stored once. Records
+behave like read-only mappings, so code written for comment dicts (e.g.
+comment['votes']) works unchanged; json_default serializes them.
+"""
+
+import re
+import sys
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional
+
+_COUNT_RE = re.compile(r'^([\d.,]+)\s*([KMB]?)$', re.IGNORECASE)
+_COUNT_MULTIPLIERS = {'': 1, 'K': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}
+
+
+def parse_count(value) -> Optional[int]:
+    """
+    Convert an API or display count to an int.
+
+    Handles ints, numeric strings ("1234") and abbreviated display values
+    ("1.2K", "3M") as returned for comment votes.
+
+    Returns:
+        The count, or None if the value is empty or unparseable
+    """
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, int):
+        return value
+    match = _COUNT_RE.match(str(value).strip())
+    if not match:
+        return None
+    number, suffix = match.groups()
+    try:
+        return int(round(float(number.replace(',', '')) * _COUNT_MULTIPLIERS[suffix.upper()]))
+    except ValueError:
+        return None
+
+
+def intern_str(value) -> str:
+    """Intern a string value (None becomes '')."""
+    if value is None:
+        return ''
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class CommentRecord(Mapping):
+    """One comment, stored in slots rather than a dict."""
+
+    __slots__ = ('cid', 'text', 'time', 'author', 'channel', 'votes', 'replies', 'cluster_id')
+
+    def __init__(self, cid: str, text: str, time: str, author: str, channel: str,
+                 votes: int, replies: int, cluster_id: Optional[int] = None):
+        self.cid = cid
+        self.text = text
+        self.time = time
+        self.author = author
+        self.channel = channel
+        self.votes = votes
+        self.replies = replies
+        # Near-duplicate cluster (see near_duplicates.py); None if not clustered
+        self.cluster_id = cluster_id
+
+    @classmethod
+    def from_dict(cls, comment: Dict) -> "CommentRecord":
+        """
+        Build a record from a YoutubeCommentDownloader comment or a stored comment dict.
+
+        Vote and reply counts are parsed to ints here, once; fields the
+        exports never use (e.g. the author photo URL) are dropped.
+        """
+        return cls(
+            comment.get('cid', ''),
+            comment.get('text', ''),
+            intern_str(comment.get('time', '')),
+            intern_str(comment.get('author', '')),
+            intern_str(comment.get('channel', '')),
+            parse_count(comment.get('votes')) or 0,
+            parse_count(comment.get('replies')) or 0,
+            comment.get('cluster_id')
+        )
+
+    def __getitem__(self, key: str):
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.__slots__)
+
+    def __len__(self) -> int:
+        return len(self.__slots__)
+
+    def __repr__(self) -> str:
+        return f"CommentRecord({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict:
+        """Return the comment as a plain dictionary."""
+        return {field: getattr(self, field) for field in self.__slots__}
+
+
+def comment_records(comments: Iterable[Dict]) -> List[CommentRecord]:
+    """Convert comment dictionaries (or records) to a list of CommentRecords."""
+    return [comment if isinstance(comment, CommentRecord) else CommentRecord.from_dict(comment)
+            for comment in comments]
+
+
+def json_default(value):
+    """json.dump(s) `default` hook that serializes records as dictionaries."""
+    if isinstance(value, CommentRecord):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,196 @@
+"""
+Retries with exponential backoff for the YouTube Political Study Scraper
+
+Transient failures (HTTP 429 and 5xx responses, Data API rate-limit errors,
+blocked transcript requests and network errors) are retried with jittered
+exponential backoff, honouring Retry-After when the server sends it, and
+reported to an AdaptiveRateLimiter so the backend's request rate adapts.
+When the attempts run out, RetriesExhausted is raised instead of returning an
+empty result, so callers can leave the work for a later run rather than
+storing incomplete data.
+"""
+
+import email.utils
+import json
+import logging
+import random
+import socket
+import time
+from typing import Optional, Tuple
+
+import httplib2
+import requests
+from googleapiclient.errors import HttpError
+
+from config import *
+from metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUSES = {429, 500, 502, 503, 504}
+# Statuses that mean "slow down" rather than "something broke"
+THROTTLE_STATUSES = {429, 503}
+# Data API error reasons (sent with 403) that are worth retrying
+RETRYABLE_REASONS = {'rateLimitExceeded', 'userRateLimitExceeded', 'backendError'}
+# youtube-transcript-api errors (by class name, across library versions)
+# raised when YouTube throttles or blocks transcript requests
+RETRYABLE_TRANSCRIPT_ERRORS = {'TooManyRequests', 'RequestBlocked', 'IpBlocked', 'YouTubeRequestFailed'}
+NETWORK_ERRORS = (ConnectionError, TimeoutError, socket.timeout, httplib2.HttpLib2Error,
+                  requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+
+
+class RetriesExhausted(Exception):
+    """A transient failure persisted through every retry attempt."""
+
+    def __init__(self, backend: str, attempts: int, cause: Exception):
+        super().__init__(f"{backend}: giving up after {attempts} attempts: {cause}")
+        self.backend = backend
+        self.attempts = attempts
+        self.cause = cause
+
+
+class TransientHTTPError(Exception):
+    """Retryable HTTP status returned to a requests session."""
+
+    def __init__(self, status: int, retry_after: Optional[float] = None):
+        super().__init__(f"HTTP {status}")
+        self.status = status
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Header value, either delay seconds or an HTTP date
+
+    Returns:
+        Seconds to wait, or None if the value is missing or invalid
+    """
+    if value is None or value == '':
+        return None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(str(value)).timestamp() - time.time())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def api_error_reasons(content: bytes) -> set:
+    """Return the error reasons in a Data API error response body."""
+    try:
+        details = json.loads(content.decode('utf-8'))['error']['errors']
+        return {detail.get('reason') for detail in details}
+    except Exception:
+        return set()
+
+
+def classify(error: Exception) -> Tuple[bool, bool, Optional[float]]:
+    """
+    Decide how to handle an exception.
+
+    Args:
+        error: Exception raised by a request
+
+    Returns:
+        (retryable, throttled, retry_after seconds or None); throttled means
+        the backend asked us to slow down
+    """
+    if isinstance(error, TransientHTTPError):
+        return True, error.status in THROTTLE_STATUSES, error.retry_after
+    if isinstance(error, HttpError):
+        status = error.resp.status
+        retry_after = parse_retry_after(error.resp.get('retry-after'))
+        if status in RETRYABLE_STATUSES:
+            return True, status in THROTTLE_STATUSES, retry_after
+        if status == 403 and api_error_reasons(error.content) & RETRYABLE_REASONS:
+            return True, True, retry_after
+        return False, False, None
+    if RETRYABLE_TRANSCRIPT_ERRORS & {cls.__name__ for cls in type(error).__mro__}:
+        return True, True, None
+    if isinstance(error, NETWORK_ERRORS):
+        return True, False, None
+    return False, False, None
+
+
+def backoff_delay(attempt: int, base: float = RETRY_BASE_DELAY, cap: float = RETRY_MAX_DELAY) -> float:
+    """Return a full-jitter exponential backoff delay for a 0-based retry attempt."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def call_with_retry(limiter, backend: str, func, *args,
+                    max_attempts: int = RETRY_MAX_ATTEMPTS, **kwargs):
+    """
+    Call func(*args, **kwargs) under a rate limiter, retrying transient failures.
+
+    Args:
+        limiter: AdaptiveRateLimiter pacing the backend
+        backend: Backend name (a key of RATE_LIMITS)
+        func: Callable performing one request
+        max_attempts: Attempts before giving up
+
+    Returns:
+        The return value of func
+
+    Raises:
+        RetriesExhausted: If a transient failure persisted through every attempt
+        Exception: Non-retryable errors from func, unchanged
+    """
+    for attempt in range(max_attempts):
+        waited = limiter.acquire(backend)
+        if waited:
+            METRICS.inc('rate_wait_seconds_total', waited, backend=backend)
+        METRICS.inc('requests_total', backend=backend)
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            METRICS.observe('request_seconds', time.perf_counter() - start, backend=backend)
+            METRICS.inc('request_errors_total', backend=backend)
+            retryable, throttled, retry_after = classify(e)
+            if not retryable:
+                raise
+            if throttled:
+                METRICS.inc('throttled_total', backend=backend)
+                limiter.throttled(backend, retry_after)
+            if attempt + 1 >= max_attempts:
+                METRICS.inc('request_failures_total', backend=backend)
+                raise RetriesExhausted(backend, max_attempts, e) from e
+            METRICS.inc('retries_total', backend=backend)
+            delay = retry_after if retry_after is not None else backoff_delay(attempt)
+            logger.warning(f"{backend}: {e}; retrying in {delay:.1f}s ({attempt + 1}/{max_attempts})")
+            time.sleep(delay)
+            continue
+        METRICS.observe('request_seconds', time.perf_counter() - start, backend=backend)
+        limiter.success(backend)
+        return result
+
+
+class PacedSession(requests.Session):
+    """requests session whose requests are rate limited and retried."""
+
+    def __init__(self, limiter, backend: str):
+        """
+        Initialize the session.
+
+        Args:
+            limiter: AdaptiveRateLimiter pacing the backend
+            backend: Backend name (a key of RATE_LIMITS)
+        """
+        super().__init__()
+        self.limiter = limiter
+        self.backend = backend
+
+    def _request_once(self, method, url, **kwargs):
+        response = super().request(method, url, **kwargs)
+        if response.status_code in RETRYABLE_STATUSES:
+            raise TransientHTTPError(response.status_code,
+                                     parse_retry_after(response.headers.get('Retry-After')))
+        return response
+
+    def request(self, method, url, **kwargs):
+        return call_with_retry(self.limiter, self.backend, self._request_once, method, url, **kwargs)
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Multi-process scheduler for the YouTube Political Study Scraper
+
+Channels are split into tasks that are handed to worker processes through a
+durable SQLite-backed work queue:
+
+- a 'channel' task resolves the upload playlist and video list of a channel,
+  then enqueues 'videos' tasks covering chunks of VIDEOS_PER_TASK videos
+- a 'videos' task fetches details, transcripts and comments for its chunk and
+  stores each finished video in the shared video store
+
+Every finished video is committed individually, so a crashed worker (or a
+killed run) resumes without redoing finished work: its task is re-queued and
+the retry skips videos that are already in the video store.
+"""
+
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Dict, Optional, Union
+
+from comment_filters import CommentFilter
+from config import *
+from quota import QuotaExhausted, load_api_keys
+from youtube_scraper import YouTubeScraper, logger, setup_logging
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    channel_handle TEXT NOT NULL,
+    chunk_key TEXT NOT NULL DEFAULT '',
+    payload TEXT NOT NULL DEFAULT '{}',
+    status TEXT NOT NULL DEFAULT 'pending',
+    worker TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    UNIQUE (kind, channel_handle, chunk_key)
+);
+CREATE INDEX IF NOT EXISTS tasks_status ON tasks (status);
+"""
+
+
+class WorkQueue:
+    """Durable task queue backed by a SQLite database."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the queue database.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.conn.close()
+
+    def enqueue(self, kind: str, channel_handle: str, chunk_key: str = '',
+                payload: Optional[Dict] = None, requeue_finished: bool = False) -> None:
+        """
+        Add a task unless an identical one was queued before.
+
+        Args:
+            kind: Task kind ('channel' or 'videos')
+            channel_handle: YouTube channel handle
+            chunk_key: Identifies the video chunk (empty for channel tasks)
+            payload: JSON-serializable task arguments
+            requeue_finished: Run an existing done/failed task again
+        """
+        if requeue_finished:
+            self.conn.execute(
+                "INSERT INTO tasks (kind, channel_handle, chunk_key, payload) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (kind, channel_handle, chunk_key) DO UPDATE SET "
+                "status = 'pending', attempts = 0, error = NULL, payload = excluded.payload "
+                "WHERE status IN ('done', 'failed')",
+                (kind, channel_handle, chunk_key, json.dumps(payload or {}))
+            )
+        else:
+            self.conn.execute(
+                "INSERT OR IGNORE INTO tasks (kind, channel_handle, chunk_key, payload) VALUES (?, ?, ?, ?)",
+                (kind, channel_handle, chunk_key, json.dumps(payload or {}))
+            )
+
+    def claim(self, worker: str, lease_seconds: float = TASK_LEASE_SECONDS) -> Optional[Dict]:
+        """
+        Atomically claim the next runnable task.
+
+        Pending tasks are claimed first; running tasks whose lease expired
+        (their worker died) are reclaimed.
+
+        Args:
+            worker: Identifier of the claiming worker
+            lease_seconds: How long the task stays reserved for this worker
+
+        Returns:
+            Task dictionary or None if nothing is runnable
+        """
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = self.conn.execute(
+                "SELECT id, kind, channel_handle, chunk_key, payload FROM tasks "
+                "WHERE status = 'pending' OR (status = 'running' AND lease_expires < ?) "
+                "ORDER BY kind = 'videos', id LIMIT 1",
+                (now,)
+            ).fetchone()
+            if row is None:
+                self.conn.execute("COMMIT")
+                return None
+            self.conn.execute(
+                "UPDATE tasks SET status = 'running', worker = ?, lease_expires = ?, attempts = attempts + 1 "
+                "WHERE id = ?",
+                (worker, now + lease_seconds, row[0])
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'channel_handle': row[2],
+            'chunk_key': row[3],
+            'payload': json.loads(row[4])
+        }
+
+    def renew(self, task_id: int, lease_seconds: float = TASK_LEASE_SECONDS) -> None:
+        """Extend the lease of a running task, so a worker making progress keeps it."""
+        self.conn.execute("UPDATE tasks SET lease_expires = ? WHERE id = ? AND status = 'running'",
+                          (time.time() + lease_seconds, task_id))
+
+    def complete(self, task_id: int) -> None:
+        """Mark a task as done."""
+        self.conn.execute("UPDATE tasks SET status = 'done', lease_expires = NULL WHERE id = ?", (task_id,))
+
+    def fail(self, task_id: int, error: str, max_attempts: int = TASK_MAX_ATTEMPTS) -> None:
+        """
+        Record a task failure; the task is retried until max_attempts is reached.
+
+        Args:
+            task_id: ID of the failed task
+            error: Error description
+            max_attempts: Attempts after which the task is marked failed
+        """
+        self.conn.execute(
+            "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "error = ?, lease_expires = NULL WHERE id = ?",
+            (max_attempts, error, task_id)
+        )
+
+    def requeue_running(self, worker: Optional[str] = None) -> int:
+        """
+        Put running tasks back in the queue.
+
+        Args:
+            worker: Only requeue tasks held by this worker (all if None)
+
+        Returns:
+            Number of requeued tasks
+        """
+        if worker is None:
+            cursor = self.conn.execute("UPDATE tasks SET status = 'pending' WHERE status = 'running'")
+        else:
+            cursor = self.conn.execute(
+                "UPDATE tasks SET status = 'pending' WHERE status = 'running' AND worker = ?", (worker,)
+            )
+        return cursor.rowcount
+
+    def has_unfinished(self) -> bool:
+        """Return True while any task is pending or running."""
+        row = self.conn.execute(
+            "SELECT 1 FROM tasks WHERE status IN ('pending', 'running') LIMIT 1"
+        ).fetchone()
+        return row is not None
+
+    def counts(self) -> Dict[str, int]:
+        """Return the number of tasks in each status."""
+        return dict(self.conn.execute("SELECT status, COUNT(*) FROM tasks GROUP BY status").fetchall())
+
+
+def run_channel_task(scraper: YouTubeScraper, queue: WorkQueue, task: Dict) -> None:
+    """
+    Resolve a channel's video list and enqueue its video chunks.
+
+    Args:
+        scraper: Scraper used for API calls
+        queue: Work queue
+        task: Claimed 'channel' task
+    """
+    channel_handle = task['channel_handle']
+    payload = task['payload']
+
+    scraper._migrate_pickle_cache(channel_handle)
+
+    videos = scraper.get_channel_video_list(
+        channel_handle, payload.get('channel_id'), payload.get('by_handle', True),
+        payload['max_videos_per_channel']
+    )
+    if videos is None:
+        raise RuntimeError(f"Could not get video list for {channel_handle}")
+
+    video_ids = [scraper._playlist_item_video_id(video) for video in videos]
+    mined = scraper.video_store.known_ids(video_ids)
+    todo = [video_id for video_id in video_ids if video_id and video_id not in mined]
+    for start in range(0, len(todo), VIDEOS_PER_TASK):
+        chunk = todo[start:start + VIDEOS_PER_TASK]
+        queue.enqueue('videos', channel_handle, chunk[0], {
+            'video_ids': chunk,
+            'max_comments_per_video': payload['max_comments_per_video'],
+            'comment_filter': payload.get('comment_filter')
+        }, requeue_finished=True)
+    logger.info(f"Queued {len(todo)} videos for {channel_handle} in chunks of {VIDEOS_PER_TASK} "
+                f"({len(mined)} already mined)")
+
+
+def run_videos_task(scraper: YouTubeScraper, queue: WorkQueue, task: Dict) -> None:
+    """
+    Process a chunk of videos, storing each one as soon as it is finished.
+
+    Args:
+        scraper: Scraper used for API calls and downloads
+        queue: Work queue
+        task: Claimed 'videos' task
+    """
+    channel_handle = task['channel_handle']
+    payload = task['payload']
+    mined = scraper.video_store.known_ids(payload['video_ids'])
+    todo = [video_id for video_id in payload['video_ids'] if video_id not in mined]
+    if not todo:
+        return
+
+    details_by_id = scraper.get_videos_details(todo)
+    for video_id in todo:
+        video_details = details_by_id.get(video_id)
+        if not video_details:
+            logger.warning(f"No details returned for {video_id}, skipping")
+            continue
+
+        transcript = scraper.get_video_transcript(video_id)
+        comments = scraper.get_video_comments(video_id, payload['max_comments_per_video'],
+                                              CommentFilter.from_dict(payload.get('comment_filter')))
+        scraper._store_video(scraper._build_video_data(
+            channel_handle, video_id, video_details, transcript, comments
+        ))
+        logger.info(f"Stored {video_id} ({len(comments)} comments) for {channel_handle}")
+        # A chunk can take longer than one lease; keep it while videos get stored
+        queue.renew(task['id'])
+
+
+def collect_results(scraper: YouTubeScraper, channel_handles: List[str]) -> List[Dict]:
+    """
+    Load mined videos from the video store in channel order, then playlist order.
+
+    Args:
+        scraper: Scraper whose cache and video store hold the results
+        channel_handles: YouTube channel handles, in output order
+
+    Returns:
+        List of processed video data dictionaries
+    """
+    return scraper.load_mined_videos(channel_handles)
+
+
+def worker_main(db_path: str, api_key: Union[str, List[str]], worker: str) -> None:
+    """
+    Worker process entry point: claim and run tasks until the queue drains.
+
+    A worker also stops when the Data API quota of every key is spent; its
+    task goes back to the queue for the next run.
+
+    Args:
+        db_path: Path of the queue database
+        api_key: YouTube Data API v3 key or list of keys
+        worker: Identifier of this worker
+    """
+    # Spawned (rather than forked) workers start without logging configured
+    setup_logging()
+    scraper = YouTubeScraper(api_key)
+    if METRICS_FILE:
+        # One metrics file per worker process
+        metrics_file = Path(METRICS_FILE)
+        scraper.progress.path = scraper.output_dir / f"{metrics_file.stem}-{worker}{metrics_file.suffix}"
+    queue = WorkQueue(db_path)
+    scraper.progress.start()
+    try:
+        while True:
+            task = queue.claim(worker)
+            if task is None:
+                if not queue.has_unfinished():
+                    break
+                # Other workers may still enqueue video chunks
+                time.sleep(SCHEDULER_POLL_INTERVAL)
+                continue
+
+            logger.info(f"[{worker}] Running {task['kind']} task {task['id']} for {task['channel_handle']}")
+            try:
+                if task['kind'] == 'channel':
+                    run_channel_task(scraper, queue, task)
+                else:
+                    run_videos_task(scraper, queue, task)
+                queue.complete(task['id'])
+            except QuotaExhausted as e:
+                queue.requeue_running(worker)
+                logger.error(f"[{worker}] {e}; stopping, unfinished tasks stay queued")
+                break
+            except Exception as e:
+                logger.error(f"[{worker}] Task {task['id']} failed: {e}")
+                queue.fail(task['id'], str(e))
+    finally:
+        scraper.progress.stop()
+        queue.close()
+
+
+def run_scheduler(api_key: Union[str, List[str]], channel_handles: List[str],
+                  channel_ids: List[str] = None,
+                  by_handle: bool = True,
+                  max_videos_per_channel: int = 100,
+                  max_comments_per_video: int = 1000,
+                  num_workers: int = SCHEDULER_WORKERS,
+                  db_path: Optional[str] = None,
+                  comment_filter: Optional[CommentFilter] = None,
+                  collect: bool = True) -> Optional[List[Dict]]:
+    """
+    Scrape channels with a pool of worker processes.
+
+    Running it again with the same queue database resumes an interrupted
+    crawl (including one stopped by the Data API quota): finished tasks and
+    stored videos are not redone.
+
+    Args:
+        api_key: YouTube Data API v3 key or list of keys (shared by all workers)
+        channel_handles: List of YouTube channel handles
+        channel_ids: List of YouTube channel IDs (optional)
+        by_handle: Whether to search by handle or ID
+        max_videos_per_channel: Maximum videos to process per channel
+        max_comments_per_video: Maximum comments to collect per video
+        num_workers: Number of worker processes
+        db_path: Path of the queue database (defaults to cache/work_queue.sqlite)
+        comment_filter: Filter applied while downloading comments (defaults
+            to the config.py comment filter)
+        collect: Load and return the mined videos; pass False to read them
+            from the video store afterwards instead (see iter_mined_videos)
+
+    Returns:
+        List of processed video data dictionaries, in channel and playlist
+        order (None if collect is False)
+    """
+    if db_path is None:
+        Path(CACHE_DIR).mkdir(exist_ok=True)
+        db_path = str(Path(CACHE_DIR) / "work_queue.sqlite")
+
+    queue = WorkQueue(db_path)
+    # No workers are alive yet, so anything still marked running was
+    # interrupted by a previous run
+    requeued = queue.requeue_running()
+    if requeued:
+        logger.info(f"Requeued {requeued} interrupted tasks")
+
+    # Channel tasks are cheap (videos already mined are skipped), so they run
+    # on every invocation to pick up videos that are not mined yet
+    for i, channel_handle in enumerate(channel_handles):
+        queue.enqueue('channel', channel_handle, payload={
+            'channel_id': channel_ids[i] if channel_ids and i < len(channel_ids) else None,
+            'by_handle': by_handle,
+            'max_videos_per_channel': max_videos_per_channel,
+            'max_comments_per_video': max_comments_per_video,
+            'comment_filter': comment_filter.to_dict() if comment_filter else None
+        }, requeue_finished=True)
+
+    workers = {}
+    host = socket.gethostname()
+
+    def spawn(n: int) -> None:
+        worker = f"{host}-{os.getpid()}-w{n}"
+        process = multiprocessing.Process(target=worker_main, args=(db_path, api_key, worker), name=worker)
+        process.start()
+        workers[worker] = process
+
+    for n in range(num_workers):
+        spawn(n)
+    spawned = num_workers
+
+    while workers:
+        time.sleep(SCHEDULER_POLL_INTERVAL)
+        for worker, process in list(workers.items()):
+            if process.is_alive():
+                continue
+            del workers[worker]
+            if process.exitcode != 0:
+                # Crashed worker: hand its tasks to a replacement right away
+                requeued = queue.requeue_running(worker)
+                logger.warning(f"Worker {worker} exited with code {process.exitcode}; requeued {requeued} tasks")
+                if queue.has_unfinished():
+                    spawn(spawned)
+                    spawned += 1
+
+    logger.info(f"Scheduler finished: {queue.counts()}")
+    queue.close()
+    if not collect:
+        return None
+    return collect_results(YouTubeScraper(api_key), channel_handles)
+
+
+def main():
+    """Scrape the config channels with the multi-process scheduler."""
+    setup_logging()
+    API_KEY = load_api_keys()
+    if not API_KEY:
+        logger.error("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
+        return
+
+    logger.info(f"Starting to scrape {len(YOUTUBERS)} channels with {SCHEDULER_WORKERS} workers: {YOUTUBERS}")
+    run_scheduler(
+        API_KEY,
+        channel_handles=YOUTUBERS,
+        max_videos_per_channel=MAX_VIDEOS_PER_CHANNEL,
+        max_comments_per_video=MAX_COMMENTS_PER_VIDEO,
+        collect=False
+    )
+
+    # Stream the results out of the video store rather than loading them all
+    scraper = YouTubeScraper(API_KEY)
+    count = scraper.save_data_streaming(scraper.iter_mined_videos(YOUTUBERS), output_format=OUTPUT_FORMAT)
+
+    logger.info(f"Scraping completed! Processed {count} videos")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,321 @@
+"""
+Full-text search index for the YouTube Political Study Scraper
+
+Video titles, descriptions and transcripts and every comment are indexed as
+separate documents in a SQLite FTS5 inverted index, next to a table holding
+each document's video, comment ID (cid), channel and publication date (the
+video's, for comments too). The index keeps positional postings, so phrase
+("border policy") and NEAR queries work, and results are ranked by BM25.
+Channel and date filters are applied through the document table's indexes.
+
+The index is incremental: adding a video inserts only documents that are new
+and re-indexes only those whose text changed (each document carries a content
+hash), so the scraper indexes every finished video as it is stored and a
+dataset can be indexed again without a rebuild. The text itself lives once,
+in the document table; the FTS5 table is an external-content index over it.
+
+    python search_index.py build data/
+    python search_index.py search "border policy" --channel @HasanAbi --since 2024-01-01
+"""
+
+import argparse
+import hashlib
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import *
+from metrics import METRICS, STAGE_CACHE_IO
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    doc_id INTEGER PRIMARY KEY,
+    video_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    cid TEXT NOT NULL DEFAULT '',
+    channel_handle TEXT NOT NULL,
+    published_at TEXT,
+    content_hash TEXT NOT NULL,
+    body TEXT NOT NULL,
+    UNIQUE (video_id, kind, cid)
+);
+CREATE INDEX IF NOT EXISTS docs_channel ON docs (channel_handle, published_at);
+CREATE INDEX IF NOT EXISTS docs_published ON docs (published_at);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    body, content='docs', content_rowid='doc_id', tokenize='unicode61 remove_diacritics 2'
+);
+"""
+
+# Document kinds, by the video field they come from
+DOC_KINDS = ('title', 'description', 'transcript', 'comment')
+
+RESULT_COLUMNS = ['kind', 'video_id', 'cid', 'channel_handle', 'published_at', 'score', 'snippet']
+
+_QUERY_TOKEN_RE = re.compile(r'"[^"]*"\*?|\S+')
+_DATE_RE = re.compile(r'^\d{4}-\d{2}-\d{2}$')
+
+
+def match_expression(query: str) -> str:
+    """
+    Turn a plain query into an FTS5 match expression.
+
+    Every word must occur; "quoted words" must occur as a phrase and a
+    trailing * makes a word (or phrase) a prefix. Punctuation inside words
+    needs no escaping.
+    """
+    terms = []
+    for token in _QUERY_TOKEN_RE.findall(query):
+        prefix = token.endswith('*')
+        text = token.rstrip('*').strip('"').replace('"', '""')
+        if text.strip():
+            terms.append(f'"{text}"' + ('*' if prefix else ''))
+    return ' '.join(terms)
+
+
+def video_documents(video_data: Dict) -> List[Tuple[str, str, str]]:
+    """Return the (kind, cid, text) documents of a video record, skipping empty texts."""
+    docs = [(kind, '', video_data.get(kind) or '') for kind in ('title', 'description', 'transcript')]
+    docs.extend(('comment', comment.get('cid'), comment.get('text') or '')
+                for comment in video_data.get('comments') or [] if comment.get('cid'))
+    return [doc for doc in docs if doc[2].strip()]
+
+
+class SearchIndex:
+    """SQLite FTS5 index of video texts and comments with channel and date filters."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the index.
+
+        Args:
+            db_path: Path of the SQLite database file
+
+        Raises:
+            RuntimeError: If the SQLite library was built without FTS5
+        """
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        try:
+            self.conn.executescript(SCHEMA)
+        except sqlite3.OperationalError as e:
+            self.conn.close()
+            raise RuntimeError(f"The search index needs SQLite with FTS5 ({e})")
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+    def __contains__(self, video_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM docs WHERE video_id = ? LIMIT 1", (video_id,)).fetchone()
+        return row is not None
+
+    def add_video(self, video_data: Dict) -> Tuple[int, int]:
+        """
+        Index the texts and comments of one video.
+
+        Args:
+            video_data: Processed video data dictionary
+
+        Returns:
+            (new documents, documents whose text changed and were re-indexed)
+        """
+        docs = video_documents(video_data)
+        if not docs:
+            return 0, 0
+        video_id = video_data['video_id']
+        channel_handle = video_data.get('channel_handle', '')
+        published_at = video_data.get('published_at')
+
+        new = changed = 0
+        with METRICS.stage(STAGE_CACHE_IO), self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                known = {(kind, cid): (doc_id, digest) for doc_id, kind, cid, digest in self.conn.execute(
+                    "SELECT doc_id, kind, cid, content_hash FROM docs WHERE video_id = ?", (video_id,)
+                )}
+                for kind, cid, text in docs:
+                    digest = hashlib.sha1(text.encode('utf-8')).hexdigest()
+                    entry = known.get((kind, cid))
+                    if entry is None:
+                        cursor = self.conn.execute(
+                            "INSERT INTO docs (video_id, kind, cid, channel_handle, published_at, content_hash, body) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                            (video_id, kind, cid, channel_handle, published_at, digest, text)
+                        )
+                        self.conn.execute("INSERT INTO docs_fts (rowid, body) VALUES (?, ?)",
+                                          (cursor.lastrowid, text))
+                        new += 1
+                    elif entry[1] != digest:
+                        doc_id = entry[0]
+                        old_text = self.conn.execute("SELECT body FROM docs WHERE doc_id = ?", (doc_id,)).fetchone()[0]
+                        # External-content FTS5 tables remove postings given the old text
+                        self.conn.execute("INSERT INTO docs_fts (docs_fts, rowid, body) VALUES ('delete', ?, ?)",
+                                          (doc_id, old_text))
+                        self.conn.execute(
+                            "UPDATE docs SET channel_handle = ?, published_at = ?, content_hash = ?, body = ? "
+                            "WHERE doc_id = ?",
+                            (channel_handle, published_at, digest, text, doc_id)
+                        )
+                        self.conn.execute("INSERT INTO docs_fts (rowid, body) VALUES (?, ?)", (doc_id, text))
+                        changed += 1
+                self.conn.execute("COMMIT")
+            except Exception:
+                self.conn.execute("ROLLBACK")
+                raise
+        METRICS.record(STAGE_CACHE_IO, items=new + changed)
+        return new, changed
+
+    def add_many(self, videos_data: Iterable[Dict]) -> Tuple[int, int]:
+        """
+        Index several videos (e.g. a dataset or the video store).
+
+        Returns:
+            (new documents, re-indexed documents)
+        """
+        new = changed = 0
+        for video_data in videos_data:
+            video_new, video_changed = self.add_video(video_data)
+            new += video_new
+            changed += video_changed
+        return new, changed
+
+    def optimize(self) -> None:
+        """Merge the index's segments into one (faster queries after large builds)."""
+        with self.lock:
+            self.conn.execute("INSERT INTO docs_fts (docs_fts) VALUES ('optimize')")
+
+    @staticmethod
+    def _filters(channels: Optional[Sequence[str]], since: Optional[str], until: Optional[str],
+                 kinds: Optional[Sequence[str]]) -> Tuple[str, list]:
+        clauses, params = [], []
+        for column, values in (('d.channel_handle', channels), ('d.kind', kinds)):
+            if values:
+                values = [values] if isinstance(values, str) else list(values)
+                clauses.append(f"{column} IN ({','.join('?' * len(values))})")
+                params.extend(values)
+        if since:
+            clauses.append("d.published_at >= ?")
+            params.append(since)
+        if until:
+            # Exclusive bound, as in dataset.py; a date includes that whole day
+            if _DATE_RE.match(until):
+                until = (date.fromisoformat(until) + timedelta(days=1)).isoformat()
+            clauses.append("d.published_at < ?")
+            params.append(until)
+        return ''.join(f" AND {clause}" for clause in clauses), params
+
+    def search(self, query: str, channels: Optional[Sequence[str]] = None, since: Optional[str] = None,
+               until: Optional[str] = None, kinds: Optional[Sequence[str]] = None, limit: int = 20,
+               offset: int = 0, raw: bool = False) -> List[Dict]:
+        """
+        Find the documents matching a query, best first.
+
+        Args:
+            query: Words that must all occur ("quoted" for a phrase, word* for
+                a prefix), or an FTS5 query if raw is True (OR, NOT, NEAR, ...)
+            channels: Only documents of these channel handles
+            since: Only videos published at/after this time (ISO 8601)
+            until: Only videos published before this time (a date alone
+                includes that whole day)
+            kinds: Only these document kinds (see DOC_KINDS)
+            limit: Maximum results
+            offset: Results to skip (for paging)
+            raw: Pass the query to FTS5 unchanged
+
+        Returns:
+            Result dictionaries with the RESULT_COLUMNS fields; score is the
+            BM25 relevance (higher is better) and snippet the matching text
+            with matches in [brackets]
+        """
+        expression = query if raw else match_expression(query)
+        if not expression:
+            return []
+        where, params = self._filters(channels, since, until, kinds)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT d.kind, d.video_id, d.cid, d.channel_handle, d.published_at, -bm25(docs_fts) AS score, "
+                "snippet(docs_fts, 0, '[', ']', '...', 16) "
+                "FROM docs_fts JOIN docs d ON d.doc_id = docs_fts.rowid "
+                f"WHERE docs_fts MATCH ?{where} ORDER BY bm25(docs_fts) LIMIT ? OFFSET ?",
+                [expression, *params, limit, offset]
+            ).fetchall()
+        return [dict(zip(RESULT_COLUMNS, row)) for row in rows]
+
+    def count(self, query: str, channels: Optional[Sequence[str]] = None, since: Optional[str] = None,
+              until: Optional[str] = None, kinds: Optional[Sequence[str]] = None, raw: bool = False) -> int:
+        """Return the number of documents matching a query (same arguments as search)."""
+        expression = query if raw else match_expression(query)
+        if not expression:
+            return 0
+        where, params = self._filters(channels, since, until, kinds)
+        with self.lock:
+            return self.conn.execute(
+                "SELECT COUNT(*) FROM docs_fts JOIN docs d ON d.doc_id = docs_fts.rowid "
+                f"WHERE docs_fts MATCH ?{where}",
+                [expression, *params]
+            ).fetchone()[0]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Build or query the search index from the command line."""
+    parser = argparse.ArgumentParser(description="Full-text search over scraped videos and comments")
+    parser.add_argument('--index', default=str(Path(CACHE_DIR) / SEARCH_INDEX_FILE), help="index database file")
+    commands = parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index (or update the index of) a dataset")
+    build.add_argument('source', nargs='?', default=OUTPUT_DIR,
+                       help="output directory or file, or the cache directory (see dataset.py)")
+    search = commands.add_parser('search', help="search the index")
+    search.add_argument('query')
+    search.add_argument('--channel', action='append', help="channel handle (repeatable)")
+    search.add_argument('--since', help="videos published at/after this date")
+    search.add_argument('--until', help="videos published on or before this date (or before this ISO time)")
+    search.add_argument('--kind', action='append', choices=DOC_KINDS, help="document kind (repeatable)")
+    search.add_argument('--limit', type=int, default=20)
+    search.add_argument('--raw', action='store_true', help="pass the query to FTS5 unchanged")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with SearchIndex(args.index) as index:
+        if args.command == 'build':
+            from dataset import open_dataset
+            with open_dataset(args.source) as dataset:
+                new, changed = index.add_many(dataset.iter_videos(transcript=True, comments=True))
+            index.optimize()
+            logger.info(f"Indexed {new} new and {changed} changed documents ({len(index)} in total)")
+            return
+
+        started = time.perf_counter()
+        results = index.search(args.query, args.channel, args.since, args.until, args.kind,
+                               limit=args.limit, raw=args.raw)
+        total = index.count(args.query, args.channel, args.since, args.until, args.kind, raw=args.raw)
+        print(f"{total} matches ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        for result in results:
+            where = f"{result['video_id']}" + (f" comment {result['cid']}" if result['cid'] else '')
+            print(f"{result['score']:7.2f}  {result['channel_handle']}  {(result['published_at'] or '')[:10]}  "
+                  f"{result['kind']:<11} {where}\n         {result['snippet']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,337 @@
+"""
+Channel and video statistics snapshots for the YouTube Political Study Scraper
+
+A snapshot records the subscriber, view and video counts of every channel and
+the view, like and comment counts of the videos tracked for them, all under
+one timestamp. Repeating it periodically (python cli.py --snapshot --interval
+...) gives a time series of each count without re-crawling videos, transcripts
+or comments: a snapshot of C channels and V videos costs about
+ceil(C / 50) + ceil(V / 50) quota units once channel handles are resolved.
+
+Snapshots are appended to a compact columnar series on disk. Each series
+(channels/ and videos/ under SNAPSHOT_DIR) is a directory with one binary file
+per column of fixed-width integers, so appending a snapshot is a few
+sequential writes and reading one column never touches the others:
+
+    ts.col        snapshot time (Unix seconds, UTC), 8 bytes per row
+    entity.col    row's channel/video, as an index into entities.txt, 4 bytes
+    <count>.col   one file per count, 8 bytes per row (-1 if hidden)
+    entities.txt  channel/video IDs, one per line, in order of first appearance
+
+Rows are only complete once every column has them; columns left longer than
+the others by an interrupted append are cut back when the series is opened.
+A series is written by one process at a time.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from array import array
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import *
+
+logger = logging.getLogger(__name__)
+
+# Counts kept per channel and per video (named after the statistics fields)
+CHANNEL_STAT_COLUMNS = ('subscribers', 'views', 'videos')
+VIDEO_STAT_COLUMNS = ('views', 'likes', 'comments')
+CHANNEL_STAT_FIELDS = {'subscribers': 'subscriberCount', 'views': 'viewCount', 'videos': 'videoCount'}
+VIDEO_STAT_FIELDS = {'views': 'viewCount', 'likes': 'likeCount', 'comments': 'commentCount'}
+
+# Value of a count the API does not return (hidden subscriber or like counts)
+MISSING = -1
+
+# array typecodes of the timestamp/count columns and of the entity column
+VALUE_TYPECODE = 'q'
+ENTITY_TYPECODE = 'i'
+
+
+def parse_statistics(statistics: Dict, fields: Dict[str, str]) -> Tuple[int, ...]:
+    """
+    Convert a statistics object of the Data API (counts as strings) to integers.
+
+    Args:
+        statistics: `statistics` part of a channels/videos resource
+        fields: Column name to statistics field (CHANNEL_STAT_FIELDS or
+            VIDEO_STAT_FIELDS)
+
+    Returns:
+        Counts in the order of fields, MISSING where a count is hidden
+    """
+    values = []
+    for field in fields.values():
+        try:
+            values.append(int(statistics[field]))
+        except (KeyError, TypeError, ValueError):
+            values.append(MISSING)
+    return tuple(values)
+
+
+def to_timestamp(value) -> Optional[int]:
+    """Convert a datetime, ISO 8601 string or number to Unix seconds (None passes through)."""
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+class TimeSeries:
+    """Append-only columnar series of integer counts, one row per entity and snapshot."""
+
+    def __init__(self, path, columns: Sequence[str]):
+        """
+        Open (and create if needed) a series.
+
+        Args:
+            path: Directory of the series
+            columns: Names of the count columns
+
+        Raises:
+            ValueError: If the series on disk has other columns
+        """
+        self.path = Path(path)
+        self.columns = tuple(columns)
+        self.lock = threading.Lock()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        meta_file = self.path / 'meta.json'
+        if meta_file.exists():
+            with open(meta_file, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if tuple(meta['columns']) != self.columns:
+                raise ValueError(f"{self.path} holds columns {meta['columns']}, not {list(self.columns)}")
+            self.byteorder = meta['byteorder']
+        else:
+            self.byteorder = sys.byteorder
+            with open(meta_file, 'w', encoding='utf-8') as f:
+                json.dump({'columns': list(self.columns), 'byteorder': self.byteorder}, f, indent=2)
+
+        self.entities: List[str] = []
+        entities_file = self.path / 'entities.txt'
+        if entities_file.exists():
+            with open(entities_file, 'rb') as f:
+                text = f.read()
+            # A line cut short by an interruption is not referenced by any row
+            complete = text[:text.rfind(b'\n') + 1]
+            if len(complete) != len(text):
+                with open(entities_file, 'r+b') as f:
+                    f.truncate(len(complete))
+            self.entities = complete.decode('utf-8').splitlines()
+        self.entity_index = {entity: index for index, entity in enumerate(self.entities)}
+        self.rows = self._complete_rows()
+
+    def _column_files(self) -> Dict[str, Tuple[Path, str]]:
+        files = {'ts': (self.path / 'ts.col', VALUE_TYPECODE),
+                 'entity': (self.path / 'entity.col', ENTITY_TYPECODE)}
+        for column in self.columns:
+            files[column] = (self.path / f"{column}.col", VALUE_TYPECODE)
+        return files
+
+    def _complete_rows(self) -> int:
+        """Return the number of rows present in every column, cutting longer columns back to it."""
+        files = self._column_files()
+        sizes = {name: (path.stat().st_size if path.exists() else 0) // array(typecode).itemsize
+                 for name, (path, typecode) in files.items()}
+        rows = min(sizes.values())
+        for name, (path, typecode) in files.items():
+            if path.exists() and path.stat().st_size != rows * array(typecode).itemsize:
+                logger.warning(f"Dropping an incomplete snapshot row from {path}")
+                with open(path, 'r+b') as f:
+                    f.truncate(rows * array(typecode).itemsize)
+        return rows
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def append(self, ts, rows: Iterable[Tuple[str, Sequence[int]]]) -> int:
+        """
+        Append one snapshot.
+
+        Args:
+            ts: Snapshot time (datetime, ISO 8601 string or Unix seconds)
+            rows: (channel/video ID, counts in column order) pairs
+
+        Returns:
+            Number of rows appended
+        """
+        ts = to_timestamp(ts)
+        data = {name: array(typecode) for name, (_, typecode) in self._column_files().items()}
+        with self.lock:
+            new_entities = []
+            for entity, values in rows:
+                if entity not in self.entity_index:
+                    self.entity_index[entity] = len(self.entities)
+                    self.entities.append(entity)
+                    new_entities.append(entity)
+                data['ts'].append(ts)
+                data['entity'].append(self.entity_index[entity])
+                for column, value in zip(self.columns, values):
+                    data[column].append(MISSING if value is None else int(value))
+            if not data['ts']:
+                return 0
+
+            # Entities first, so every row written refers to a known entity
+            if new_entities:
+                with open(self.path / 'entities.txt', 'a', encoding='utf-8') as f:
+                    f.write(''.join(entity + '\n' for entity in new_entities))
+            for name, (path, _) in self._column_files().items():
+                if self.byteorder != sys.byteorder:
+                    data[name].byteswap()
+                with open(path, 'ab') as f:
+                    data[name].tofile(f)
+            self.rows += len(data['ts'])
+            return len(data['ts'])
+
+    def _read_column(self, name: str) -> array:
+        path, typecode = self._column_files()[name]
+        values = array(typecode)
+        if path.exists():
+            with open(path, 'rb') as f:
+                values.fromfile(f, self.rows)
+            if self.byteorder != sys.byteorder:
+                values.byteswap()
+        return values
+
+    def read(self, columns: Optional[Sequence[str]] = None, entities: Optional[Iterable[str]] = None,
+             since=None, until=None) -> Dict[str, list]:
+        """
+        Read rows of the series, column by column.
+
+        Args:
+            columns: Count columns to read (default: all)
+            entities: Only rows of these channel/video IDs (default: all)
+            since: Only rows taken at/after this time
+            until: Only rows taken at/before this time
+
+        Returns:
+            Dictionary with 'ts' (Unix seconds), 'entity' (IDs) and the
+            requested count columns as equally long lists, in append order
+        """
+        columns = self.columns if columns is None else tuple(columns)
+        unknown = set(columns) - set(self.columns)
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(sorted(unknown))}")
+        since, until = to_timestamp(since), to_timestamp(until)
+
+        with self.lock:
+            ts = self._read_column('ts')
+            entity = self._read_column('entity')
+            wanted = None
+            if entities is not None:
+                wanted = {self.entity_index[e] for e in entities if e in self.entity_index}
+            rows = [row for row in range(len(ts))
+                    if (since is None or ts[row] >= since) and (until is None or ts[row] <= until)
+                    and (wanted is None or entity[row] in wanted)]
+            result = {'ts': [ts[row] for row in rows],
+                      'entity': [self.entities[entity[row]] for row in rows]}
+            for column in columns:
+                values = self._read_column(column)
+                result[column] = [values[row] for row in rows]
+        return result
+
+    def history(self, entity: str) -> List[Tuple[int, ...]]:
+        """Return the (ts, counts...) rows of one channel/video, oldest first."""
+        data = self.read(entities=[entity])
+        return list(zip(data['ts'], *(data[column] for column in self.columns)))
+
+    def latest(self) -> Dict[str, Tuple[int, ...]]:
+        """Return the newest (ts, counts...) row of every channel/video."""
+        data = self.read()
+        latest = {}
+        for row in zip(data['entity'], data['ts'], *(data[column] for column in self.columns)):
+            latest[row[0]] = row[1:]
+        return latest
+
+    def to_dataframe(self, **kwargs):
+        """Return read(**kwargs) as a pandas DataFrame with a UTC datetime 'ts' column."""
+        import pandas as pd
+        frame = pd.DataFrame(self.read(**kwargs))
+        frame['ts'] = pd.to_datetime(frame['ts'], unit='s', utc=True)
+        return frame
+
+
+class StatsSeries:
+    """Channel and video statistics series kept side by side in one directory."""
+
+    def __init__(self, directory=SNAPSHOT_DIR):
+        """
+        Open (and create if needed) the series.
+
+        Args:
+            directory: Directory holding the channels/ and videos/ series
+        """
+        self.directory = Path(directory)
+        self.channels = TimeSeries(self.directory / 'channels', CHANNEL_STAT_COLUMNS)
+        self.videos = TimeSeries(self.directory / 'videos', VIDEO_STAT_COLUMNS)
+
+
+def tracked_video_ids(scraper, channel_handles: List[str],
+                      max_age_days: Optional[float] = SNAPSHOT_VIDEO_MAX_AGE_DAYS) -> List[str]:
+    """
+    Return the videos whose statistics a snapshot records: the mined videos of
+    the channels (from the video store), newest first.
+
+    Args:
+        scraper: YouTubeScraper whose video store is read
+        channel_handles: Channel handles
+        max_age_days: Only videos published within this many days (None: all)
+    """
+    published_since = None
+    if max_age_days is not None:
+        published_since = (datetime.now(timezone.utc) - timedelta(days=max_age_days)).strftime('%Y-%m-%dT%H:%M:%SZ')
+    video_ids = []
+    for channel_handle in channel_handles:
+        video_ids.extend(scraper.video_store.channel_video_ids(channel_handle, published_since=published_since))
+    return video_ids
+
+
+def take_snapshot(scraper, series: StatsSeries, channel_handles: List[str],
+                  video_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Record the current statistics of channels and videos.
+
+    Channel handles are resolved to IDs once (and cached); the statistics are
+    then fetched 50 channels or videos per request, bypassing the HTTP
+    response cache so each snapshot records live counts.
+
+    Args:
+        scraper: YouTubeScraper used for the Data API requests
+        series: Series the snapshot is appended to
+        channel_handles: Channel handles
+        video_ids: Videos to record (default: tracked_video_ids)
+
+    Returns:
+        Dictionary with the snapshot time and the number of channel and video
+        rows recorded
+    """
+    ts = int(time.time())
+    channel_ids = scraper.resolve_channel_ids(channel_handles)
+    unresolved = [handle for handle in channel_handles if handle not in channel_ids]
+    if unresolved:
+        logger.warning(f"Could not resolve channel handles: {', '.join(unresolved)}")
+
+    channels = scraper.get_channels_stats(list(channel_ids.values()), part="statistics", fresh=True)
+    channel_rows = series.channels.append(ts, (
+        (channel_id, parse_statistics(channels[channel_id].get('statistics', {}), CHANNEL_STAT_FIELDS))
+        for channel_id in channel_ids.values() if channel_id in channels
+    ))
+
+    if video_ids is None:
+        video_ids = tracked_video_ids(scraper, channel_handles)
+    videos = scraper.get_videos_details(video_ids, part="statistics", fresh=True)
+    video_rows = series.videos.append(ts, (
+        (video_id, parse_statistics(videos[video_id].get('statistics', {}), VIDEO_STAT_FIELDS))
+        for video_id in video_ids if video_id in videos
+    ))
+
+    logger.info(f"Snapshot at {datetime.fromtimestamp(ts, timezone.utc).isoformat()}: "
+                f"{channel_rows}/{len(channel_handles)} channels, {video_rows}/{len(video_ids)} videos")
+    return {'ts': ts, 'channels': channel_rows, 'videos': video_rows}
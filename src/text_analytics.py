@@ -0,0 +1,349 @@
+"""
+Batch text analytics for the YouTube Political Study Scraper
+
+Scores every comment and transcript of a scraped dataset with lexicons and
+adds length and engagement features, writing the results as tables keyed by
+video_id (transcripts) and by video_id and cid (comments), to be joined with
+the exported videos and comments:
+
+    python text_analytics.py data/ --output data/analytics --lexicons lexicons.json
+
+Texts are streamed from the dataset (see dataset.py) in chunks of
+ANALYTICS_CHUNK_SIZE rows, and the chunks are scored in a process pool, so
+memory stays bounded and every core is used. Within a chunk, each text is
+tokenized once. The matched lexicon terms form a sparse document-term
+matrix (as row/column index arrays), and every count and score is computed
+for the whole chunk at once with NumPy: hits are a sparse-dense product of
+that matrix and the term weights (np.bincount), and scores, rates and
+lengths are column operations.
+
+Lexicons map a name to a list of terms (weight 1) or a {term: weight}
+object. Terms are words or phrases ("climate change"). Each lexicon adds a
+<name>_hits column, and each score in ANALYTICS_SCORES adds a column
+(a - b) / (a + b) of two lexicons' hits: 0 when neither matched, 1 when
+only the first one did. The built-in lexicons are small examples; load the
+study's own from a JSON file.
+"""
+
+import argparse
+import csv
+import json
+import logging
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from config import *
+from exporters import load_pyarrow
+from records import parse_count
+
+logger = logging.getLogger(__name__)
+
+np = None
+
+DEFAULT_LEXICONS = {
+    'positive': ['good', 'great', 'love', 'best', 'agree', 'right', 'true', 'thank', 'thanks', 'amazing',
+                 'awesome', 'support', 'hope', 'fair', 'honest', 'respect', 'brilliant', 'excellent', 'win',
+                 'well said'],
+    'negative': ['bad', 'worst', 'hate', 'wrong', 'lie', 'lies', 'liar', 'stupid', 'corrupt', 'disgusting',
+                 'terrible', 'awful', 'fake', 'trash', 'evil', 'shame', 'pathetic', 'idiot', 'lose', 'fraud'],
+    'progressive': ['progressive', 'progressives', 'leftist', 'socialism', 'socialist', 'democrat', 'democrats',
+                    'liberal', 'liberals', 'medicare for all', 'climate change', 'union', 'unions'],
+    'conservative': ['conservative', 'conservatives', 'republican', 'republicans', 'maga', 'trump', 'gop',
+                     'right wing', 'patriot', 'patriots', 'second amendment', 'border wall'],
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+COMMENT_KEYS = ('video_id', 'cid')
+TRANSCRIPT_KEYS = ('video_id',)
+
+# Per-process scorer, built once by the pool initializer
+_worker_scorer = None
+
+
+def load_numpy():
+    """Import numpy into this module on first use and return it."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def load_lexicons(path) -> Dict[str, Union[List[str], Dict[str, float]]]:
+    """
+    Read lexicons from a JSON file.
+
+    Args:
+        path: JSON object mapping lexicon names to term lists or
+            {term: weight} objects
+
+    Returns:
+        The lexicons
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        lexicons = json.load(f)
+    if not isinstance(lexicons, dict) or not all(isinstance(terms, (list, dict)) for terms in lexicons.values()):
+        raise ValueError(f"{path} must map lexicon names to term lists or {{term: weight}} objects")
+    return lexicons
+
+
+class LexiconScorer:
+    """Computes lexicon hits, scores and length/engagement features for batches of texts."""
+
+    def __init__(self, lexicons: Dict[str, Union[List[str], Dict[str, float]]],
+                 scores: Optional[Dict[str, Tuple[str, str]]] = None):
+        """
+        Compile lexicons into a term vocabulary and a (terms x lexicons) weight matrix.
+
+        Args:
+            lexicons: Lexicon name to term list or {term: weight}
+            scores: Score name to the (first, second) lexicons it contrasts
+                (defaults to ANALYTICS_SCORES, keeping the scores whose
+                lexicons are given)
+        """
+        load_numpy()
+        self.names = list(lexicons)
+        if scores is None:
+            scores = {name: pair for name, pair in ANALYTICS_SCORES.items() if set(pair) <= set(self.names)}
+        missing = {lexicon for pair in scores.values() for lexicon in pair} - set(self.names)
+        if missing:
+            raise ValueError(f"Scores refer to unknown lexicons: {', '.join(sorted(missing))}")
+        self.scores = dict(scores)
+
+        self.vocabulary: Dict[str, int] = {}
+        entries = []
+        for column, name in enumerate(self.names):
+            terms = lexicons[name]
+            weights = terms.items() if isinstance(terms, dict) else ((term, 1.0) for term in terms)
+            for term, weight in weights:
+                term = ' '.join(_TOKEN_RE.findall(term.lower()))
+                if term:
+                    entries.append((self.vocabulary.setdefault(term, len(self.vocabulary)), column, float(weight)))
+        self.weights = np.zeros((len(self.vocabulary), len(self.names)))
+        for row, column, weight in entries:
+            self.weights[row, column] = weight
+        # Longest phrase, in words
+        self.max_words = max((term.count(' ') + 1 for term in self.vocabulary), default=1)
+
+    def _matches(self, texts: List[str]):
+        """Return the sparse document-term matches (document rows, term columns) and word counts."""
+        vocabulary = self.vocabulary
+        columns, lengths, words = [], [], []
+        for text in texts:
+            tokens = _TOKEN_RE.findall(text.lower()) if text else []
+            hits = [vocabulary[token] for token in tokens if token in vocabulary]
+            for size in range(2, self.max_words + 1):
+                hits.extend(vocabulary[phrase] for phrase in map(' '.join, zip(*(tokens[i:] for i in range(size))))
+                            if phrase in vocabulary)
+            columns.extend(hits)
+            lengths.append(len(hits))
+            words.append(len(tokens))
+        rows = np.repeat(np.arange(len(texts)), lengths)
+        return rows, np.asarray(columns, dtype=np.int64), np.asarray(words, dtype=np.int64)
+
+    def score(self, texts: List[str]) -> Dict[str, "np.ndarray"]:
+        """
+        Score a batch of texts.
+
+        Returns:
+            Column name to array (one value per text): chars, words,
+            <lexicon>_hits for every lexicon and one column per score
+        """
+        rows, columns, words = self._matches(texts)
+        result = {
+            'chars': np.fromiter((len(text) if text else 0 for text in texts), dtype=np.int64, count=len(texts)),
+            'words': words,
+        }
+        hits = {}
+        for index, name in enumerate(self.names):
+            hits[name] = np.bincount(rows, weights=self.weights[columns, index], minlength=len(texts))
+            result[f"{name}_hits"] = hits[name]
+        for score, (first, second) in self.scores.items():
+            total = hits[first] + hits[second]
+            result[score] = np.divide(hits[first] - hits[second], total,
+                                      out=np.zeros(len(texts)), where=total != 0)
+        return result
+
+
+def engagement_features(kind: str, rows: Dict[str, list]) -> Dict[str, "np.ndarray"]:
+    """Return the engagement columns of a chunk of comment or transcript rows."""
+    def counts(name):
+        return np.asarray([parse_count(value) or 0 for value in rows[name]], dtype=np.float64)
+
+    if kind == 'comments':
+        votes, replies = counts('votes'), counts('replies')
+        return {'votes': votes.astype(np.int64), 'replies': replies.astype(np.int64),
+                'log_votes': np.log1p(votes)}
+    views, likes, comments = counts('view_count'), counts('like_count'), counts('comment_count')
+    return {
+        'view_count': views.astype(np.int64),
+        'like_rate': np.divide(likes, views, out=np.zeros(len(views)), where=views > 0),
+        'comment_rate': np.divide(comments, views, out=np.zeros(len(views)), where=views > 0),
+    }
+
+
+def _init_worker(lexicons: Dict, scores: Optional[Dict]) -> None:
+    global _worker_scorer
+    _worker_scorer = LexiconScorer(lexicons, scores)
+
+
+def score_chunk(kind: str, rows: Dict[str, list]) -> Dict[str, list]:
+    """
+    Score one chunk in a pool worker.
+
+    Args:
+        kind: 'comments' or 'transcripts'
+        rows: Column name to values: the keys, 'text' and the engagement
+            fields
+
+    Returns:
+        The keys and every feature column, as lists
+    """
+    features = _worker_scorer.score(rows['text'])
+    features.update(engagement_features(kind, rows))
+    keys = COMMENT_KEYS if kind == 'comments' else TRANSCRIPT_KEYS
+    result = {key: rows[key] for key in keys}
+    result.update((name, values.tolist()) for name, values in features.items())
+    return result
+
+
+def iter_chunks(dataset, kind: str, chunk_size: int) -> Iterator[Dict[str, list]]:
+    """
+    Stream the comments or transcripts of a dataset as column chunks.
+
+    Args:
+        dataset: VideoDataset to read
+        kind: 'comments' or 'transcripts'
+        chunk_size: Rows per chunk
+    """
+    if kind == 'comments':
+        fields = list(COMMENT_KEYS) + ['text', 'votes', 'replies']
+    else:
+        fields = list(TRANSCRIPT_KEYS) + ['text', 'view_count', 'like_count', 'comment_count']
+    chunk = {field: [] for field in fields}
+    for video in dataset.iter_videos(transcript=kind == 'transcripts', comments=kind == 'comments'):
+        if kind == 'comments':
+            for comment in video['comments']:
+                for field, value in zip(fields, (video['video_id'], comment.get('cid'), comment.get('text') or '',
+                                                 comment.get('votes'), comment.get('replies'))):
+                    chunk[field].append(value)
+        elif video.get('transcript'):
+            for field, value in zip(fields, (video['video_id'], video['transcript'], video.get('view_count'),
+                                             video.get('like_count'), video.get('comment_count'))):
+                chunk[field].append(value)
+        if len(chunk['text']) >= chunk_size:
+            yield chunk
+            chunk = {field: [] for field in fields}
+    if chunk['text']:
+        yield chunk
+
+
+class _TableWriter:
+    """Writes result chunks to a Parquet file (if pyarrow is installed) or a CSV file."""
+
+    def __init__(self, path_without_suffix: Path):
+        self.parquet = load_pyarrow()
+        self.path = path_without_suffix.with_suffix('.parquet' if self.parquet else '.csv')
+        self.writer = None
+        self.file = None
+        self.rows = 0
+
+    def write(self, chunk: Dict[str, list]) -> None:
+        if self.parquet:
+            from exporters import pa, pq
+            table = pa.table(chunk)
+            if self.writer is None:
+                self.writer = pq.ParquetWriter(self.path, table.schema)
+            self.writer.write_table(table)
+        else:
+            if self.writer is None:
+                self.file = open(self.path, 'w', encoding='utf-8', newline='')
+                self.writer = csv.writer(self.file, lineterminator='\n')
+                self.writer.writerow(chunk)
+            self.writer.writerows(zip(*chunk.values()))
+        self.rows += len(next(iter(chunk.values())))
+
+    def close(self) -> None:
+        if self.parquet and self.writer is not None:
+            self.writer.close()
+        if self.file is not None:
+            self.file.close()
+
+
+def analyze_dataset(source=OUTPUT_DIR, output_dir=None, lexicons: Optional[Dict] = None,
+                    scores: Optional[Dict[str, Tuple[str, str]]] = None, workers: Optional[int] = None,
+                    chunk_size: int = ANALYTICS_CHUNK_SIZE, kinds=('comments', 'transcripts')) -> Dict[str, Path]:
+    """
+    Score the comments and transcripts of a scraped dataset.
+
+    Args:
+        source: Output directory or file, or the cache directory (see dataset.py)
+        output_dir: Directory for the results (default: <OUTPUT_DIR>/analytics)
+        lexicons: Lexicons (default: ANALYTICS_LEXICON_FILE, else DEFAULT_LEXICONS)
+        scores: Score name to the (first, second) lexicons it contrasts
+            (default: ANALYTICS_SCORES)
+        workers: Worker processes (default: ANALYTICS_WORKERS, else one per core)
+        chunk_size: Rows scored per task
+        kinds: 'comments' and/or 'transcripts'
+
+    Returns:
+        Dictionary mapping each kind to its result file
+        (comment_analytics / transcript_analytics, .parquet or .csv)
+    """
+    from dataset import open_dataset
+
+    if lexicons is None:
+        lexicons = load_lexicons(ANALYTICS_LEXICON_FILE) if ANALYTICS_LEXICON_FILE else DEFAULT_LEXICONS
+    # Validate here rather than in every worker
+    LexiconScorer(lexicons, scores)
+    workers = workers or ANALYTICS_WORKERS or os.cpu_count() or 1
+    output_dir = Path(output_dir or Path(OUTPUT_DIR) / 'analytics')
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    with open_dataset(source) as dataset, \
+            ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(lexicons, scores)) as pool:
+        for kind in kinds:
+            writer = _TableWriter(output_dir / f"{kind[:-1]}_analytics")
+            pending = deque()
+            try:
+                # At most two chunks per worker are in flight; results are
+                # written in input order
+                for chunk in iter_chunks(dataset, kind, chunk_size):
+                    pending.append(pool.submit(score_chunk, kind, chunk))
+                    while len(pending) >= 2 * workers:
+                        writer.write(pending.popleft().result())
+                while pending:
+                    writer.write(pending.popleft().result())
+            finally:
+                writer.close()
+            logger.info(f"Scored {writer.rows} {kind} into {writer.path}")
+            results[kind] = writer.path
+    return results
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    """Run the analytics stage from the command line."""
+    parser = argparse.ArgumentParser(description="Lexicon scores and features for scraped comments and transcripts")
+    parser.add_argument('source', nargs='?', default=OUTPUT_DIR,
+                        help="output directory or file, or the cache directory (see dataset.py)")
+    parser.add_argument('--output', help="directory for the results (default: <output dir>/analytics)")
+    parser.add_argument('--lexicons', help="JSON file of lexicons (name -> terms or {term: weight})")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--chunk-size', type=int, default=ANALYTICS_CHUNK_SIZE, help="rows per task")
+    parser.add_argument('--only', choices=('comments', 'transcripts'), help="score only comments or transcripts")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    analyze_dataset(args.source, args.output, load_lexicons(args.lexicons) if args.lexicons else None,
+                    workers=args.workers, chunk_size=args.chunk_size,
+                    kinds=(args.only,) if args.only else ('comments', 'transcripts'))
+
+
+if __name__ == "__main__":
+    main()
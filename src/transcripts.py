@@ -0,0 +1,318 @@
+"""
+Transcript retrieval and storage for the YouTube Political Study Scraper
+
+Transcripts keep their timing: a Transcript holds the start, duration and
+text of every segment in parallel arrays (times in milliseconds) rather than
+one joined string. TranscriptStore caches them in SQLite by video ID and
+language, so a re-crawl sends no transcript traffic, and records videos
+without a transcript as negative entries so they are never requested again.
+
+TranscriptClient fetches through youtube-transcript-api's transcript list,
+which works with both the 0.6 API (YouTubeTranscriptApi.list_transcripts)
+and the 1.x API (YouTubeTranscriptApi().list), picking the first available
+language of a preference list (manually created transcripts before generated
+ones).
+"""
+
+import json
+import sqlite3
+import threading
+import zlib
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from config import *
+
+# youtube-transcript-api errors (by class name, across library versions)
+# meaning the video has no transcript in any language
+NO_TRANSCRIPT_ERRORS = {'TranscriptsDisabled', 'VideoUnavailable', 'VideoUnplayable',
+                        'InvalidVideoId', 'AgeRestricted'}
+# Errors meaning none of the requested languages is available
+NO_LANGUAGE_ERRORS = {'NoTranscriptFound'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transcripts (
+    video_id TEXT NOT NULL,
+    language TEXT NOT NULL,
+    generated INTEGER NOT NULL DEFAULT 0,
+    fetched_at TEXT NOT NULL,
+    segments BLOB NOT NULL,
+    PRIMARY KEY (video_id, language)
+);
+CREATE TABLE IF NOT EXISTS missing_transcripts (
+    video_id TEXT PRIMARY KEY,
+    reason TEXT NOT NULL,
+    languages TEXT NOT NULL,
+    checked_at TEXT NOT NULL
+);
+"""
+
+
+def _error_names(error: Exception) -> set:
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+def missing_reason(error: Exception) -> Optional[str]:
+    """
+    Tell whether an error means the video has no (suitable) transcript.
+
+    Returns:
+        The error class name for a permanent "no transcript" error, or None
+        for other (e.g. transient) errors
+    """
+    names = _error_names(error) & (NO_TRANSCRIPT_ERRORS | NO_LANGUAGE_ERRORS)
+    return sorted(names)[0] if names else None
+
+
+class Transcript:
+    """Timed transcript segments of one video in one language."""
+
+    __slots__ = ('video_id', 'language', 'generated', 'starts', 'durations', 'texts')
+
+    def __init__(self, video_id: str, language: str, generated: bool,
+                 starts: Iterable[int], durations: Iterable[int], texts: List[str]):
+        """
+        Build a transcript.
+
+        Args:
+            video_id: YouTube video ID
+            language: Language code of the transcript
+            generated: Whether YouTube generated the transcript automatically
+            starts: Segment start times in milliseconds
+            durations: Segment durations in milliseconds
+            texts: Segment texts
+        """
+        self.video_id = video_id
+        self.language = language
+        self.generated = bool(generated)
+        self.starts = array('l', starts)
+        self.durations = array('l', durations)
+        self.texts = list(texts)
+
+    @classmethod
+    def from_segments(cls, video_id: str, language: str, generated: bool,
+                      segments: Iterable) -> "Transcript":
+        """
+        Build a transcript from youtube-transcript-api segments.
+
+        Args:
+            segments: Dicts with text, start and duration (0.6 API) or
+                snippet objects with the same attributes (1.x API)
+        """
+        starts, durations, texts = [], [], []
+        for segment in segments:
+            if isinstance(segment, dict):
+                text, start, duration = segment['text'], segment['start'], segment.get('duration', 0)
+            else:
+                text, start, duration = segment.text, segment.start, segment.duration
+            starts.append(int(round(start * 1000)))
+            durations.append(int(round((duration or 0) * 1000)))
+            texts.append(text)
+        return cls(video_id, language, generated, starts, durations, texts)
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def __repr__(self) -> str:
+        return f"Transcript({self.video_id!r}, {self.language!r}, {len(self)} segments)"
+
+    @property
+    def text(self) -> str:
+        """The segment texts joined by spaces."""
+        return " ".join(self.texts)
+
+    def segments(self) -> List[Dict]:
+        """Return the segments as dicts with text, start and duration in seconds."""
+        return [{'text': text, 'start': start / 1000, 'duration': duration / 1000}
+                for text, start, duration in zip(self.texts, self.starts, self.durations)]
+
+    def between(self, start: float, end: float) -> List[Dict]:
+        """Return the segments overlapping the interval [start, end) in seconds."""
+        start_ms, end_ms = start * 1000, end * 1000
+        return [{'text': text, 'start': seg_start / 1000, 'duration': seg_duration / 1000}
+                for text, seg_start, seg_duration in zip(self.texts, self.starts, self.durations)
+                if seg_start < end_ms and seg_start + seg_duration > start_ms]
+
+    def encode(self) -> bytes:
+        """Serialize the segments compactly (zlib-compressed JSON arrays)."""
+        payload = [self.starts.tolist(), self.durations.tolist(), self.texts]
+        return zlib.compress(json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8'))
+
+    @classmethod
+    def decode(cls, video_id: str, language: str, generated: bool, blob: bytes) -> "Transcript":
+        """Deserialize segments written by encode."""
+        starts, durations, texts = json.loads(zlib.decompress(blob).decode('utf-8'))
+        return cls(video_id, language, generated, starts, durations, texts)
+
+
+class TranscriptClient:
+    """Fetches transcripts with youtube-transcript-api 0.6 or 1.x (or a compatible object)."""
+
+    def __init__(self, api=None):
+        """
+        Wrap a transcript API.
+
+        Args:
+            api: YouTubeTranscriptApi (the class, or an instance for 1.x), or
+                any object providing get_transcript(video_id, languages=...);
+                None imports youtube-transcript-api on the first fetch
+        """
+        self._api = api
+        self.instance = None
+        self.lock = threading.Lock()
+
+    @property
+    def api(self):
+        """The wrapped transcript API (YouTubeTranscriptApi unless one was given)."""
+        if self._api is None:
+            from youtube_transcript_api import YouTubeTranscriptApi
+            self._api = YouTubeTranscriptApi
+        return self._api
+
+    def _list(self, video_id: str):
+        """Return the video's transcript list, or None if the API cannot list."""
+        if hasattr(self.api, 'list'):
+            # 1.x API: instance methods on a reusable client
+            with self.lock:
+                if self.instance is None:
+                    self.instance = self.api() if isinstance(self.api, type) else self.api
+            return self.instance.list(video_id)
+        if hasattr(self.api, 'list_transcripts'):
+            # 0.6 API: class methods
+            return self.api.list_transcripts(video_id)
+        return None
+
+    def fetch(self, video_id: str, languages: List[str]) -> Transcript:
+        """
+        Fetch the transcript in the first available preferred language.
+
+        Args:
+            video_id: YouTube video ID
+            languages: Language codes in order of preference
+
+        Returns:
+            The transcript
+
+        Raises:
+            Exception: youtube-transcript-api errors, unchanged
+        """
+        transcript_list = self._list(video_id)
+        if transcript_list is None:
+            segments = self.api.get_transcript(video_id, languages=languages)
+            return Transcript.from_segments(video_id, languages[0], False, segments)
+        transcript = transcript_list.find_transcript(languages)
+        return Transcript.from_segments(video_id, transcript.language_code, transcript.is_generated,
+                                        transcript.fetch())
+
+
+class TranscriptStore:
+    """SQLite cache of transcripts by video and language, with negative entries."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def get(self, video_id: str, languages: List[str]) -> Optional[Transcript]:
+        """Return a cached transcript in the first cached preferred language, or None."""
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT language, generated, segments FROM transcripts "
+                f"WHERE video_id = ? AND language IN ({','.join('?' * len(languages))})",
+                [video_id] + list(languages)
+            ).fetchall()
+        if not rows:
+            return None
+        by_language = {language: (generated, blob) for language, generated, blob in rows}
+        language = next(language for language in languages if language in by_language)
+        generated, blob = by_language[language]
+        return Transcript.decode(video_id, language, generated, blob)
+
+    def is_missing(self, video_id: str, languages: List[str]) -> bool:
+        """
+        Tell whether a video is known to have no transcript for these languages.
+
+        A video without any transcript is missing for every language list; a
+        video lacking the requested languages only for lists whose languages
+        were all tried before.
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT reason, languages FROM missing_transcripts WHERE video_id = ?", (video_id,)
+            ).fetchone()
+        if row is None:
+            return False
+        reason, tried = row
+        return reason in NO_TRANSCRIPT_ERRORS or set(languages) <= set(tried.split(','))
+
+    def lookup(self, video_id: str, languages: List[str]) -> Optional[Dict]:
+        """
+        Look a video up in the cache.
+
+        Returns:
+            {'status': 'hit', 'transcript': Transcript}, {'status': 'missing',
+            'transcript': None} for a negative entry, or None if not cached
+        """
+        transcript = self.get(video_id, languages)
+        if transcript is not None:
+            return {'status': 'hit', 'transcript': transcript}
+        if self.is_missing(video_id, languages):
+            return {'status': 'missing', 'transcript': None}
+        return None
+
+    def put(self, transcript: Transcript) -> None:
+        """Store a transcript (replacing the same video and language)."""
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO transcripts (video_id, language, generated, fetched_at, segments) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (transcript.video_id, transcript.language, int(transcript.generated),
+                 datetime.now().isoformat(), transcript.encode())
+            )
+            self.conn.execute("DELETE FROM missing_transcripts WHERE video_id = ?", (transcript.video_id,))
+
+    def put_missing(self, video_id: str, languages: List[str], reason: str) -> None:
+        """Record that a video has no transcript (in the given languages)."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT languages FROM missing_transcripts WHERE video_id = ?", (video_id,)
+            ).fetchone()
+            tried = set(languages) | (set(row[0].split(',')) if row else set())
+            self.conn.execute(
+                "INSERT OR REPLACE INTO missing_transcripts (video_id, reason, languages, checked_at) "
+                "VALUES (?, ?, ?, ?)",
+                (video_id, reason, ','.join(sorted(tried)), datetime.now().isoformat())
+            )
+
+    def forget_missing(self, video_ids: Optional[Iterable[str]] = None) -> int:
+        """
+        Drop negative entries so those videos are tried again.
+
+        Args:
+            video_ids: Videos to retry (None drops every negative entry)
+
+        Returns:
+            Number of entries removed
+        """
+        with self.lock:
+            if video_ids is None:
+                return self.conn.execute("DELETE FROM missing_transcripts").rowcount
+            return sum(
+                self.conn.execute("DELETE FROM missing_transcripts WHERE video_id = ?", (video_id,)).rowcount
+                for video_id in video_ids
+            )
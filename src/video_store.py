@@ -0,0 +1,232 @@
+"""
+Per-video record store for the YouTube Political Study Scraper
+
+Mined video data is kept in a SQLite database keyed by video_id, so each
+finished video is a single O(1) insert and the scraper can tell exactly which
+videos of a channel have already been mined. Records carry a content hash:
+storing an identical record again is a no-op, and a changed record replaces
+the previous one.
+"""
+
+import hashlib
+import json
+import logging
+import pickle
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+
+from metrics import METRICS, STAGE_CACHE_IO
+from records import comment_records, json_default
+
+logger = logging.getLogger(__name__)
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    channel_handle TEXT NOT NULL,
+    published_at TEXT,
+    content_hash TEXT NOT NULL,
+    stored_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel_handle, published_at);
+"""
+
+# Stay well below SQLite's limit on bound parameters per statement
+QUERY_CHUNK_SIZE = 500
+
+
+def decode_record(serialized: str) -> Dict:
+    """Deserialize a stored video record, holding its comments as CommentRecords."""
+    video_data = json.loads(serialized)
+    video_data['comments'] = comment_records(video_data.get('comments') or [])
+    return video_data
+
+
+def migrate_pickle(store: "VideoStore", cache_file) -> Optional[int]:
+    """
+    Import a legacy whole-channel pickle cache (list of video records) into a store.
+
+    The pickle is renamed to *.pkl.migrated afterwards so it is only imported
+    once.
+
+    Returns:
+        Number of new or changed records, or None if the import failed
+    """
+    cache_file = Path(cache_file)
+    try:
+        with open(cache_file, 'rb') as f:
+            cached_data = pickle.load(f)
+        imported = store.put_many(cached_data)
+        cache_file.rename(cache_file.with_name(cache_file.name + '.migrated'))
+        logger.info(f"Migrated {imported} videos from {cache_file.name} to the video store")
+        return imported
+    except Exception as e:
+        logger.warning(f"Failed to migrate mined data cache {cache_file.name}: {e}")
+        return None
+
+
+def content_hash(serialized: str) -> str:
+    """Return the content address (SHA-1 hex digest) of a serialized record."""
+    return hashlib.sha1(serialized.encode('utf-8')).hexdigest()
+
+
+class VideoStore:
+    """SQLite-backed store of processed video records, keyed by video_id."""
+
+    def __init__(self, db_path: str):
+        """
+        Open (and create if needed) the store.
+
+        Args:
+            db_path: Path of the SQLite database file
+        """
+        self.db_path = str(db_path)
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, timeout=60, isolation_level=None,
+                                    check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self.lock:
+            self.conn.close()
+
+    def __contains__(self, video_id: str) -> bool:
+        with self.lock:
+            row = self.conn.execute("SELECT 1 FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return row is not None
+
+    def __len__(self) -> int:
+        with self.lock:
+            return self.conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+    def known_ids(self, video_ids: Iterable[str]) -> set:
+        """
+        Return which of the given video IDs are already stored.
+
+        Args:
+            video_ids: YouTube video IDs to check
+
+        Returns:
+            Set of stored video IDs
+        """
+        ids = [video_id for video_id in video_ids if video_id]
+        known = set()
+        with self.lock:
+            for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                chunk = ids[start:start + QUERY_CHUNK_SIZE]
+                rows = self.conn.execute(
+                    f"SELECT video_id FROM videos WHERE video_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                known.update(row[0] for row in rows)
+        return known
+
+    def get(self, video_id: str) -> Optional[Dict]:
+        """
+        Load one video record.
+
+        Args:
+            video_id: YouTube video ID
+
+        Returns:
+            Video data dictionary or None if not stored
+        """
+        with METRICS.stage(STAGE_CACHE_IO):
+            with self.lock:
+                row = self.conn.execute("SELECT data FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+            if not row:
+                return None
+            METRICS.record(STAGE_CACHE_IO, items=1, size=len(row[0]))
+            return decode_record(row[0])
+
+    def get_many(self, video_ids: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Load several video records.
+
+        Args:
+            video_ids: YouTube video IDs
+
+        Returns:
+            Dictionary mapping stored video IDs to their data
+        """
+        ids = [video_id for video_id in video_ids if video_id]
+        records = {}
+        with METRICS.stage(STAGE_CACHE_IO):
+            with self.lock:
+                for start in range(0, len(ids), QUERY_CHUNK_SIZE):
+                    chunk = ids[start:start + QUERY_CHUNK_SIZE]
+                    rows = self.conn.execute(
+                        f"SELECT video_id, data FROM videos WHERE video_id IN ({','.join('?' * len(chunk))})", chunk
+                    ).fetchall()
+                    METRICS.record(STAGE_CACHE_IO, items=len(rows), size=sum(len(data) for _, data in rows))
+                    records.update((video_id, decode_record(data)) for video_id, data in rows)
+        return records
+
+    def put(self, video_data: Dict) -> bool:
+        """
+        Store one video record.
+
+        Args:
+            video_data: Processed video data dictionary
+
+        Returns:
+            True if the record was new or changed, False if identical
+        """
+        with METRICS.stage(STAGE_CACHE_IO):
+            serialized = json.dumps(video_data, ensure_ascii=False, sort_keys=True, default=json_default)
+            digest = content_hash(serialized)
+            with self.lock:
+                row = self.conn.execute(
+                    "SELECT content_hash FROM videos WHERE video_id = ?", (video_data['video_id'],)
+                ).fetchone()
+                if row and row[0] == digest:
+                    return False
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO videos (video_id, channel_handle, published_at, content_hash, stored_at, data) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (video_data['video_id'], video_data.get('channel_handle', ''), video_data.get('published_at'),
+                     digest, datetime.now().isoformat(), serialized)
+                )
+            METRICS.record(STAGE_CACHE_IO, items=1, size=len(serialized))
+        return True
+
+    def put_many(self, videos_data: Iterable[Dict]) -> int:
+        """
+        Store several video records.
+
+        Args:
+            videos_data: Processed video data dictionaries
+
+        Returns:
+            Number of new or changed records
+        """
+        return sum(1 for video_data in videos_data if self.put(video_data))
+
+    def channel_video_ids(self, channel_handle: str, published_since: Optional[str] = None) -> List[str]:
+        """Return the stored video IDs of a channel (published at/after published_since), newest first."""
+        with self.lock:
+            if published_since is None:
+                rows = self.conn.execute(
+                    "SELECT video_id FROM videos WHERE channel_handle = ? ORDER BY published_at DESC",
+                    (channel_handle,)
+                ).fetchall()
+            else:
+                rows = self.conn.execute(
+                    "SELECT video_id FROM videos WHERE channel_handle = ? AND published_at >= ? "
+                    "ORDER BY published_at DESC",
+                    (channel_handle, published_since)
+                ).fetchall()
+        return [row[0] for row in rows]
+
+    def iter_channel(self, channel_handle: str) -> Iterator[Dict]:
+        """Yield the stored video records of a channel, newest first."""
+        for video_id in self.channel_video_ids(channel_handle):
+            record = self.get(video_id)
+            if record is not None:
+                yield record
@@ -9,57 +9,188 @@ and collect video data including comments using YoutubeCommentDownloader.
 import os
 import json
 import logging
-import time
-import pickle
-from typing import List, Dict, Optional, Any
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Callable, Iterable, Iterator, Optional, Any, Union
 from datetime import datetime
 from pathlib import Path
-import dotenv
 from itertools import islice
 
-import pandas as pd
-from googleapiclient.discovery import build
-from youtube_transcript_api import YouTubeTranscriptApi
-from yt_dlp import YoutubeDL
-from youtube_comment_downloader import *
+import httplib2
 
-# Load environment variables
-dotenv.load_dotenv()
+# pandas, googleapiclient.discovery, youtube_transcript_api and
+# youtube_comment_downloader are imported where they are first used, so
+# importing this module (e.g. in a short-lived worker process) stays fast
 
 # Import configuration
 from config import *
+from http_cache import ResponseCache, CachingHttp, bypass_cache
+from metrics import (METRICS, ProgressReporter, STAGE_PLAYLIST, STAGE_VIDEO_DETAILS, STAGE_TRANSCRIPT,
+                     STAGE_COMMENTS, STAGE_CACHE_IO, STAGE_EXPORT)
+from quota import KeyPool, QuotaExhausted, QuotaHttp, QuotaLedger, load_api_keys
+from rate_limiter import AdaptiveRateLimiter, DATA_API, TRANSCRIPTS, COMMENTS
+from retry import RetriesExhausted, PacedSession, call_with_retry
+from transcripts import Transcript, TranscriptClient, TranscriptStore, missing_reason
+from video_store import VideoStore, migrate_pickle
+from comment_filters import CommentFilter, set_skip_replies
+from comment_store import CommentStore
+from search_index import SearchIndex
+from near_duplicates import NearDuplicateIndex
+from records import CommentRecord, intern_str, json_default
+from record_archive import ARCHIVE_SUFFIX, read_records, write_records, video_list_key
+from exporters import StreamingExporter, ParquetExporter, output_formats, video_csv_row, comment_csv_rows
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(LOG_FILE),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
+
+def setup_logging() -> None:
+    """
+    Log to LOG_FILE and the console.
+
+    Called by the command-line entry points rather than on import, so
+    importing the scraper as a library does not configure logging; calling
+    it again (e.g. in a worker process) does nothing.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(LOG_FILE),
+            logging.StreamHandler()
+        ]
+    )
+
+
+@lru_cache(maxsize=None)
+def youtube_discovery_document() -> Optional[Dict]:
+    """
+    Return the parsed YouTube Data API v3 discovery document, read once per process.
+
+    google-api-python-client ships the document as a static file; None if it
+    is missing (the client is then built from the discovery service).
+    """
+    try:
+        from googleapiclient import discovery_cache
+        path = Path(discovery_cache.__file__).parent / 'documents' / 'youtube.v3.json'
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Static discovery document not available: {e}")
+        return None
+
+
 class YouTubeScraper:
     """Main class for YouTube scraping functionality."""
     
-    def __init__(self, api_key: str):
+    def __init__(self, api_key: Union[str, List[str]], http=None, transcript_api=None,
+                 comment_downloader_class=None):
         """
         Initialize the YouTube scraper.
         
         Args:
-            api_key: YouTube Data API v3 key
+            api_key: YouTube Data API v3 key, or a list of keys to rotate
+                through as their daily quotas run out
+            http: httplib2-compatible object that sends Data API requests
+                (defaults to httplib2.Http(); benchmark.py passes a fake backend)
+            transcript_api: youtube-transcript-api 0.6 or 1.x YouTubeTranscriptApi
+                (the default), or an object providing
+                get_transcript(video_id, languages=...)
+            comment_downloader_class: Comment downloader class (defaults to
+                YoutubeCommentDownloader)
         """
-        self.api_key = api_key
-        self.youtube = build("youtube", "v3", developerKey=api_key)
-        self.comment_downloader = YoutubeCommentDownloader()
+        self.transcript_client = TranscriptClient(transcript_api)
+        # Preferred transcript languages, in order
+        self.transcript_languages = list(TRANSCRIPT_LANGUAGES)
+        self._comment_downloader_class = comment_downloader_class
+        self._comment_downloader = None
+        self.api_keys = [api_key] if isinstance(api_key, str) else list(api_key)
+        self.api_key = self.api_keys[0]
+        
+        self.cache_dir = Path(CACHE_DIR)
+        self.cache_dir.mkdir(exist_ok=True)
+        
+        # Every Data API request is charged to the key with the most quota left
+        self.quota_ledger = QuotaLedger(self.cache_dir / QUOTA_FILE)
+        self.key_pool = KeyPool(self.api_keys, self.quota_ledger)
+        http = QuotaHttp(http if http is not None else httplib2.Http(), self.key_pool)
+        
+        # Repeated Data API requests are answered from a persistent cache
+        # (cache hits cost no quota)
+        self.http_cache = ResponseCache(self.cache_dir / HTTP_CACHE_FILE) if HTTP_CACHE_ENABLED else None
+        if self.http_cache is not None:
+            http = CachingHttp(http, self.http_cache)
+        # The Data API client is built on first use (see the youtube property)
+        self.http = http
+        self._youtube = None
+        self._youtube_lock = threading.Lock()
+        # Paces each backend and adapts its rate to how the backend responds
+        self.rate_limiter = AdaptiveRateLimiter(RATE_LIMITS)
+        # Filter applied while comments download (None keeps every comment)
+        self.comment_filter = CommentFilter.from_config()
+        self._thread_local = threading.local()
         
         # Create output directories
         self.output_dir = Path(OUTPUT_DIR)
         self.output_dir.mkdir(exist_ok=True)
         
-        self.cache_dir = Path(CACHE_DIR)
-        self.cache_dir.mkdir(exist_ok=True)
+        # Per-video store of mined data
+        self.video_store = VideoStore(self.cache_dir / VIDEO_STORE_FILE)
+        
+        # Every comment seen across runs, once per comment ID
+        self.comment_store = CommentStore(self.cache_dir / COMMENT_STORE_FILE) if COMMENT_STORE_ENABLED else None
+        
+        # Near-duplicate clusters of comments across videos and channels
+        self.near_duplicates = (NearDuplicateIndex(self.cache_dir / NEAR_DUP_FILE)
+                                if NEAR_DUP_ENABLED else None)
+        
+        # Full-text index of every stored video's texts and comments
+        self.search_index = SearchIndex(self.cache_dir / SEARCH_INDEX_FILE) if SEARCH_INDEX_ENABLED else None
+        
+        # Timed transcript segments (and videos without a transcript)
+        self.transcript_store = (TranscriptStore(self.cache_dir / TRANSCRIPT_STORE_FILE)
+                                 if TRANSCRIPT_CACHE_ENABLED else None)
+        
+        # Periodic progress summary and metrics file (see metrics.py)
+        self.progress = ProgressReporter(
+            METRICS, self.output_dir / METRICS_FILE if METRICS_FILE else None,
+            collector=self._collect_metrics
+        )
+    
+    @property
+    def youtube(self):
+        """YouTube Data API client, built on first use from the static discovery document."""
+        if self._youtube is None:
+            with self._youtube_lock:
+                if self._youtube is None:
+                    from googleapiclient.discovery import build, build_from_document
+                    document = youtube_discovery_document()
+                    if document is not None:
+                        self._youtube = build_from_document(document, developerKey=self.api_key, http=self.http)
+                    else:
+                        self._youtube = build("youtube", "v3", developerKey=self.api_key, http=self.http)
+        return self._youtube
+    
+    @property
+    def transcript_api(self):
+        """The transcript API in use (youtube-transcript-api unless one was given)."""
+        return self.transcript_client.api
+    
+    @property
+    def comment_downloader_class(self):
+        """Comment downloader class (youtube_comment_downloader is imported on first use)."""
+        if self._comment_downloader_class is None:
+            from youtube_comment_downloader import YoutubeCommentDownloader
+            self._comment_downloader_class = YoutubeCommentDownloader
+        return self._comment_downloader_class
+    
+    @property
+    def comment_downloader(self):
+        """Comment downloader used by the main thread, created on first use."""
+        if self._comment_downloader is None:
+            self._comment_downloader = self._new_comment_downloader()
+        return self._comment_downloader
     
     def get_channel_stats(self, channel_id: str) -> Optional[Dict]:
         """
@@ -71,18 +202,98 @@ class YouTubeScraper:
         Returns:
             Dictionary with channel statistics or None if failed
         """
-        try:
-            response = self.youtube.channels().list(
-                part="statistics,snippet",
-                id=channel_id
-            ).execute()
+        return self.get_channels_stats([channel_id]).get(channel_id)
+    
+    def get_channels_stats(self, channel_ids: List[str], part: str = "statistics,snippet",
+                           fresh: bool = False) -> Dict[str, Dict]:
+        """
+        Get statistics of many channels in batched requests.
+        
+        The channels.list endpoint accepts up to 50 comma-separated IDs per
+        call, so this costs one request (and one quota unit) per 50 channels.
+        
+        Args:
+            channel_ids: List of YouTube channel IDs
+            part: Resource parts to request
+            fresh: Skip the HTTP response cache (for statistics snapshots)
             
-            if response['items']:
-                return response['items'][0]
-            return None
-        except Exception as e:
-            logger.error(f"Error getting channel stats for {channel_id}: {e}")
-            return None
+        Returns:
+            Dictionary mapping channel ID to its resource; IDs that failed or
+            were not returned by the API are omitted
+        """
+        channels = {}
+        ids = list(dict.fromkeys(channel_id for channel_id in channel_ids if channel_id))
+        
+        for start in range(0, len(ids), 50):
+            batch = ids[start:start + 50]
+            try:
+                request = self.youtube.channels().list(
+                    part=part,
+                    id=",".join(batch),
+                    maxResults=len(batch)
+                )
+                response = self._execute(bypass_cache(request) if fresh else request)
+                for item in response.get('items', []):
+                    channels[item['id']] = item
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                logger.error(f"Error getting channel stats for batch starting at {batch[0]}: {e}")
+        
+        return channels
+    
+    def resolve_channel_ids(self, channel_handles: List[str]) -> Dict[str, str]:
+        """
+        Resolve channel handles to channel IDs.
+        
+        channels.list takes a single forHandle per call, so each handle is
+        looked up once and the result kept in CHANNEL_IDS_FILE (channel IDs
+        never change).
+        
+        Args:
+            channel_handles: YouTube channel handles
+            
+        Returns:
+            Dictionary mapping handle to channel ID; handles that could not be
+            resolved are omitted
+        """
+        ids_file = self.cache_dir / CHANNEL_IDS_FILE
+        known = {}
+        if ids_file.exists():
+            try:
+                with open(ids_file, 'r', encoding='utf-8') as f:
+                    known = json.load(f)
+            except Exception as e:
+                logger.warning(f"Failed to load channel IDs from {ids_file}: {e}")
+        
+        resolved = {}
+        looked_up = False
+        for channel_handle in channel_handles:
+            if channel_handle in known:
+                resolved[channel_handle] = known[channel_handle]
+                continue
+            try:
+                response = self._execute(self.youtube.channels().list(
+                    part="id",
+                    forHandle=channel_handle
+                ))
+                if response.get('items'):
+                    resolved[channel_handle] = known[channel_handle] = response['items'][0]['id']
+                    looked_up = True
+                else:
+                    logger.warning(f"No channel found for handle {channel_handle}")
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                logger.error(f"Error resolving channel handle {channel_handle}: {e}")
+        
+        if looked_up:
+            try:
+                with open(ids_file, 'w', encoding='utf-8') as f:
+                    json.dump(known, f, indent=2)
+            except Exception as e:
+                logger.warning(f"Failed to save channel IDs to {ids_file}: {e}")
+        return resolved
     
     def get_channel_upload_playlist(self, channel_handle: str, channel_id: str = None, by_handle: bool = True) -> Optional[str]:
         """
@@ -98,30 +309,41 @@ class YouTubeScraper:
         """
         try:
             if by_handle:
-                response = self.youtube.channels().list(
+                response = self._execute(self.youtube.channels().list(
                     part="contentDetails",
                     forHandle=channel_handle
-                ).execute()
+                ))
             else:
-                response = self.youtube.channels().list(
+                response = self._execute(self.youtube.channels().list(
                     part="contentDetails",
                     id=channel_id
-                ).execute()
+                ))
             
             if response['items']:
                 return response['items'][0]['contentDetails']['relatedPlaylists']['uploads']
             return None
+        except QuotaExhausted:
+            raise
         except Exception as e:
             logger.error(f"Error getting upload playlist for {channel_handle}: {e}")
             return None
     
-    def get_playlist_videos(self, playlist_id: str, max_results: int = 50) -> List[Dict]:
+    def get_playlist_videos(self, playlist_id: str, max_results: int = 50,
+                            known_video_ids: Optional[set] = None,
+                            newest_published_at: Optional[str] = None) -> List[Dict]:
         """
         Get videos from a playlist.
         
+        Upload playlists are ordered newest first, so when known_video_ids or
+        newest_published_at is given, paging stops at the first video that was
+        already seen and only the newer videos are returned.
+        
         Args:
             playlist_id: YouTube playlist ID
             max_results: Maximum number of videos to retrieve
+            known_video_ids: IDs of videos seen in a previous run (optional)
+            newest_published_at: publishedAt of the newest video seen in a
+                previous run (optional)
             
         Returns:
             List of video dictionaries
@@ -137,14 +359,22 @@ class YouTubeScraper:
                     maxResults=min(50, max_results - len(videos)),
                     pageToken=next_page_token
                 )
-                response = request.execute()
+                with METRICS.stage(STAGE_PLAYLIST):
+                    response = self._execute(request)
+                METRICS.record(STAGE_PLAYLIST, items=len(response['items']))
                 
-                videos.extend(response['items'])
+                items, reached_known = self._take_new_playlist_items(
+                    response['items'], known_video_ids, newest_published_at
+                )
+                videos.extend(items)
                 next_page_token = response.get('nextPageToken')
                 
-                if not next_page_token:
+                if reached_known or not next_page_token:
                     break
                     
+        except (RetriesExhausted, QuotaExhausted):
+            # A truncated list would be cached as complete
+            raise
         except Exception as e:
             logger.error(f"Error getting playlist videos for {playlist_id}: {e}")
         
@@ -161,86 +391,258 @@ class YouTubeScraper:
             Video details dictionary or None if failed
         """
         try:
-            response = self.youtube.videos().list(
-                part="snippet,statistics,contentDetails",
-                id=video_id
-            ).execute()
+            with METRICS.stage(STAGE_VIDEO_DETAILS):
+                response = self._execute(self.youtube.videos().list(
+                    part="snippet,statistics,contentDetails",
+                    id=video_id
+                ))
+            METRICS.record(STAGE_VIDEO_DETAILS, items=len(response['items']))
             
             if response['items']:
                 return response['items'][0]
             return None
+        except QuotaExhausted:
+            raise
         except Exception as e:
             logger.error(f"Error getting video details for {video_id}: {e}")
             return None
     
+    def get_videos_details(self, video_ids: List[str],
+                           part: str = "snippet,statistics,contentDetails",
+                           fresh: bool = False) -> Dict[str, Dict]:
+        """
+        Get detailed video information for many videos in batched requests.
+        
+        The videos.list endpoint accepts up to 50 comma-separated IDs per call,
+        so this costs one request (and one quota unit) per 50 videos.
+        
+        Args:
+            video_ids: List of YouTube video IDs
+            part: Resource parts to request ("statistics" alone for snapshots)
+            fresh: Skip the HTTP response cache (for statistics snapshots)
+            
+        Returns:
+            Dictionary mapping video ID to its details; IDs that failed or were
+            not returned by the API are omitted
+        """
+        details = {}
+        batch_size = min(VIDEO_DETAILS_BATCH_SIZE, 50)
+        
+        for start in range(0, len(video_ids), batch_size):
+            batch = [video_id for video_id in video_ids[start:start + batch_size] if video_id]
+            if not batch:
+                continue
+            try:
+                with METRICS.stage(STAGE_VIDEO_DETAILS):
+                    request = self.youtube.videos().list(
+                        part=part,
+                        id=",".join(batch),
+                        maxResults=len(batch)
+                    )
+                    response = self._execute(bypass_cache(request) if fresh else request)
+                METRICS.record(STAGE_VIDEO_DETAILS, items=len(response.get('items', [])))
+                
+                for item in response.get('items', []):
+                    details[item['id']] = item
+            except QuotaExhausted:
+                raise
+            except Exception as e:
+                # These videos stay unmined and are fetched again on the next run
+                logger.error(f"Error getting video details for batch starting at {batch[0]}: {e}")
+        
+        return details
+    
     def get_video_transcript(self, video_id: str) -> Optional[str]:
         """
-        Get video transcript.
+        Get video transcript text.
         
         Args:
             video_id: YouTube video ID
             
         Returns:
-            Transcript text or None if failed
+            Transcript text or None if the video has no transcript
+            
+        Raises:
+            RetriesExhausted: If YouTube kept throttling the request
+        """
+        transcript = self.get_transcript(video_id)
+        return transcript.text if transcript is not None else None
+    
+    def get_transcript(self, video_id: str, languages: Optional[List[str]] = None) -> Optional[Transcript]:
         """
+        Get a video's timed transcript, from the transcript store if cached.
+        
+        Videos found to have no transcript (in the requested languages) are
+        recorded in the store and not requested again.
+        
+        Args:
+            video_id: YouTube video ID
+            languages: Language codes in order of preference (defaults to
+                self.transcript_languages)
+            
+        Returns:
+            Transcript (segments with start, duration and text) or None if the
+            video has no transcript
+            
+        Raises:
+            RetriesExhausted: If YouTube kept throttling the request
+        """
+        languages = list(languages or self.transcript_languages)
+        if self.transcript_store is not None:
+            entry = self.transcript_store.lookup(video_id, languages)
+            METRICS.inc('transcript_cache_total', result=entry['status'] if entry else 'miss')
+            if entry is not None:
+                return entry['transcript']
+        
         try:
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            transcript_text = " ".join([item['text'] for item in transcript_list])
-            return transcript_text
+            # Videos without a transcript count as stage errors too
+            with METRICS.stage(STAGE_TRANSCRIPT):
+                transcript = call_with_retry(self.rate_limiter, TRANSCRIPTS,
+                                             self.transcript_client.fetch, video_id, languages)
+        except RetriesExhausted:
+            raise
         except Exception as e:
+            reason = missing_reason(e)
+            if reason and self.transcript_store is not None:
+                self.transcript_store.put_missing(video_id, languages, reason)
             logger.warning(f"Could not get transcript for {video_id}: {e}")
             return None
+        
+        METRICS.record(STAGE_TRANSCRIPT, items=len(transcript), size=sum(map(len, transcript.texts)))
+        if self.transcript_store is not None:
+            self.transcript_store.put(transcript)
+        return transcript
     
-    def get_video_comments(self, video_id: str, max_comments: int = 1000) -> List[Dict]:
+    def get_video_comments(self, video_id: str, max_comments: int = 1000,
+                           comment_filter: Optional[CommentFilter] = None) -> List[Dict]:
         """
         Get video comments using YoutubeCommentDownloader with itertools.islice.
         
         Args:
             video_id: YouTube video ID
             max_comments: Maximum number of comments to retrieve
+            comment_filter: Filter applied while downloading (defaults to
+                self.comment_filter); max_comments counts accepted comments
+                and paging stops early once no further comment can pass
             
         Returns:
-            List of comment dictionaries
+            List of CommentRecords (read-only mappings with cid, text, time,
+            author, channel, votes, replies and cluster_id; votes and
+            replies are ints). With NEAR_DUP_CANONICAL_ONLY, copies of
+            earlier comments are left out, so fewer than max_comments may
+            be returned
+            
+        Raises:
+            RetriesExhausted: If YouTube kept throttling the comment requests
         """
         comments = []
+        if comment_filter is None:
+            comment_filter = self.comment_filter
         try:
-            # Create video URL
-            video_url = f'https://www.youtube.com/watch?v={video_id}'
-            
-            # Get comments using get_comments_from_url with popular sorting
-            comment_generator = self.comment_downloader.get_comments_from_url(
-                video_url, 
-                sort_by=SORT_BY_POPULAR
-            )
-            
-            # Use itertools.islice to limit the number of comments
-            for comment in islice(comment_generator, max_comments):
-                # Clean and structure comment data
-                comment_data = {
-                    'cid': comment.get('cid', ''),
-                    'text': comment.get('text', ''),
-                    'time': comment.get('time', ''),
-                    'author': comment.get('author', ''),
-                    'channel': comment.get('channel', ''),
-                    'votes': comment.get('votes', ''),
-                    'replies': comment.get('replies', ''),
-                    'photo': comment.get('photo', '')
-                }
-                comments.append(comment_data)
+            with METRICS.stage(STAGE_COMMENTS):
+                # Create video URL
+                video_url = f'https://www.youtube.com/watch?v={video_id}'
                 
-                # Add small delay to be respectful
-                time.sleep(DELAY_BETWEEN_COMMENTS)
+                # Get comments using get_comments_from_url (popular sorting by default)
+                downloader = self._get_comment_downloader()
+                set_skip_replies(downloader, comment_filter is not None and comment_filter.top_level_only)
+                comment_generator = downloader.get_comments_from_url(
+                    video_url, 
+                    sort_by=COMMENT_SORT_BY
+                )
+                if comment_filter is not None:
+                    comment_generator = comment_filter.stream(comment_generator, COMMENT_SORT_BY)
                 
+                # Use itertools.islice to limit the number of comments; each one
+                # is kept as a compact record (counts parsed, repeated strings interned)
+                for comment in islice(comment_generator, max_comments):
+                    comments.append(CommentRecord.from_dict(comment))
+                    
+        except RetriesExhausted:
+            raise
         except Exception as e:
             logger.error(f"Error getting comments for {video_id}: {e}")
         
+        if self.near_duplicates is not None and comments:
+            try:
+                comments = self.near_duplicates.tag(video_id, comments, canonical_only=NEAR_DUP_CANONICAL_ONLY)
+            except Exception as e:
+                logger.error(f"Error clustering comments of {video_id}: {e}")
+        
+        METRICS.record(STAGE_COMMENTS, items=len(comments), size=sum(len(comment.text) for comment in comments))
         return comments
     
+    def _get_comment_downloader(self):
+        """
+        Get the comment downloader for the current thread.
+        
+        Worker threads each get their own downloader (and HTTP session) since
+        the downloader keeps per-session cookies and state.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return self.comment_downloader
+        
+        downloader = getattr(self._thread_local, 'comment_downloader', None)
+        if downloader is None:
+            downloader = self._new_comment_downloader()
+            self._thread_local.comment_downloader = downloader
+        return downloader
+    
+    def _new_comment_downloader(self):
+        """Create a comment downloader whose page requests are paced and retried."""
+        downloader = self.comment_downloader_class()
+        session = PacedSession(self.rate_limiter, COMMENTS)
+        session.headers.update(downloader.session.headers)
+        session.cookies.update(downloader.session.cookies)
+        for prefix, adapter in downloader.session.adapters.items():
+            session.mount(prefix, adapter)
+        downloader.session = session
+        return downloader
+    
+    def _collect_metrics(self, metrics) -> None:
+        """Refresh the gauges for request rates, HTTP cache counters and quota use."""
+        for backend, rate in self.rate_limiter.rates().items():
+            metrics.set_gauge('rate', rate, backend=backend)
+        if self.http_cache is not None:
+            for event in ('hits', 'misses', 'revalidations'):
+                metrics.set_gauge('http_cache_events', getattr(self.http_cache, event), event=event)
+        for key, units in self.key_pool.usage().items():
+            metrics.set_gauge('quota_used', units, key=key)
+    
+    def _execute(self, request) -> Dict:
+        """Execute a Data API request under the rate limiter, retrying transient errors."""
+        return call_with_retry(self.rate_limiter, DATA_API, request.execute)
+    
+    def _submit_video_content(self, transcript_pool: ThreadPoolExecutor,
+                              comment_pool: ThreadPoolExecutor,
+                              video_ids: List[str],
+                              max_comments_per_video: int) -> Dict[str, tuple]:
+        """
+        Schedule transcript and comment downloads for a batch of videos.
+        
+        Args:
+            transcript_pool: Executor for transcript downloads
+            comment_pool: Executor for comment downloads
+            video_ids: YouTube video IDs to schedule
+            max_comments_per_video: Maximum comments to collect per video
+            
+        Returns:
+            Dictionary mapping video ID to (transcript future, comments future)
+        """
+        futures = {}
+        for video_id in video_ids:
+            futures[video_id] = (
+                transcript_pool.submit(self.get_video_transcript, video_id),
+                comment_pool.submit(self.get_video_comments, video_id, max_comments_per_video)
+            )
+        return futures
+    
     def fetch_and_process_channel_videos(self, channel_handles: List[str], 
                                        channel_ids: List[str] = None, 
                                        by_handle: bool = True,
                                        max_videos_per_channel: int = 100,
-                                       max_comments_per_video: int = 1000) -> List[Dict]:
+                                       max_comments_per_video: int = 1000,
+                                       concurrent: bool = False) -> List[Dict]:
         """
         Fetch and process videos from multiple channels.
         
@@ -250,203 +652,628 @@ class YouTubeScraper:
             by_handle: Whether to search by handle or ID
             max_videos_per_channel: Maximum videos to process per channel
             max_comments_per_video: Maximum comments to collect per video
+            concurrent: Fetch transcripts and comments in parallel worker
+                pools (sized by TRANSCRIPT_WORKERS and COMMENT_WORKERS) instead
+                of one video at a time. Output order is unchanged.
             
         Returns:
             List of processed video data dictionaries
         """
-        all_videos_data = []
+        return list(self.iter_channel_videos(
+            channel_handles, channel_ids, by_handle,
+            max_videos_per_channel, max_comments_per_video, concurrent
+        ))
+    
+    def iter_channel_videos(self, channel_handles: List[str],
+                            channel_ids: List[str] = None,
+                            by_handle: bool = True,
+                            max_videos_per_channel: int = 100,
+                            max_comments_per_video: int = 1000,
+                            concurrent: bool = False,
+                            skip_video_ids: Optional[set] = None,
+                            on_channel_done: Optional[Callable[[str], None]] = None) -> Iterator[Dict]:
+        """
+        Fetch and process videos from multiple channels, yielding each video as
+        soon as it is finished.
         
-        for i, channel_handle in enumerate(channel_handles):
-            logger.info(f"Processing channel {i+1}/{len(channel_handles)}: {channel_handle}")
-            
-            # Define cache file paths for this channel
-            cache_file = self.cache_dir / f"{channel_handle.replace('@', '')}_videos.pkl"
-            video_list_cache_file = self.cache_dir / f"{channel_handle.replace('@', '')}_videos_list.json"
-            
-            # Check if we have cached mined data
-            if cache_file.exists():
-                logger.info(f"Loading cached mined data for {channel_handle}")
-                try:
-                    with open(cache_file, 'rb') as f:
-                        cached_data = pickle.load(f)
-                    all_videos_data.extend(cached_data)
+        Takes the same arguments as fetch_and_process_channel_videos. Videos are
+        yielded in channel and playlist order; already mined videos are loaded
+        from the video store one at a time, so memory use does not grow with
+        the size of the crawl.
+        
+        If the Data API quota of every key runs out, the crawl stops early;
+        everything mined so far is stored, so running it again continues
+        where it stopped.
+        
+        Args:
+            skip_video_ids: Videos neither mined nor yielded (e.g. already
+                saved by an earlier run of the same job)
+            on_channel_done: Called with the channel handle once every listed
+                video of a channel was yielded (or skipped); not called for
+                channels that could not be listed or had videos fail
+        
+        Yields:
+            Processed video data dictionaries
+        """
+        transcript_pool = comment_pool = None
+        if concurrent:
+            transcript_pool = ThreadPoolExecutor(max_workers=TRANSCRIPT_WORKERS, thread_name_prefix="transcript")
+            comment_pool = ThreadPoolExecutor(max_workers=COMMENT_WORKERS, thread_name_prefix="comments")
+        
+        try:
+            plan = self.plan_crawl(channel_handles, channel_ids, by_handle, max_videos_per_channel)
+            self.progress.start()
+            for i, (channel_handle, videos) in enumerate(plan):
+                if videos is None:
                     continue
-                except Exception as e:
-                    logger.warning(f"Failed to load mined data cache for {channel_handle}: {e}")
+                channel_id = channel_ids[i] if channel_ids and i < len(channel_ids) else None
+                logger.info(f"Processing channel {i+1}/{len(channel_handles)}: {channel_handle}")
+                complete = yield from self._iter_channel(
+                    channel_handle, channel_id, by_handle,
+                    max_videos_per_channel, max_comments_per_video,
+                    transcript_pool, comment_pool, videos, skip_video_ids
+                )
+                if complete and on_channel_done is not None:
+                    on_channel_done(channel_handle)
+        except QuotaExhausted as e:
+            logger.error(f"{e}. Mined videos are stored; run again after the reset to continue.")
+        finally:
+            if concurrent:
+                transcript_pool.shutdown(cancel_futures=True)
+                comment_pool.shutdown(cancel_futures=True)
+            self.progress.stop()
+    
+    def _iter_channel(self, channel_handle: str, channel_id: Optional[str],
+                      by_handle: bool, max_videos_per_channel: int,
+                      max_comments_per_video: int,
+                      transcript_pool: Optional[ThreadPoolExecutor] = None,
+                      comment_pool: Optional[ThreadPoolExecutor] = None,
+                      videos: Optional[List[Dict]] = None,
+                      skip_video_ids: Optional[set] = None) -> Iterator[Dict]:
+        """
+        Fetch and process the videos of a single channel.
+        
+        Args:
+            channel_handle: YouTube channel handle
+            channel_id: YouTube channel ID (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos_per_channel: Maximum videos to process
+            max_comments_per_video: Maximum comments to collect per video
+            transcript_pool: Executor for transcripts (None for sequential mode)
+            comment_pool: Executor for comments (None for sequential mode)
+            videos: The channel's playlist items, if already listed
+            skip_video_ids: Videos neither mined nor yielded
             
-            # Get channel upload playlist
-            channel_id = channel_ids[i] if channel_ids and i < len(channel_ids) else None
-            playlist_id = self.get_channel_upload_playlist(channel_handle, channel_id, by_handle)
+        Yields:
+            Processed video data dictionaries for the channel, in playlist order
+        
+        Returns:
+            True if every listed video was yielded or skipped
+        """
+        concurrent = transcript_pool is not None and comment_pool is not None
+        
+        # Load the video list from cache (refreshing it with new uploads in
+        # incremental mode), or fetch it from the API
+        if videos is None:
+            videos = self.get_channel_video_list(channel_handle, channel_id, by_handle, max_videos_per_channel)
+        if videos is None:
+            return False
+        
+        video_ids = [self._playlist_item_video_id(video) for video in videos]
+        if skip_video_ids:
+            video_ids = [video_id for video_id in video_ids if video_id not in skip_video_ids]
+        
+        # Only fetch the videos that have not been mined yet
+        self._migrate_pickle_cache(channel_handle)
+        mined = self.video_store.known_ids(video_ids)
+        todo = [video_id for video_id in video_ids if video_id and video_id not in mined]
+        todo_index = {video_id: j for j, video_id in enumerate(todo)}
+        logger.info(f"{len(mined)} videos already mined for {channel_handle}, {len(todo)} to fetch")
+        
+        batch_size = min(VIDEO_DETAILS_BATCH_SIZE, 50)
+        # In concurrent mode the next batch is fetched and queued while this
+        # one is consumed, so the pools never drain at a batch boundary
+        batches_ahead = 2 if concurrent else 1
+        details_by_id = {}
+        pending = {}
+        fetched = 0
+        failed = 0
+        
+        for video_id in video_ids:
+            if video_id in mined:
+                video_data = self.video_store.get(video_id)
+                if video_data is not None:
+                    yield video_data
+                continue
+            if video_id not in todo_index:
+                continue
+            j = todo_index[video_id]
+            
+            # Fetch details a page of videos at a time in single batched requests
+            while fetched < min(len(todo), (j // batch_size + batches_ahead) * batch_size):
+                batch = todo[fetched:fetched + batch_size]
+                batch_details = self.get_videos_details(batch)
+                details_by_id.update(batch_details)
+                logger.info(f"Fetched details for {len(batch_details)} videos "
+                            f"({fetched+1}-{fetched + len(batch)}/{len(todo)})")
+                if concurrent:
+                    pending.update(self._submit_video_content(
+                        transcript_pool, comment_pool,
+                        [v for v in batch if v in batch_details],
+                        max_comments_per_video
+                    ))
+                fetched += len(batch)
             
-            if not playlist_id:
-                logger.error(f"Could not get upload playlist for {channel_handle}")
+            logger.info(f"Processing video {j+1}/{len(todo)}: {video_id}")
+            
+            video_details = details_by_id.pop(video_id, None)
+            if not video_details:
+                logger.warning(f"No details returned for {video_id}, skipping")
+                failed += 1
                 continue
             
-            # Try to load video list from cache
-            videos = None
-            if video_list_cache_file.exists():
-                logger.info(f"Loading video list from cache for {channel_handle}")
-                try:
-                    with open(video_list_cache_file, 'r', encoding='utf-8') as f:
-                        videos = json.load(f)
-                except Exception as e:
-                    logger.warning(f"Failed to load video list cache for {channel_handle}: {e}")
+            try:
+                if concurrent:
+                    # Results are consumed in playlist order, so output stays deterministic
+                    transcript_future, comments_future = pending.pop(video_id)
+                    transcript = transcript_future.result()
+                    comments = comments_future.result()
+                else:
+                    # Get video transcript
+                    transcript = self.get_video_transcript(video_id)
+                    
+                    # Get video comments
+                    comments = self.get_video_comments(video_id, max_comments_per_video)
+            except RetriesExhausted as e:
+                # Not stored, so the next run fetches this video again
+                logger.error(f"Skipping {video_id} for now: {e}")
+                failed += 1
+                continue
+            logger.info(f"Collected {len(comments)} comments for {video_id}")
+            
+            # Store every finished video right away so an interrupted run
+            # resumes from the next one
+            video_data = self._build_video_data(channel_handle, video_id, video_details, transcript, comments)
+            self._store_video(video_data)
+            mined.add(video_id)
+            yield video_data
+        
+        return failed == 0
+    
+    def _store_video(self, video_data: Dict) -> None:
+        """Store a finished video and its comments, and count it as done."""
+        self.video_store.put(video_data)
+        if self.comment_store is not None:
+            self.comment_store.upsert_video(video_data)
+        if self.search_index is not None:
+            self.search_index.add_video(video_data)
+        self.progress.video_done()
+    
+    def refresh_video_comments(self, video_ids: Iterable[str],
+                               max_comments_per_video: int = 1000) -> tuple:
+        """
+        Download the comments of already mined videos again and upsert them.
+        
+        Mined videos are skipped by later crawls, so this is how their vote and
+        reply counts (and new comments) reach the comment store.
+        
+        Args:
+            video_ids: YouTube video IDs
+            max_comments_per_video: Maximum comments to collect per video
             
-            # If not cached, fetch from API and cache
-            if videos is None:
+        Returns:
+            (new comments, known comments whose counts or text changed)
+        """
+        new = changed = 0
+        if self.comment_store is None:
+            return new, changed
+        for video_id in video_ids:
+            video_data = self.video_store.get(video_id)
+            if video_data is None:
+                continue
+            try:
+                comments = self.get_video_comments(video_id, max_comments_per_video)
+            except RetriesExhausted as e:
+                logger.error(f"Skipping comment refresh for {video_id}: {e}")
+                continue
+            video_new, video_changed = self.comment_store.upsert_video(dict(video_data, comments=comments))
+            if self.search_index is not None:
+                self.search_index.add_video(dict(video_data, comments=comments))
+            new += video_new
+            changed += video_changed
+        logger.info(f"Comment refresh: {new} new comments, {changed} updated")
+        return new, changed
+    
+    def plan_crawl(self, channel_handles: List[str], channel_ids: List[str] = None,
+                   by_handle: bool = True, max_videos_per_channel: int = 100) -> List[tuple]:
+        """
+        List every channel's videos and estimate the quota needed to mine them.
+        
+        Listing is the cheapest Data API work per video (one unit per 50
+        playlist items, about one per channel on an incremental refresh), so
+        it is done for all channels before any video details are requested.
+        The estimate for the batched details requests is logged against the
+        quota left across all keys.
+        
+        Args:
+            channel_handles: List of YouTube channel handles
+            channel_ids: List of YouTube channel IDs (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos_per_channel: Maximum videos to list per channel
+            
+        Returns:
+            List of (channel handle, playlist items or None if listing failed)
+        """
+        plan = []
+        todo_count = 0
+        for i, channel_handle in enumerate(channel_handles):
+            channel_id = channel_ids[i] if channel_ids and i < len(channel_ids) else None
+            videos = self.get_channel_video_list(channel_handle, channel_id, by_handle, max_videos_per_channel)
+            plan.append((channel_handle, videos))
+            if videos:
+                self._migrate_pickle_cache(channel_handle)
+                video_ids = [video_id for video_id in map(self._playlist_item_video_id, videos) if video_id]
+                todo_count += len(video_ids) - len(self.video_store.known_ids(video_ids))
+        
+        METRICS.set_gauge('videos_planned', todo_count)
+        units = math.ceil(todo_count / min(VIDEO_DETAILS_BATCH_SIZE, 50)) * QUOTA_COSTS.get('videos', 1)
+        logger.info(f"Crawl plan: {todo_count} videos to mine in {len(channel_handles)} channels, "
+                    f"{self.key_pool.plan(units)}")
+        return plan
+    
+    def load_mined_videos(self, channel_handles: List[str]) -> List[Dict]:
+        """
+        Load mined videos from the video store in channel order, then playlist order.
+        
+        Args:
+            channel_handles: YouTube channel handles, in output order
+            
+        Returns:
+            List of processed video data dictionaries
+        """
+        return list(self.iter_mined_videos(channel_handles))
+    
+    def iter_mined_videos(self, channel_handles: List[str], chunk_size: int = 50) -> Iterator[Dict]:
+        """
+        Yield mined videos from the video store in channel order, then playlist
+        order, reading chunk_size records at a time.
+        
+        Args:
+            channel_handles: YouTube channel handles, in output order
+            chunk_size: Video records read from the store per query
+        """
+        for channel_handle in channel_handles:
+            videos = self._load_cached_video_list(channel_handle) or []
+            video_ids = [self._playlist_item_video_id(video) for video in videos]
+            for start in range(0, len(video_ids), chunk_size):
+                chunk = video_ids[start:start + chunk_size]
+                mined = self.video_store.get_many(chunk)
+                yield from (mined[video_id] for video_id in chunk if video_id in mined)
+    
+    def get_channel_video_list(self, channel_handle: str, channel_id: str = None,
+                               by_handle: bool = True, max_videos: int = 100,
+                               incremental: bool = INCREMENTAL_REFRESH) -> Optional[List[Dict]]:
+        """
+        Get a channel's playlist items, using and updating the video list cache.
+        
+        In incremental mode a cached list is refreshed by paging only until the
+        newest previously seen video, and the new videos are prepended to it.
+        Otherwise a cached list is returned as is.
+        
+        Args:
+            channel_handle: YouTube channel handle
+            channel_id: YouTube channel ID (optional)
+            by_handle: Whether to search by handle or ID
+            max_videos: Maximum number of videos to list
+            incremental: Refresh a cached list with newly published videos
+            
+        Returns:
+            List of playlist items (newest first) or None if failed
+        """
+        cached = self._load_cached_video_list(channel_handle)
+        if cached is not None and not incremental:
+            return cached
+        
+        state = self._load_refresh_state(channel_handle)
+        playlist_id = state.get('playlist_id') or self.get_channel_upload_playlist(channel_handle, channel_id, by_handle)
+        if not playlist_id:
+            logger.error(f"Could not get upload playlist for {channel_handle}")
+            return cached
+        
+        try:
+            if cached is None:
                 logger.info(f"Fetching video list from API for {channel_handle}")
-                videos = self.get_playlist_videos(playlist_id, max_videos_per_channel)
-                try:
-                    with open(video_list_cache_file, 'w', encoding='utf-8') as f:
-                        json.dump(videos, f, ensure_ascii=False, indent=2)
-                    logger.info(f"Cached video list for {channel_handle}")
-                except Exception as e:
-                    logger.warning(f"Failed to cache video list for {channel_handle}: {e}")
+                videos = self.get_playlist_videos(playlist_id, max_videos)
             else:
-                logger.info(f"Found {len(videos)} videos for {channel_handle} (from cache)")
+                logger.info(f"Refreshing video list for {channel_handle}")
+                delta = self.get_playlist_videos(
+                    playlist_id, max_videos,
+                    known_video_ids={self._playlist_item_video_id(video) for video in cached},
+                    newest_published_at=state.get('newest_published_at')
+                )
+                videos = self._merge_video_list(channel_handle, cached, delta)
+        except RetriesExhausted as e:
+            logger.error(f"Could not list videos for {channel_handle}: {e}")
+            return cached
+        
+        self._cache_video_list(channel_handle, videos)
+        self._save_refresh_state(channel_handle, playlist_id, videos)
+        return videos
+    
+    @staticmethod
+    def _take_new_playlist_items(items: List[Dict], known_video_ids: Optional[set],
+                                 newest_published_at: Optional[str]) -> tuple:
+        """
+        Keep the playlist items that precede the first already-seen video.
+        
+        Returns:
+            (new items, whether an already-seen video was reached)
+        """
+        if not known_video_ids and not newest_published_at:
+            return items, False
+        
+        for k, item in enumerate(items):
+            video_id = YouTubeScraper._playlist_item_video_id(item)
+            published_at = item.get('snippet', {}).get('publishedAt')
+            if (known_video_ids and video_id in known_video_ids) or \
+                    (newest_published_at and published_at and published_at <= newest_published_at):
+                return items[:k], True
+        return items, False
+    
+    @staticmethod
+    def _merge_video_list(channel_handle: str, cached: List[Dict], delta: List[Dict]) -> List[Dict]:
+        """Prepend newly listed playlist items to the cached list, dropping duplicates."""
+        cached_ids = {YouTubeScraper._playlist_item_video_id(video) for video in cached}
+        new_items = [video for video in delta if YouTubeScraper._playlist_item_video_id(video) not in cached_ids]
+        logger.info(f"Found {len(new_items)} new videos for {channel_handle}")
+        return new_items + cached
+    
+    def _load_refresh_state(self, channel_handle: str) -> Dict:
+        """Load the incremental refresh state of a channel (empty if none)."""
+        state_file = self.cache_dir / f"{channel_handle.replace('@', '')}_refresh_state.json"
+        if not state_file.exists():
+            return {}
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Failed to load refresh state for {channel_handle}: {e}")
+            return {}
+    
+    def _save_refresh_state(self, channel_handle: str, playlist_id: str, videos: List[Dict]) -> None:
+        """Record the upload playlist and newest listed video of a channel."""
+        state_file = self.cache_dir / f"{channel_handle.replace('@', '')}_refresh_state.json"
+        state = {'playlist_id': playlist_id, 'refreshed_at': datetime.now().isoformat()}
+        if videos:
+            state['newest_video_id'] = self._playlist_item_video_id(videos[0])
+            state['newest_published_at'] = max(
+                (video.get('snippet', {}).get('publishedAt') or '' for video in videos), default=''
+            ) or None
+        try:
+            with open(state_file, 'w', encoding='utf-8') as f:
+                json.dump(state, f, indent=2)
+        except Exception as e:
+            logger.warning(f"Failed to save refresh state for {channel_handle}: {e}")
+    
+    @staticmethod
+    def _playlist_item_video_id(video: Dict) -> Optional[str]:
+        """Extract the video ID from a playlist item (or a cached video record)."""
+        if 'contentDetails' in video and 'videoId' in video['contentDetails']:
+            return video['contentDetails']['videoId']
+        return video.get('video_id')
+    
+    @staticmethod
+    def _build_video_data(channel_handle: str, video_id: str, video_details: Dict,
+                          transcript: Optional[str], comments: List[Dict]) -> Dict:
+        """
+        Structure the collected data for one video.
+        
+        Args:
+            channel_handle: YouTube channel handle
+            video_id: YouTube video ID
+            video_details: Item returned by videos.list
+            transcript: Transcript text (or None)
+            comments: List of comment dictionaries
             
-            channel_videos_data = []
+        Returns:
+            Video data dictionary
+        """
+        return {
+            'channel_handle': intern_str(channel_handle),
+            'channel_id': intern_str(video_details['snippet']['channelId']),
+            'video_id': video_id,
+            'title': video_details['snippet']['title'],
+            'description': video_details['snippet']['description'],
+            'published_at': video_details['snippet']['publishedAt'],
+            'duration': video_details['contentDetails']['duration'],
+            'view_count': video_details['statistics'].get('viewCount', 0),
+            'like_count': video_details['statistics'].get('likeCount', 0),
+            'comment_count': video_details['statistics'].get('commentCount', 0),
+            'transcript': transcript,
+            'comments': comments,
+            'processed_at': datetime.now().isoformat()
+        }
+    
+    def _channel_cache_files(self, channel_handle: str) -> tuple:
+        """Return the (legacy mined data pickle, video list) cache file paths for a channel."""
+        name = channel_handle.replace('@', '')
+        suffix = ARCHIVE_SUFFIX if CACHE_ARCHIVE else '.json'
+        return (self.cache_dir / f"{name}_videos.pkl",
+                self.cache_dir / f"{name}_videos_list{suffix}")
+    
+    def _migrate_pickle_cache(self, channel_handle: str) -> None:
+        """
+        Import a legacy whole-channel pickle cache into the video store.
+        
+        The pickle is renamed to *.pkl.migrated afterwards so it is only
+        imported once.
+        """
+        cache_file, _ = self._channel_cache_files(channel_handle)
+        if cache_file.exists():
+            migrate_pickle(self.video_store, cache_file)
+    
+    def _load_cached_video_list(self, channel_handle: str) -> Optional[List[Dict]]:
+        """Load the cached playlist items for a channel, or None if not cached."""
+        _, video_list_cache_file = self._channel_cache_files(channel_handle)
+        if not video_list_cache_file.exists():
+            # Fall back to the other format (e.g. a JSON cache from before CACHE_ARCHIVE)
+            other_suffix = '.json' if video_list_cache_file.suffix == ARCHIVE_SUFFIX else ARCHIVE_SUFFIX
+            video_list_cache_file = video_list_cache_file.with_suffix(other_suffix)
+            if not video_list_cache_file.exists():
+                return None
+        
+        logger.info(f"Loading video list from cache for {channel_handle}")
+        try:
+            with METRICS.stage(STAGE_CACHE_IO):
+                if video_list_cache_file.suffix == ARCHIVE_SUFFIX:
+                    videos = read_records(video_list_cache_file)
+                else:
+                    with open(video_list_cache_file, 'r', encoding='utf-8') as f:
+                        videos = json.load(f)
+            METRICS.record(STAGE_CACHE_IO, items=len(videos), size=video_list_cache_file.stat().st_size)
+            logger.info(f"Found {len(videos)} videos for {channel_handle} (from cache)")
+            return videos
+        except Exception as e:
+            logger.warning(f"Failed to load video list cache for {channel_handle}: {e}")
+            return None
+    
+    def _cache_video_list(self, channel_handle: str, videos: List[Dict]) -> None:
+        """Write the playlist items for a channel to the cache, replacing any cache in the other format."""
+        _, video_list_cache_file = self._channel_cache_files(channel_handle)
+        try:
+            with METRICS.stage(STAGE_CACHE_IO):
+                if video_list_cache_file.suffix == ARCHIVE_SUFFIX:
+                    write_records(video_list_cache_file, videos, key=video_list_key)
+                else:
+                    with open(video_list_cache_file, 'w', encoding='utf-8') as f:
+                        json.dump(videos, f, ensure_ascii=False)
+            METRICS.record(STAGE_CACHE_IO, items=len(videos), size=video_list_cache_file.stat().st_size)
+            other_suffix = '.json' if video_list_cache_file.suffix == ARCHIVE_SUFFIX else ARCHIVE_SUFFIX
+            video_list_cache_file.with_suffix(other_suffix).unlink(missing_ok=True)
+            logger.info(f"Cached video list for {channel_handle}")
+        except Exception as e:
+            logger.warning(f"Failed to cache video list for {channel_handle}: {e}")
+    
+    def save_data(self, videos_data: List[Dict], output_format: str = 'json') -> None:
+        """
+        Save collected data to files.
+        
+        Args:
+            videos_data: List of video data dictionaries
+            output_format: Output format ('json', 'csv', 'both', 'parquet', 'archive' or 'all')
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        formats = output_formats(output_format)
+        
+        with METRICS.stage(STAGE_EXPORT):
+            if 'json' in formats:
+                # Save as JSON
+                json_file = self.output_dir / f"youtube_data_{timestamp}.json"
+                with open(json_file, 'w', encoding='utf-8') as f:
+                    json.dump(videos_data, f, indent=2, ensure_ascii=False, default=json_default)
+                logger.info(f"Saved data to {json_file}")
             
-            for j, video in enumerate(videos):
-                video_id = video['contentDetails']['videoId'] if 'contentDetails' in video and 'videoId' in video['contentDetails'] else video.get('video_id')
-                logger.info(f"Processing video {j+1}/{len(videos)}: {video_id}")
-                
-                # Get detailed video information
-                video_details = self.get_video_details(video_id)
-                if not video_details:
-                    continue
-                
-                # Get video transcript
-                transcript = self.get_video_transcript(video_id)
-                
-                # Get video comments
-                comments = self.get_video_comments(video_id, max_comments_per_video)
-                logger.info(f"Collected {len(comments)} comments for {video_id}")
+            if 'archive' in formats:
+                # Save as a compressed record archive keyed by video ID
+                archive_file = self.output_dir / f"youtube_data_{timestamp}{ARCHIVE_SUFFIX}"
+                write_records(archive_file, videos_data, key=lambda video: video.get('video_id'))
+                logger.info(f"Saved data to {archive_file}")
+            
+            if 'csv' in formats:
+                import pandas as pd
                 
-                # Structure video data
-                video_data = {
-                    'channel_handle': channel_handle,
-                    'channel_id': video_details['snippet']['channelId'],
-                    'video_id': video_id,
-                    'title': video_details['snippet']['title'],
-                    'description': video_details['snippet']['description'],
-                    'published_at': video_details['snippet']['publishedAt'],
-                    'duration': video_details['contentDetails']['duration'],
-                    'view_count': video_details['statistics'].get('viewCount', 0),
-                    'like_count': video_details['statistics'].get('likeCount', 0),
-                    'comment_count': video_details['statistics'].get('commentCount', 0),
-                    'transcript': transcript,
-                    'comments': comments,
-                    'processed_at': datetime.now().isoformat()
-                }
+                # Save as CSV (flattened structure)
+                csv_data = [video_csv_row(video) for video in videos_data]
                 
-                channel_videos_data.append(video_data)
+                csv_file = self.output_dir / f"youtube_data_{timestamp}.csv"
+                df = pd.DataFrame(csv_data)
+                df.to_csv(csv_file, index=False, encoding='utf-8')
+                logger.info(f"Saved data to {csv_file}")
                 
-                # Incremental cache every 50 videos
-                if (j + 1) % 50 == 0 or (j + 1) == len(videos):
-                    try:
-                        with open(cache_file, 'wb') as f:
-                            pickle.dump(channel_videos_data, f)
-                        logger.info(f"Incrementally cached {len(channel_videos_data)} videos for {channel_handle}")
-                    except Exception as e:
-                        logger.warning(f"Failed to incrementally cache data for {channel_handle}: {e}")
+                # Save comments separately
+                comments_data = [row for video in videos_data for row in comment_csv_rows(video)]
                 
-                # Add delay between videos to be respectful
-                time.sleep(DELAY_BETWEEN_VIDEOS)
+                comments_csv_file = self.output_dir / f"youtube_comments_{timestamp}.csv"
+                comments_df = pd.DataFrame(comments_data)
+                comments_df.to_csv(comments_csv_file, index=False, encoding='utf-8')
+                logger.info(f"Saved comments to {comments_csv_file}")
             
-            all_videos_data.extend(channel_videos_data)
+            if 'parquet' in formats:
+                # Save as Parquet datasets partitioned by channel and publish month
+                parquet_dir = self.output_dir / "parquet"
+                with ParquetExporter(parquet_dir, timestamp) as exporter:
+                    exporter.write_all(videos_data)
+                logger.info(f"Saved data to {parquet_dir}")
         
-        return all_videos_data
+        METRICS.record(STAGE_EXPORT, items=len(videos_data))
     
-    def save_data(self, videos_data: List[Dict], output_format: str = 'json') -> None:
+    def save_data_streaming(self, videos: Iterable[Dict], output_format: str = 'json',
+                            on_saved: Optional[Callable[[Dict], None]] = None,
+                            timestamp: Optional[str] = None) -> int:
         """
-        Save collected data to files.
+        Save videos to files as they arrive, without holding them in memory.
+        
+        JSON output is written as NDJSON (youtube_data_*.ndjson, one video per
+        line) and archive output in compressed chunks of ARCHIVE_CHUNK_BYTES
+        (youtube_data_*.ytr); CSV rows are appended per video.
         
         Args:
-            videos_data: List of video data dictionaries
-            output_format: Output format ('json', 'csv', or 'both')
+            videos: Iterable of video data dictionaries, e.g. iter_channel_videos(...)
+            output_format: Output format ('json', 'csv', 'both', 'parquet', 'archive' or 'all')
+            on_saved: Called with {'channel_handle', 'video_id'} of each video
+                once it is written (and flushed); with archive output, once its
+                chunk is on disk, and with Parquet output, once its channel's
+                part files are closed
+            timestamp: Suffix of the output file names (defaults to the current time)
+            
+        Returns:
+            Number of videos saved
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        if output_format in ['json', 'both']:
-            # Save as JSON
-            json_file = self.output_dir / f"youtube_data_{timestamp}.json"
-            with open(json_file, 'w', encoding='utf-8') as f:
-                json.dump(videos_data, f, indent=2, ensure_ascii=False)
-            logger.info(f"Saved data to {json_file}")
-        
-        if output_format in ['csv', 'both']:
-            # Save as CSV (flattened structure)
-            csv_data = []
-            for video in videos_data:
-                video_row = {
-                    'channel_handle': video['channel_handle'],
-                    'channel_id': video['channel_id'],
-                    'video_id': video['video_id'],
-                    'title': video['title'],
-                    'description': video['description'],
-                    'published_at': video['published_at'],
-                    'duration': video['duration'],
-                    'view_count': video['view_count'],
-                    'like_count': video['like_count'],
-                    'comment_count': video['comment_count'],
-                    'transcript': video['transcript'],
-                    'comments_count': len(video['comments']),
-                    'processed_at': video['processed_at']
-                }
-                csv_data.append(video_row)
-            
-            csv_file = self.output_dir / f"youtube_data_{timestamp}.csv"
-            df = pd.DataFrame(csv_data)
-            df.to_csv(csv_file, index=False, encoding='utf-8')
-            logger.info(f"Saved data to {csv_file}")
-            
-            # Save comments separately
-            comments_data = []
-            for video in videos_data:
-                for comment in video['comments']:
-                    comment_row = {
-                        'video_id': video['video_id'],
-                        'channel_handle': video['channel_handle'],
-                        'comment_id': comment['cid'],
-                        'comment_text': comment['text'],
-                        'comment_time': comment['time'],
-                        'comment_author': comment['author'],
-                        'comment_channel': comment['channel'],
-                        'comment_votes': comment['votes'],
-                        'comment_replies': comment['replies']
-                    }
-                    comments_data.append(comment_row)
-            
-            comments_csv_file = self.output_dir / f"youtube_comments_{timestamp}.csv"
-            comments_df = pd.DataFrame(comments_data)
-            comments_df.to_csv(comments_csv_file, index=False, encoding='utf-8')
-            logger.info(f"Saved comments to {comments_csv_file}")
+        with StreamingExporter(self.output_dir, output_format, timestamp) as exporter:
+            try:
+                for video in videos:
+                    with METRICS.stage(STAGE_EXPORT):
+                        saved = exporter.write(video)
+                    METRICS.record(STAGE_EXPORT, items=1)
+                    if on_saved is not None:
+                        for saved_video in saved:
+                            on_saved(saved_video)
+            finally:
+                # Also on an interrupted crawl: whatever is written is reported
+                saved = exporter.flush()
+                if on_saved is not None:
+                    for saved_video in saved:
+                        on_saved(saved_video)
+            return exporter.videos_written
 
 
 def main():
     """Main function to run the YouTube scraper."""
-    # Get API key from environment
-    API_KEY = os.getenv("H_YOUTUBE_API_KEY")
-    if not API_KEY:
-        logger.error("Please set H_YOUTUBE_API_KEY environment variable")
+    setup_logging()
+    
+    # Get API keys from environment
+    API_KEYS = load_api_keys()
+    if not API_KEYS:
+        logger.error("Please set H_YOUTUBE_API_KEY (or H_YOUTUBE_API_KEYS) environment variable")
         return
     
     # Initialize scraper
-    scraper = YouTubeScraper(API_KEY)
+    scraper = YouTubeScraper(API_KEYS)
     
-    # Fetch and process videos using config settings
+    # Fetch and process videos using config settings, saving each video as
+    # soon as it is finished
     logger.info(f"Starting to scrape {len(YOUTUBERS)} channels: {YOUTUBERS}")
-    videos_data = scraper.fetch_and_process_channel_videos(
+    videos = scraper.iter_channel_videos(
         channel_handles=YOUTUBERS,
         max_videos_per_channel=MAX_VIDEOS_PER_CHANNEL,
-        max_comments_per_video=MAX_COMMENTS_PER_VIDEO
+        max_comments_per_video=MAX_COMMENTS_PER_VIDEO,
+        concurrent=CONCURRENT_MODE
     )
     
     # Save data using config setting
-    scraper.save_data(videos_data, output_format=OUTPUT_FORMAT)
+    count = scraper.save_data_streaming(videos, output_format=OUTPUT_FORMAT)
     
-    logger.info(f"Scraping completed! Processed {len(videos_data)} videos")
+    logger.info(f"Scraping completed! Processed {count} videos")
 
 
 if __name__ == "__main__":